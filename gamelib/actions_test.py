@@ -0,0 +1,109 @@
+import copy
+
+from cocos import path
+from cocos.cocosnode import CocosNode
+from cocos.actions import *
+from cocos.actions import base_actions
+from cocos.actions.base_actions import shallow_classes
+
+class Node(CocosNode):
+    """ a node with what the actions change """
+    def __init__(self):
+        super(Node, self).__init__()
+        self.opacity = 255
+
+    def state(self):
+        return (tuple(self.position), self.rotation, self.scale, self.opacity,
+                self.visible, [type(a) for a in self.actions])
+
+def samples(log):
+    """ class -> an action of it, for each class clone copies shallow """
+    def call(*args, **kwargs):
+        log.append((args, kwargs))
+    def call_s(node, *args):
+        log.append((node.position,) + args)
+    return {
+        base_actions.Loop: base_actions.Loop(MoveBy((10, 0), 0.2), 3),
+        Sequence: MoveBy((10, 0), 0.5) + FadeOut(0.5),
+        Spawn: MoveBy((10, 0), 0.5) | ScaleBy(2, 0.8),
+        Repeat: Repeat(RotateBy(90, 0.5)),
+        base_actions._ReverseTime: base_actions._ReverseTime(MoveBy((10, 0), 1)),
+        Lerp: Lerp('opacity', 0, 200, 1),
+        RotateBy: RotateBy(90, 1),
+        RotateTo: RotateTo(270, 1),
+        Speed: Speed(RotateBy(90, 1), 2),
+        Accelerate: Accelerate(MoveBy((100, 0), 1), 3),
+        AccelDeccel: AccelDeccel(ScaleTo(2, 1)),
+        MoveTo: MoveTo((30, 40), 1),
+        MoveBy: MoveBy((30, 40), 1),
+        FadeOut: FadeOut(1),
+        FadeTo: FadeTo(50, 1),
+        FadeIn: FadeIn(1),
+        ScaleTo: ScaleTo(3, 1),
+        ScaleBy: ScaleBy(3, 1),
+        Blink: Blink(3, 1),
+        Bezier: Bezier(path.Bezier((0, 0), (100, 0), (0, 100), (100, 100)), 1),
+        Jump: Jump(50, 100, 2, 1),
+        JumpBy: JumpBy((100, 0), 50, 2, 1),
+        JumpTo: JumpTo((100, 0), 50, 2, 1),
+        Delay: Delay(0.5),
+        Place: Place((10, 20)),
+        Hide: Hide(),
+        Show: Show(),
+        ToggleVisibility: ToggleVisibility(),
+        CallFunc: CallFunc(call, 1, x=2),
+        CallFuncS: CallFuncS(call_s, 3),
+        DoAction: DoAction(MoveBy((10, 0), 1)),
+    }
+
+def held(action):
+    """ action and the actions it holds, and those they hold """
+    found = [action]
+    for name in ['one', 'two', 'other', 'action']:
+        if isinstance(getattr(action, name, None), Action):
+            found.extend(held(getattr(action, name)))
+    return found
+
+def run(action, log, steps=90, dt=1/60.):
+    """ the state of a node after running action on it, as CocosNode.do does """
+    del log[:]
+    node = Node()
+    action.target = node
+    action.start()
+    for i in range(steps):
+        if action.done():
+            break
+        action.step(dt)
+    action.stop()
+    return node.state(), log[:]
+
+def test_clone_as_deepcopy():
+    log = []
+    actions = samples(log)
+    # every class marked has a sample here
+    assert set(actions) == shallow_classes, shallow_classes ^ set(actions)
+    for cls, action in actions.items():
+        assert type(action) is cls
+        ends = [run(action.clone(), log), run(copy.deepcopy(action), log),
+                run(action.clone(), log)]
+        assert ends[0] == ends[1] == ends[2], (cls, ends)
+        # the action cloned, and those it holds, are not run
+        assert [a.target for a in held(action)] == [None] * len(held(action)), cls
+    print 'test clone as deepcopy ok'
+
+def test_subclass_deep_copied():
+    class Counting(MoveBy):
+        def init(self, *args):
+            super(Counting, self).init(*args)
+            self.seen = []
+    # MoveBy shares its parameters, a subclass of it has them copied
+    action = MoveBy((10, 0), 1)
+    assert action.clone().delta is action.delta
+    action = Counting((10, 0), 1)
+    assert action.clone().delta is not action.delta
+    assert action.clone().seen is not action.seen
+    print 'test subclass deep copied ok'
+
+if __name__ == '__main__':
+    test_clone_as_deepcopy()
+    test_subclass_deep_copied()
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pyglet
+
+BASEPATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+
+def test_load_saved(runs=3):
+    """
+    game and editor sprite layers, made again and again, load each atlas
+    image once. SavedAtlas makes textures: run it with a window, or
+    headless, where NullAtlas loads the image in its place
+    """
+    import main
+    import mapdata
+    from tiless_editor import atlas
+    from tiless_editor.plugins.sprite_layer import SpriteLayerFactory
+    atlas._saved.clear()
+    loads = []
+    image_load = pyglet.image.load
+    def counted_load(filename, *args, **kwargs):
+        loads.append(os.path.abspath(filename))
+        return image_load(filename, *args, **kwargs)
+    pyglet.image.load = counted_load
+    # the game runs in its base directory, the editor in the data directory
+    cwd = os.getcwd()
+    os.chdir(BASEPATH)
+    try:
+        layers = mapdata.load(main.MAPFILE)
+        editor = SpriteLayerFactory('tiles')
+        for run in range(runs):
+            for layer in layers:
+                main.make_sprites_layer(layer, None)
+                os.chdir('data')
+                try:
+                    editor.dict_to_layer({'sprites': [layer.sprite(k) for k in range(len(layer))]})
+                finally:
+                    os.chdir('..')
+        image = os.path.abspath(main.ATLAS_IMAGE)
+        coords = os.path.abspath(main.ATLAS_COORDS)
+    finally:
+        pyglet.image.load = image_load
+        os.chdir(cwd)
+    assert loads == [image], loads
+    assert atlas._saved.keys() == [(image, coords)], atlas._saved.keys()
+    print 'test load saved ok'
+
+if __name__ == '__main__':
+    if '--window' in sys.argv:
+        from cocos.director import director
+        director.init(width=640, height=480, visible=False)
+    else:
+        import headless
+        headless.setup()
+    test_load_saved()
@@ -0,0 +1,814 @@
+""" Benchmarks
+
+Timings for the hot paths of the game that can run without a window.
+Run it from the game directory, as with run_game.py:
+
+    python gamelib/bench.py
+    python gamelib/bench.py --json before.json
+    python gamelib/bench.py --json after.json --compare before.json
+
+--json writes every number printed, by name, with the commit it was run
+on, and --compare puts the ones of an earlier run next to them.
+"""
+import optparse
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import simplejson
+
+import pyglet
+import headless
+# no window: sprites get size-only images and no GL context is needed
+headless.setup()
+
+from spatialhash import SpatialHash
+from registry import Registry
+from gamecast import COLLISION_DISTANCES, COLLISION_CELL_SIZE, Agent
+from boids import seek, avoid_group, merge
+from math import cos, sin, radians
+import steering
+from wallmask import WallMask
+from waypointing import WaypointNav
+from flowfield import FlowFields, UNREACHED
+import projectiles
+import mapdata
+from gamecast import SHOT_RADIUS
+
+MAPFILE = 'data/map.json'
+ATLAS_COORDS = 'data/atlas-coords.json'
+
+# map bounds, as in data/map.json
+MAP_RECT = (-1868, -2406, 2100, 794)
+# what an agent walks in a frame at 60 fps
+STEP = 7
+
+
+class Body(object):
+    """ the part of an agent the collision pass looks at """
+    def __init__(self, kind, position):
+        self.collision_kind = kind
+        self.position = position
+
+
+def make_bodies(count, seed=0):
+    rnd = random.Random(seed)
+    x0, y0, x1, y1 = MAP_RECT
+    bodies = []
+    for i in range(count):
+        # mostly zombies, like a late wave
+        kind = rnd.choice(['zombie']*8 + ['relative', 'bullet'])
+        bodies.append(Body(kind, (rnd.uniform(x0, x1), rnd.uniform(y0, y1))))
+    return bodies
+
+def walk(bodies, rnd):
+    for b in bodies:
+        x, y = b.position
+        b.position = (x + rnd.uniform(-STEP, STEP), y + rnd.uniform(-STEP, STEP))
+
+def collision_pass_scan(bodies):
+    """ every body against every other one, as update_position used to """
+    hits = 0
+    for b in bodies:
+        x, y = b.position
+        kind = b.collision_kind
+        for other in bodies:
+            if other is b: continue
+            ox, oy = other.position
+            if (x-ox)**2+(y-oy)**2 <= COLLISION_DISTANCES[kind, other.collision_kind]:
+                hits += 1
+    return hits
+
+def collision_pass_hashed(space, bodies):
+    """ every body against its neighbour cells, as update_position does """
+    for b in bodies:
+        space.move(b)
+    hits = 0
+    for b in bodies:
+        x, y = b.position
+        kind = b.collision_kind
+        for other in space.near(x, y):
+            if other is b: continue
+            ox, oy = other.position
+            if (x-ox)**2+(y-oy)**2 <= COLLISION_DISTANCES[kind, other.collision_kind]:
+                hits += 1
+    return hits
+
+def bench_collision(counts=(50, 200, 1000), frames=10):
+    """ per frame cost of the agent vs agent collision pass """
+    results = []
+    for count in counts:
+        bodies = make_bodies(count)
+        space = SpatialHash(COLLISION_CELL_SIZE)
+        for b in bodies:
+            space.add(b)
+
+        rnd = random.Random(1)
+        scan = hashed = 0.0
+        for frame in range(frames):
+            walk(bodies, rnd)
+            t = time.time()
+            scan_hits = collision_pass_scan(bodies)
+            scan += time.time() - t
+            t = time.time()
+            hashed_hits = collision_pass_hashed(space, bodies)
+            hashed += time.time() - t
+            assert scan_hits == hashed_hits
+        results.append((count, scan/frames*1000, hashed/frames*1000))
+    return results
+
+
+class Walker(Body):
+    """ the part of a zombie steering looks at """
+    def __init__(self, position, goal, space):
+        super(Walker, self).__init__('zombie', position)
+        self.x, self.y = position
+        self.rotation = 0
+        self.speed = 100
+        self.goal = goal
+        self.last_goal = 0
+        self.space = space
+        space.add(self)
+
+    def next_goal(self):
+        return self.goal
+
+    def advance(self, position, dt):
+        self.position = position
+        self.x, self.y = position
+        self.space.move(self)
+
+def steer_one_by_one(walkers, dt):
+    """
+    what Zombie.think and Zombie.move do for each, minus waypoints and
+    collisions: all steer, then all move
+    """
+    far = steering.SEPARATION_FAR
+    near = steering.SEPARATION_NEAR
+    for b in walkers:
+        gx, gy = b.goal
+        goal = seek(b.x, b.y, gx, gy)
+        locals = [o for o in b.space.near(b.x, b.y)
+                  if o is not b and (o.x-b.x)**2 + (o.y-b.y)**2 < far**2]
+        escape, danger = avoid_group(b.x, b.y, locals)
+        if danger < near:
+            chosen = escape
+        elif danger > far:
+            chosen = goal
+        else:
+            d = float(danger-near)/(far-near)
+            chosen = merge([(goal, d), (escape, 1-d)])
+        b.rotation = chosen % 360
+    for b in walkers:
+        a = -b.rotation
+        b.advance((b.x + cos(radians(a)) * b.speed * dt,
+                   b.y + sin(radians(a)) * b.speed * dt), dt)
+
+def bench_steering(counts=(100, 500, 2000), frames=50, dt=1/60.):
+    """
+    per frame cost of steering every zombie, keeping them apart, one by
+    one and as a herd, which have to agree
+    """
+    results = []
+    for count in counts:
+        rnd = random.Random(0)
+        x0, y0, x1, y1 = MAP_RECT
+        def make(space):
+            rnd.seed(0)
+            return [Walker((rnd.uniform(x0, x1), rnd.uniform(y0, y1)),
+                           (rnd.uniform(x0, x1), rnd.uniform(y0, y1)), space)
+                    for i in range(count)]
+
+        walkers = make(SpatialHash(COLLISION_CELL_SIZE))
+        t = time.time()
+        for frame in range(frames):
+            steer_one_by_one(walkers, dt)
+        single = time.time() - t
+
+        herd = steering.Herd()
+        herd.space = SpatialHash(COLLISION_CELL_SIZE)
+        herded = make(herd.space)
+        for w in herded:
+            herd.add(w)
+        t = time.time()
+        for frame in range(frames):
+            herd.step(dt)
+        batched = time.time() - t
+
+        for a, b in zip(walkers, herded):
+            assert abs(a.x - b.x) < 1e-6 and abs(a.y - b.y) < 1e-6
+        results.append((count, single/frames*1000, batched/frames*1000))
+    return results
+
+
+class Tile(object):
+    """ the part of a map sprite the wall mask looks at """
+    def __init__(self, item, rect):
+        self.x, self.y = item['position']
+        self.rotation = item['rotation']
+        # same as Sprite.width and height, rect is the region in the atlas
+        self.width = int(rect[2] * item['scale'])
+        self.height = int(rect[3] * item['scale'])
+
+def load_map(mapfile=MAPFILE):
+    """ the wall mask and waypoints of a map, as GameLayer builds them """
+    wallmask = WallMask()
+    waypoints = []
+    rects = simplejson.load(open(ATLAS_COORDS))
+    for layer in simplejson.load(open(mapfile))['layers']:
+        sprites = layer['data']['sprites']
+        if layer['label'] in ['walls', 'furninture']:
+            for item in sprites:
+                wallmask.add(Tile(item, rects[item['filename']]))
+        if layer['label'] == 'waypoints':
+            waypoints = sorted([tuple(item['position']) for item in sprites])
+    return wallmask, waypoints
+
+def empty_spots(wallmask, count, seed=0):
+    rnd = random.Random(seed)
+    x0, y0, x1, y1 = MAP_RECT
+    spots = []
+    while len(spots) < count:
+        p = rnd.uniform(x0, x1), rnd.uniform(y0, y1)
+        if wallmask.is_empty(*p):
+            spots.append(p)
+    return spots
+
+def bench_get_dest(spots=200, queries=2000):
+    """
+    get_dest and get_near_wps calls per second on the real map, without
+    and with the nearest waypoint index, and how long building the
+    WaypointNav takes with no cache file. Either way, the waypoints given
+    have to be in sight of where the queries are from
+    """
+    wallmask, waypoints = load_map()
+    spots = empty_spots(wallmask, spots)
+    rnd = random.Random(1)
+    pairs = [(rnd.choice(spots), rnd.choice(spots)) for i in range(queries)]
+
+    results = []
+    for cell_size in (None, wallmask.tilesize):
+        t = time.time()
+        ways = WaypointNav(waypoints, wallmask.is_visible, cell_size=cell_size,
+                           cell_bounds=wallmask.bounds(),
+                           fn_visibles_many=wallmask.are_visible)
+        build = time.time() - t
+        t = time.time()
+        dests = [ways.get_dest(a, b) for a, b in pairs]
+        rate = queries/(time.time() - t)
+        t = time.time()
+        near = [ways.get_near_wps(a) for a, b in pairs]
+        results.append((cell_size, rate, queries/(time.time() - t), build*1000))
+        # a waypoint given is always one a sees, as the scan gives
+        for (a, b), dest, wps in zip(pairs, dests, near):
+            assert dest == b or wallmask.is_visible(a, dest)
+            assert [i for i in wps if wallmask.is_visible(a, ways.points[i])] == wps
+    return results
+
+def bench_raycast(counts=(100, 1000, 10000)):
+    """
+    ms to raycast random segments between empty spots of the real map, one
+    by one and all at once, which have to agree
+    """
+    wallmask, waypoints = load_map()
+    spots = empty_spots(wallmask, 1000)
+    rnd = random.Random(2)
+    # the grids raycast_many keeps are made on the first call
+    wallmask.raycast_many(0, 0, 1, 1)
+    results = []
+    for count in counts:
+        pairs = [(rnd.choice(spots), rnd.choice(spots)) for i in range(count)]
+        t = time.time()
+        cast = [wallmask.raycast(a, b) for a, b in pairs]
+        one_by_one = (time.time() - t) * 1000
+
+        ox, oy, tx, ty = steering.numpy.array([a + b for a, b in pairs]).T
+        t = time.time()
+        hit, hx, hy, distance = wallmask.raycast_many(ox, oy, tx, ty)
+        results.append((count, one_by_one, (time.time() - t) * 1000))
+        # the same hits, at the same distance
+        assert (hit == [p is not None for p, d in cast]).all()
+        assert (abs(distance - [d for p, d in cast]) < 1e-6).all()
+    return results
+
+def bench_distance_field(runs=5):
+    """ ms to build the signed distance field of the real map's wall mask """
+    wallmask, waypoints = load_map()
+    best = None
+    for i in range(runs):
+        wallmask._distances = None
+        t = time.time()
+        wallmask.distance_at(0, 0)
+        took = (time.time() - t) * 1000
+        best = min(best, took) if best is not None else took
+    return best
+
+def bench_map_load(runs=5, mapfile=MAPFILE):
+    """
+    best ms to parse the map JSON, to read its sprite layers from the
+    binary copy, and to load the map as load_map does: parsing the JSON
+    and building its wall mask and waypoints
+    """
+    parse = binary = build = None
+    mapdata.load(mapfile)
+    for i in range(runs):
+        t = time.time()
+        mapdata.read(mapdata.binary_name(mapfile))
+        took = (time.time() - t) * 1000
+        binary = min(binary, took) if binary is not None else took
+        t = time.time()
+        simplejson.load(open(mapfile))
+        took = (time.time() - t) * 1000
+        parse = min(parse, took) if parse is not None else took
+        t = time.time()
+        load_map(mapfile)
+        took = (time.time() - t) * 1000
+        build = min(build, took) if build is not None else took
+    return parse, binary, build
+
+def bench_atlas(mapfile=MAPFILE):
+    """
+    ms to get the atlas of every sprite layer of the map, as
+    make_sprites_layer does, the first time and once loaded. Headless, a
+    NullAtlas stands for the SavedAtlas, so this times the lookup and the
+    JSON; tiless_editor.atlas.test_load_saved tests the real one
+    """
+    from tiless_editor import atlas
+    from tiless_editor.atlas import load_saved
+    import main
+    atlas._saved.clear()
+    layers = [layer for layer in simplejson.load(open(mapfile))['layers']
+              if layer['layer_type'] == 'sprite']
+    loads = []
+    image_load = pyglet.image.load
+    def counted_load(filename, *args, **kwargs):
+        loads.append(filename)
+        return image_load(filename, *args, **kwargs)
+    pyglet.image.load = counted_load
+    try:
+        times = []
+        for i in range(2):
+            t = time.time()
+            atlases = [load_saved(main.ATLAS_IMAGE, main.ATLAS_COORDS) for layer in layers]
+            times.append((time.time() - t) * 1000)
+    finally:
+        pyglet.image.load = image_load
+    assert len(loads) == 1, "%s loaded %d times" % (main.ATLAS_IMAGE, len(loads))
+    assert len(set(map(id, atlases))) == 1
+    return len(layers), times[0], times[1]
+
+def bench_culling(labels=('floor', 'furninture'), step=200, window=(1024, 768)):
+    """
+    chunks and quads a StaticLayer of the map's floor and furniture draws
+    per frame, as the camera goes over the whole map, and ms to cull. Every
+    sprite the window shows has to be in a chunk drawn
+    """
+    import main
+    from staticlayer import StaticLayer
+    sprites = []
+    for layer in mapdata.load(MAPFILE):
+        if layer.label in labels:
+            sprites.extend(main.make_sprites_layer(layer, None).get_children())
+
+    def box(vertices):
+        return min(vertices[0::2]), min(vertices[1::2]), max(vertices[0::2]), max(vertices[1::2])
+    def meets(a, b):
+        return a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]
+    # the layer frees the sprites' vertex lists
+    boxes = [box(list(s._vertex_list.vertices)) for s in sprites]
+    static = StaticLayer(sprites)
+    x0, y0, x1, y1 = MAP_RECT
+    w, h = window
+    views = [(x, y, x + w, y + h) for x in range(x0 - w, x1, step)
+                                  for y in range(y0 - h, y1, step)]
+    chunks = quads = 0
+    t = time.time()
+    for view in views:
+        static.cull(view)
+        chunks += static.chunks_drawn
+        quads += static.quads_drawn
+    took = (time.time() - t) * 1000 / len(views)
+
+    for view in views[::7]:
+        shown = sum([meets(b, view) for b in boxes])
+        drawn = static.cull(view)
+        assert shown <= static.quads_drawn
+        for b in boxes:
+            if meets(b, view):
+                assert [c for c in drawn if meets(b, c.box)]
+    return (len(static.chunks), len(sprites), float(chunks) / len(views),
+            float(quads) / len(views), took)
+
+def bench_walls(labels=('walls', 'gates')):
+    """
+    vertices of the map's walls as WallLayer made them, 5 quads a sprite,
+    and merged by WallMesh, and ms to merge. The merged tops have to cover
+    the same area, and every side that can be seen has to be in a merged one
+    """
+    import main
+    from walls import WallMesh
+    mesh = WallMesh()
+    for layer in mapdata.load(MAPFILE):
+        if layer.label in labels:
+            for sprite in main.make_sprites_layer(layer, None).get_children():
+                mesh.add(sprite)
+    t = time.time()
+    meshes = mesh.mesh()
+    took = (time.time() - t) * 1000
+    before, after = mesh.counts()
+
+    area = sum([(x1 - x0) * (y1 - y0) for x0, y0, x1, y1, top, side in mesh.boxes])
+    assert area == sum([(x1 - x0) * (y1 - y0) for x0, y0, x1, y1, w, h, top in mesh.tops()])
+    sides = mesh.sides()
+    for x0, y0, x1, y1, top, side in mesh.boxes:
+        for axis, at, outside, a, b in [(1, y0, -1, x0, x1), (1, y1, 1, x0, x1),
+                                        (0, x0, -1, y0, y1), (0, x1, 1, y0, y1)]:
+            if not mesh._covered(axis, at, a, b, outside):
+                assert [s for s in sides if s[:2] == (axis, at) and s[2] <= a
+                        and b <= s[3] and s[5] == side]
+    return mesh.sprites, len(meshes), before, after, took
+
+class Puppet(object):
+    """ what the actions of the game change on a node """
+    def __init__(self):
+        self.opacity = 255
+        self.scale = 1.0
+        self.visible = True
+        self.calls = 0
+
+    def state(self):
+        return self.opacity, self.scale, self.visible, self.calls
+
+def action_chains(puppet):
+    """ the chains of actions the game runs most, by name """
+    from cocos.actions import Delay, FadeTo, FadeOut, ScaleTo, Show, FadeIn, CallFunc
+    def call():
+        puppet.calls += 1
+    # GameLayer.flicker
+    flicker = Delay(3)
+    for i in range(10):
+        flicker = flicker + FadeTo(50, 0.2) + FadeTo(255, 0.3)
+    flicker = flicker + CallFunc(call)
+    return [
+        ('flicker', flicker),
+        # DeadStuffLayer.add
+        ('expire', Delay(10) + FadeOut(1) + CallFunc(call)),
+        # HudLayer.set_life
+        ('hud face', ScaleTo(0.8, 0.2) + ScaleTo(1.0, 0.2)),
+        # the title screen
+        ('title', Delay(1) + Show() + FadeIn(0.3) + Delay(1) + FadeOut(0.3)),
+    ]
+
+def bench_action_clone(runs=2000, dt=1/60.):
+    """
+    us to copy each of the chains of action_chains as CocosNode.do does,
+    with clone, and with the deepcopy do used to make. A clone has to run
+    as a deep copy does, leaving the chain it came from as it was
+    """
+    import copy
+    rows = []
+    for name, chain in action_chains(Puppet()):
+        t = time.time()
+        for i in xrange(runs):
+            chain.clone()
+        cloned = (time.time() - t) * 1e6 / runs
+        t = time.time()
+        for i in xrange(runs):
+            copy.deepcopy(chain)
+        deep = (time.time() - t) * 1e6 / runs
+        rows.append((name, cloned, deep))
+
+    def run(copy_of):
+        puppet = Puppet()
+        ends = []
+        for name, chain in action_chains(puppet):
+            a = copy_of(chain)
+            a.target = puppet
+            a.start()
+            steps = 0
+            while True:
+                a.step(dt)
+                steps += 1
+                if a.done():
+                    a.stop()
+                    break
+            # the chain as given is not run, or changed
+            assert chain.target is None and chain.one.target is None
+            ends.append((steps, puppet.state()))
+        return ends
+    assert run(lambda chain: chain.clone()) == run(copy.deepcopy)
+    return rows
+
+def bench_setup_waypoints(runs=3):
+    """
+    ms to build the WaypointNav as GameLayer.setup_waypoints does: from
+    scratch, and the best of runs loading the routes from the cache file
+    the first build writes
+    """
+    wallmask, waypoints = load_map()
+    def build(cache_file):
+        t = time.time()
+        WaypointNav(waypoints, wallmask.is_visible, cache_file=cache_file,
+                    cache_salt=wallmask.digest(), cell_size=wallmask.tilesize,
+                    cell_bounds=wallmask.bounds(),
+                    fn_visibles_many=wallmask.are_visible)
+        return (time.time() - t) * 1000
+
+    tmp = tempfile.mkdtemp()
+    try:
+        cache_file = os.path.join(tmp, 'nav.npz')
+        cold = build(cache_file)
+        cached = min([build(cache_file) for i in range(runs)])
+    finally:
+        shutil.rmtree(tmp)
+    return cold, cached
+
+
+class Arena(object):
+    """ the part of the GameLayer update_position looks at """
+    def __init__(self, wallmask):
+        self.wallmask = wallmask
+        self.dead_items = Registry()
+
+    def is_empty(self, x, y):
+        return self.wallmask.is_empty(x, y)
+
+class Mover(Agent):
+    """ an Agent with no behaviour of its own, to move around """
+    def __init__(self, arena, kind, position, player=None):
+        super(Mover, self).__init__(arena, headless.null_image(64, 64), position)
+        self.collision_kind = kind
+        self.just_born = False
+        # relatives look at how far dad is
+        self.player = player or self
+
+def bench_update_position(counts=(10, 100, 1000), frames=20):
+    """
+    ms per frame of Agent.update_position for every agent, walls and
+    agents colliding, as the collision phase of the world tick does
+    """
+    from gamecast import AgentsNode
+    wallmask, waypoints = load_map()
+    arena = Arena(wallmask)
+    results = []
+    for count in counts:
+        rnd = random.Random(0)
+        node = AgentsNode()
+        spots = empty_spots(wallmask, count)
+        player = Mover(arena, 'player', spots[0])
+        movers = [player] + [Mover(arena, rnd.choice(['zombie']*8 + ['relative']*2),
+                                   spot, player) for spot in spots[1:]]
+        for m in movers:
+            node.add(m)
+        t = time.time()
+        for frame in range(frames):
+            for m in movers:
+                x, y = m.position
+                m.update_position((x + rnd.uniform(-STEP, STEP),
+                                   y + rnd.uniform(-STEP, STEP)))
+        results.append((count, (time.time() - t) * 1000 / frames))
+    return results
+
+
+class Chaser(object):
+    """ the part of a zombie flow fields look at """
+    def __init__(self, target):
+        self.target = target
+        self.life = 1
+
+def bench_pathing(counts=(10, 100, 500), targets=3, frames=20):
+    """
+    ms per frame to find where every zombie heads next, when all of them
+    chase one of a few targets: a get_dest call each, or one flow field
+    lookup for the whole herd. Also ms to build a flow field, checking
+    the steps it gives
+    """
+    wallmask, waypoints = load_map()
+    ways = WaypointNav(waypoints, wallmask.is_visible, cell_size=wallmask.tilesize,
+                       cell_bounds=wallmask.bounds(),
+                       fn_visibles_many=wallmask.are_visible)
+    flows = FlowFields(wallmask)
+    goals = [Chaser(None) for i in range(targets)]
+    for goal, spot in zip(goals, empty_spots(wallmask, targets, seed=1)):
+        goal.position = spot
+
+    t = time.time()
+    for goal in goals:
+        flows.fields.pop(goal, None)
+        flows.field(goal)
+    build = (time.time() - t) * 1000 / targets
+
+    # every step goes one tile closer, and not across a wall corner
+    numpy = steering.numpy
+    free = flows.free.ravel()
+    h = flows.free.shape[1]
+    for goal in goals:
+        field = flows.fields[goal]
+        tile = numpy.nonzero((field.distance != UNREACHED) & (field.distance > 0))[0]
+        sx, sy = field.step_x[tile], field.step_y[tile]
+        assert (field.distance[tile + sx*h + sy] == field.distance[tile] - 1).all()
+        assert (free[tile + sx*h] & free[tile + sy]).all()
+
+    results = []
+    for count in counts:
+        spots = empty_spots(wallmask, count)
+        chasers = [Chaser(goals[i % targets]) for i in range(count)]
+        t = time.time()
+        for frame in range(frames):
+            for c, p in zip(chasers, spots):
+                ways.get_dest(p, c.target.position)
+        one_by_one = (time.time() - t) * 1000 / frames
+
+        x = steering.numpy.array([p[0] for p in spots])
+        y = steering.numpy.array([p[1] for p in spots])
+        gx, gy = x.copy(), y.copy()
+        t = time.time()
+        for frame in range(frames):
+            flows.guide(chasers, x, y, gx, gy, 0)
+        fields = (time.time() - t) * 1000 / frames
+        results.append((count, one_by_one, fields))
+    return build, results
+
+def bench_shots(counts=(1, 8, 64), zombies=500, volleys=50):
+    """
+    ms to resolve shots fired together from the same spot of the real map,
+    with zombies around: sweeping them one by one or as one volley
+    """
+    wallmask, waypoints = load_map()
+    space = SpatialHash(COLLISION_CELL_SIZE)
+    for spot in empty_spots(wallmask, zombies):
+        body = Body('zombie', spot)
+        body.life = 1
+        space.add(body)
+    guns = empty_spots(wallmask, volleys, seed=1)
+    rnd = random.Random(3)
+    results = []
+    for count in counts:
+        shots = [(x, y, [rnd.uniform(0, 360) for i in range(count)]) for x, y in guns]
+        t = time.time()
+        for x, y, angles in shots:
+            for a in angles:
+                projectiles.sweep(wallmask, space, SHOT_RADIUS, None, x, y,
+                                  x + cos(radians(-a))*1000, y + sin(radians(-a))*1000)
+        one_by_one = (time.time() - t) * 1000 / volleys
+        t = time.time()
+        for x, y, angles in shots:
+            projectiles.volley(wallmask, space, SHOT_RADIUS, None, x, y, angles, 1000)
+        results.append((count, one_by_one, (time.time() - t) * 1000 / volleys))
+    return results
+
+def git_commit():
+    try:
+        out = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE).communicate()[0]
+    except OSError:
+        return None
+    return out.strip() or None
+
+def run_all():
+    """ prints every benchmark, and returns its numbers by name """
+    results = {}
+    print "map load, %s" % MAPFILE
+    parse, binary, build = bench_map_load()
+    results['map_load.parse_ms'] = parse
+    results['map_load.binary_ms'] = binary
+    results['map_load.build_ms'] = build
+    print "%16s %10.1f ms" % ("json parse", parse)
+    print "%16s %10.1f ms" % ("binary read", binary)
+    print "%16s %10.1f ms" % ("walls, waypoints", build)
+    print
+    print "atlas of the sprite layers"
+    layers, first, again = bench_atlas()
+    results['atlas.first_ms'] = first
+    results['atlas.again_ms'] = again
+    print "%16s %10.1f ms" % ("%d layers" % layers, first)
+    print "%16s %10.1f ms" % ("loaded", again)
+    print
+    print "floor and furniture culling, per frame"
+    total_chunks, total_quads, chunks, quads, took = bench_culling()
+    results['culling.chunks_drawn'] = chunks
+    results['culling.quads_drawn'] = quads
+    results['culling.ms'] = took
+    print "%16s %10.1f of %d" % ("chunks drawn", chunks, total_chunks)
+    print "%16s %10.1f of %d" % ("quads drawn", quads, total_quads)
+    print "%16s %10.3f ms" % ("cull", took)
+    print
+    print "walls mesh"
+    sprites, textures, before, after, took = bench_walls()
+    results['walls.vertices_before'] = before
+    results['walls.vertices_after'] = after
+    results['walls.ms'] = took
+    print "%16s %10d, %d sprites" % ("vertices before", before, sprites)
+    print "%16s %10d, %d textures" % ("merged", after, textures)
+    print "%16s %10.1f ms" % ("merge", took)
+    print
+    print "action copies, us"
+    print "%16s %10s %10s" % ("chain", "clone", "deepcopy")
+    for name, cloned, deep in bench_action_clone():
+        results['action_clone.%s.clone_us' % name.replace(' ', '_')] = cloned
+        results['action_clone.%s.deepcopy_us' % name.replace(' ', '_')] = deep
+        print "%16s %10.1f %10.1f" % (name, cloned, deep)
+    print
+    print "setup_waypoints"
+    cold, cached = bench_setup_waypoints()
+    results['setup_waypoints.cold_ms'] = cold
+    results['setup_waypoints.cached_ms'] = cached
+    print "%16s %10.1f ms" % ("no cache", cold)
+    print "%16s %10.1f ms" % ("cached", cached)
+    print
+    print "update_position, ms per frame"
+    print "%8s %10s" % ("agents", "ms")
+    for count, ms in bench_update_position():
+        results['update_position.%d_ms' % count] = ms
+        print "%8d %10.2f" % (count, ms)
+    print
+    print "collision pass, ms per frame"
+    print "%8s %10s %10s" % ("agents", "scan", "hashed")
+    for count, scan, hashed in bench_collision():
+        results['collision.scan.%d_ms' % count] = scan
+        results['collision.hashed.%d_ms' % count] = hashed
+        print "%8d %10.2f %10.2f" % (count, scan, hashed)
+    print
+    print "zombie steering, ms per frame"
+    print "%8s %10s %10s" % ("zombies", "one by one", "herd")
+    for count, single, batched in bench_steering():
+        results['steering.single.%d_ms' % count] = single
+        results['steering.herd.%d_ms' % count] = batched
+        print "%8d %10.2f %10.2f" % (count, single, batched)
+    print
+    print "get_dest on %s" % MAPFILE
+    print "%16s %10s %10s %10s" % ("", "calls/s", "near/s", "build ms")
+    for cell_size, rate, near, build in bench_get_dest():
+        name = cell_size and "cell_index" or "scan"
+        results['get_dest.%s.calls_per_s' % name] = rate
+        results['get_dest.%s.near_per_s' % name] = near
+        results['get_dest.%s.build_ms' % name] = build
+        print "%16s %10.0f %10.0f %10.1f" % (cell_size and "cell index" or "scan",
+                                             rate, near, build)
+    print
+    print "raycast on %s, ms" % MAPFILE
+    print "%8s %10s %10s" % ("rays", "one by one", "batched")
+    for count, one_by_one, batched in bench_raycast():
+        results['raycast.single.%d_ms' % count] = one_by_one
+        results['raycast.many.%d_ms' % count] = batched
+        print "%8d %10.2f %10.2f" % (count, one_by_one, batched)
+    print
+    field = bench_distance_field()
+    results['distance_field_ms'] = field
+    print "distance field of %s, %.1f ms" % (MAPFILE, field)
+    print
+    build, pathing = bench_pathing()
+    results['pathing.flow_field_build_ms'] = build
+    print "zombie pathing, ms per frame (flow field build %.1f ms)" % build
+    print "%8s %10s %10s" % ("zombies", "get_dest", "flow field")
+    for count, one_by_one, fields in pathing:
+        results['pathing.get_dest.%d_ms' % count] = one_by_one
+        results['pathing.flow_field.%d_ms' % count] = fields
+        print "%8d %10.2f %10.2f" % (count, one_by_one, fields)
+    print
+    print "shots fired together among 500 zombies, ms"
+    print "%8s %10s %10s" % ("shots", "one by one", "volley")
+    for count, one_by_one, batched in bench_shots():
+        results['shots.sweep.%d_ms' % count] = one_by_one
+        results['shots.volley.%d_ms' % count] = batched
+        print "%8d %10.2f %10.2f" % (count, one_by_one, batched)
+    return results
+
+def compare(results, filename):
+    """ prints results next to the ones of an earlier --json run """
+    before = simplejson.load(open(filename))
+    print
+    print "against %s (%s)" % (filename, before.get('commit') or 'no commit')
+    print "%-36s %12s %12s %8s" % ("", "before", "now", "ratio")
+    for name in sorted(results):
+        now = results[name]
+        old = before['results'].get(name)
+        if old is None:
+            print "%-36s %12s %12.2f" % (name, "-", now)
+        else:
+            print "%-36s %12.2f %12.2f %8.2f" % (name, old, now, old and now/old or 0)
+
+def main(argv=None):
+    parser = optparse.OptionParser()
+    parser.add_option("--json", dest="json", default=None,
+                      help="write the results to FILE", metavar="FILE")
+    parser.add_option("--compare", dest="compare", default=None,
+                      help="compare with the results in FILE", metavar="FILE")
+    options, args = parser.parse_args(argv)
+
+    results = run_all()
+    if options.json:
+        f = open(options.json, 'w')
+        simplejson.dump({'commit': git_commit(), 'time': time.time(),
+                         'python': sys.version.split()[0], 'results': results},
+                        f, indent=1, sort_keys=True)
+        f.close()
+    if options.compare:
+        compare(results, options.compare)
+
+if __name__ == '__main__':
+    main()
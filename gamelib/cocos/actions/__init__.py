@@ -38,3 +38,14 @@ from quadmoveby_actions import *
 from tiledgrid_actions import *
 from grid3d_actions import *
 from camera_actions import *
+
+import base_actions
+from base_actions import copy_shallow
+
+# the actions CocosNode.do clones shallow: running them only rebinds their
+# attributes. Composites clone the actions they hold in their _copy
+copy_shallow(base_actions.Loop, Sequence, Spawn, Repeat, _ReverseTime,
+             Lerp, RotateBy, RotateTo, Speed, Accelerate, AccelDeccel,
+             MoveTo, MoveBy, FadeOut, FadeTo, FadeIn, ScaleTo, ScaleBy,
+             Blink, Bezier, Jump, JumpBy, JumpTo, Delay,
+             Place, Hide, Show, ToggleVisibility, CallFunc, CallFuncS, DoAction)
@@ -55,13 +55,43 @@ __all__ = [
 
 
 
+#: the action classes `Action.clone` copies shallow, see `copy_shallow`
+shallow_classes = set()
+
+def copy_shallow(*classes):
+    """
+    Has `Action.clone` copy the actions of classes shallow. Only for classes
+    whose actions rebind their attributes when run, never change the
+    objects they hold, so a shallow copy runs on its own. A subclass is not
+    marked by its base: it may keep state of its own, and has to be listed
+    """
+    shallow_classes.update(classes)
+
 class Action(object):
     '''Mother of all actions'''
+
     def __init__(self, *args, **kwargs):
         self.init(*args, **kwargs)
         self.target = None              #: `CocosNode` object that is the target of the action
         self._elapsed = None
 
+    def clone(self):
+        """
+        A copy of the action that can run on its own, as `CocosNode.do`
+        runs. Actions of a class in `shallow_classes` are copied shallow,
+        sharing their parameters, with the actions they run cloned; any
+        other is deep copied
+        """
+        if type(self) in shallow_classes:
+            return self._copy()
+        return copy.deepcopy(self)
+
+    def _copy(self):
+        """the shallow copy `clone` makes"""
+        new = object.__new__(type(self))
+        new.__dict__.update(self.__dict__)
+        return new
+
     def init(self):
         """
         Gets called at initialization time, before a target is defined
@@ -218,9 +248,16 @@ class Loop(IntervalAction):
     def start(self):
         self.duration = self.one.duration * self.times
         self.last = 0
-        self.current_action = copy.deepcopy(self.one)
+        self.current_action = self.one.clone()
         self.current_action.target = self.target
         self.current_action.start()
+
+    def _copy(self):
+        new = super(Loop, self)._copy()
+        new.one = self.one.clone()
+        if getattr(self, 'current_action', None) is not None:
+            new.current_action = self.current_action.clone()
+        return new
         
     def __repr__(self):
         return "( %s * %i )" %( self.one, self.times )
@@ -242,14 +279,14 @@ class Loop(IntervalAction):
             
             for i in range(self.last+1, current):
                 # fast forward the jumped actions            
-                self.current_action = copy.deepcopy(self.one)
+                self.current_action = self.one.clone()
                 self.current_action.target = self.target
                 self.current_action.start()
                 self.current_action.update(1)
                 self.current_action.stop()
             
             # set new current action
-            self.current_action = copy.deepcopy(self.one)
+            self.current_action = self.one.clone()
             self.current_action.target = self.target
             self.last = current
             
@@ -293,8 +330,8 @@ class Sequence(IntervalAction):
                 The second action to execute
         """
 
-        self.one = copy.deepcopy(one)
-        self.two = copy.deepcopy(two)
+        self.one = one.clone()
+        self.two = two.clone()
         self.actions = [self.one, self.two]
 
         if not hasattr(self.one, "duration") or not hasattr(self.two, "duration"):
@@ -312,6 +349,13 @@ class Sequence(IntervalAction):
         self.one.target = self.target
         self.two.target = self.target
 
+    def _copy(self):
+        new = super(Sequence, self)._copy()
+        new.one = self.one.clone()
+        new.two = self.two.clone()
+        new.actions = [new.one, new.two]
+        return new
+
     def __repr__(self):
         return "( %s + %s )" %( self.one, self.two )
 
@@ -389,8 +433,8 @@ class Spawn(IntervalAction):
         """
         from cocos.actions.interval_actions import Delay
 
-        one = copy.deepcopy(one)
-        two = copy.deepcopy(two)
+        one = one.clone()
+        two = two.clone()
         if one.duration > two.duration:
             two = two + Delay( one.duration-two.duration )
         elif two.duration > one.duration:
@@ -401,6 +445,12 @@ class Spawn(IntervalAction):
         self.actions = [one, two]
         self.cloned_actions = []
 
+    def _copy(self):
+        new = super(Spawn, self)._copy()
+        new.actions = [a.clone() for a in self.actions]
+        new.cloned_actions = [a.clone() for a in self.cloned_actions]
+        return new
+
     def done(self):
         ret = True
         for i in self.actions:
@@ -439,7 +489,13 @@ class Repeat(Action):
                 The action that will be repeated
         """
         self.original = action
-        self.action = copy.deepcopy( action )
+        self.action = action.clone()
+
+    def _copy(self):
+        new = super(Repeat, self)._copy()
+        new.original = self.original.clone()
+        new.action = self.action.clone()
+        return new
 
     def start(self):
         self.action.target = self.target
@@ -448,7 +504,7 @@ class Repeat(Action):
     def step(self, dt):
         self.action.step(dt)
         if self.action.done():
-            self.action = copy.deepcopy(self.original)
+            self.action = self.original.clone()
             self.start()
 
     def done(self):
@@ -470,6 +526,11 @@ class _ReverseTime( IntervalAction ):
         super(_ReverseTime, self).init(*args, **kwargs)
         self.other = other
         self.duration = self.other.duration
+
+    def _copy(self):
+        new = super(_ReverseTime, self)._copy()
+        new.other = self.other.clone()
+        return new
         
     def start(self):
         self.other.target = self.target
@@ -248,6 +248,11 @@ class Speed( IntervalAction ):
         self.speed = speed
         self.duration = other.duration/speed
 
+    def _copy(self):
+        new = super(Speed, self)._copy()
+        new.other = self.other.clone()
+        return new
+
     def start(self):
         self.other.target = self.target
         self.other.start()
@@ -283,6 +288,11 @@ class Accelerate( IntervalAction ):
         self.rate = rate
         self.duration = other.duration
 
+    def _copy(self):
+        new = super(Accelerate, self)._copy()
+        new.other = self.other.clone()
+        return new
+
     def start(self):
         self.other.target = self.target
         self.other.start()
@@ -315,6 +325,11 @@ class AccelDeccel( IntervalAction ):
         self.other = other
         self.duration = other.duration
 
+    def _copy(self):
+        new = super(AccelDeccel, self)._copy()
+        new.other = self.other.clone()
+        return new
+
     def start(self):
         self.other.target = self.target
         self.other.start()
@@ -36,7 +36,7 @@ CocosNode: the basic element of cocos2d
 
 __docformat__ = 'restructuredtext'
 
-import bisect, copy
+import copy
 
 import pyglet
 from pyglet.gl import *
@@ -376,8 +376,18 @@ class CocosNode(object):
 
         child.parent = self
 
+        # after the children with the same z. insort would compare the
+        # children themselves on a tie, that is, their ids
         elem = z, child
-        bisect.insort( self.children,  elem )
+        children = self.children
+        lo, hi = 0, len(children)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if z < children[mid][0]:
+                hi = mid
+            else:
+                lo = mid + 1
+        children.insert( lo, elem )
         if self.is_running:
             child.on_enter()
         return self
@@ -607,7 +617,10 @@ class CocosNode(object):
         :rtype: `Action` instance
         :return: A clone of *action*
         '''
-        a = copy.deepcopy( action )
+        if hasattr(action, 'clone'):
+            a = action.clone()
+        else:
+            a = copy.deepcopy( action )
 
         if target is None:
             a.target = self
@@ -0,0 +1,195 @@
+""" Flow fields
+
+Zombies chasing the same family member all want the same thing: the way
+to that member from wherever they are. A flow field answers that for
+every tile of the wall mask at once. It is a breadth first search from
+the target's tile over the empty tiles (8 neighbours, all steps cost
+the same), and for each tile, which neighbour is one step closer. A
+diagonal step is only taken when both tiles it passes by are empty, so
+nobody cuts through the corner of a wall.
+
+A zombie on the field only needs to look up its tile, so following it
+costs the same for one zombie or a hundred. A field is built whole
+again, not updated, when its target moves more than a tile, but not
+more often than REBUILD_INTERVAL; it is dropped when nobody chases its
+target.
+
+Needs numpy, steering.Herd is the only user.
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# seconds a field is kept before it follows its target again
+REBUILD_INTERVAL = 0.3
+# tiles around the wall mask the fields still cover
+PADDING = 4
+
+# the 8 neighbours of a tile
+NEIGHBOURS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+# distance of the tiles the target can't be reached from
+UNREACHED = 2**31 - 1
+
+
+class FlowField(object):
+    def __init__(self, free, neighbours, corners, origin, tilesize):
+        # as FlowFields keeps them for every field
+        self.free = free
+        self.neighbours = neighbours
+        self.corners = corners
+        self.origin = origin
+        self.tilesize = tilesize
+        self.target_cell = None
+        self.age = 0.0
+        # by tile, as numbered by FlowFields.tiles: steps from the target,
+        # and the step, in tiles, towards it
+        self.distance = None
+        self.step_x = self.step_y = None
+
+    def cell(self, x, y):
+        """ the tile of (x, y), as WallMask numbers them, in grid coords """
+        s = self.tilesize
+        return int(x/s) - self.origin[0], int(y/s) - self.origin[1]
+
+    def build(self, x, y):
+        """ distances and steps towards (x, y) from every tile """
+        free = self.free
+        w, h = free.shape
+        i, j = self.target_cell = self.cell(x, y)
+        self.age = 0.0
+        distance = numpy.empty(w*h, dtype=numpy.int32)
+        distance.fill(UNREACHED)
+        if 0 <= i < w and 0 <= j < h:
+            # walk the flat grid; the border is never free, so neighbours
+            # of free tiles are always inside
+            flat_free = free.ravel()
+            # a tile reached from many tiles of the frontier is kept once,
+            # the last write to claim wins
+            claim = numpy.empty(w*h, dtype=numpy.int32)
+            frontier = numpy.array([i*h + j])
+            distance[frontier] = 0
+            d = 0
+            while len(frontier):
+                d += 1
+                grown = self.neighbours[frontier].ravel()
+                grown = grown[flat_free[grown] & (distance[grown] == UNREACHED)]
+                order = numpy.arange(len(grown), dtype=numpy.int32)
+                claim[grown] = order
+                grown = grown[claim[grown] == order]
+                distance[grown] = d
+                frontier = grown
+        self.distance = distance
+
+        # for each tile, the neighbour closest to the target
+        padded = numpy.empty((w+2, h+2), dtype=numpy.int32)
+        padded.fill(UNREACHED)
+        padded[1:-1, 1:-1] = distance.reshape(w, h)
+        around = numpy.array([padded[1+di:w+1+di, 1+dj:h+1+dj] for di, dj in NEIGHBOURS])
+        # no step across a corner
+        around[self.corners] = UNREACHED
+        best = around.argmin(axis=0).ravel()
+        steps = numpy.array(NEIGHBOURS)
+        self.step_x = steps[best, 0]
+        self.step_y = steps[best, 1]
+
+
+class FlowFields(object):
+    """ one FlowField for each target someone is chasing """
+    def __init__(self, wallmask):
+        grid, (i0, j0) = wallmask.get_grid()
+        w, h = grid.shape
+        # free tiles, with a blocked border so searches stay in the grid
+        self.free = numpy.zeros((w + 2*PADDING, h + 2*PADDING), dtype=bool)
+        self.free[1:-1, 1:-1] = True
+        self.free[PADDING:-PADDING, PADDING:-PADDING] = ~grid
+        self.origin = i0 - PADDING, j0 - PADDING
+        self.tilesize = wallmask.tilesize
+        self._init_neighbours()
+        self.fields = {} # target -> FlowField
+        self.builds = 0
+
+    def _init_neighbours(self):
+        """
+        for each tile, the tiles a step can take to, tile 0 (a border one,
+        never free) where it can't. And corners[k, i, j], True where the
+        step NEIGHBOURS[k] from tile (i, j) would cut a wall corner
+        """
+        free = self.free
+        w, h = free.shape
+        padded = numpy.zeros((w+2, h+2), dtype=bool)
+        padded[1:-1, 1:-1] = free
+        tile = numpy.arange(w*h).reshape(w, h)
+        neighbours = numpy.zeros((w, h, len(NEIGHBOURS)), dtype=numpy.intp)
+        self.corners = numpy.zeros((len(NEIGHBOURS), w, h), dtype=bool)
+        for k, (di, dj) in enumerate(NEIGHBOURS):
+            if di and dj:
+                self.corners[k] = ~(padded[1+di:w+1+di, 1:h+1] & padded[1:w+1, 1+dj:h+1+dj])
+            # the border is never free, so wrapping around there is harmless
+            step = tile + (di*h + dj)
+            neighbours[:, :, k] = numpy.where(self.corners[k], 0, step % (w*h))
+        self.neighbours = neighbours.reshape(w*h, len(NEIGHBOURS))
+
+    def field(self, target, dt=0.0):
+        """ the field towards target, rebuilt if it moved off its tile """
+        field = self.fields.get(target)
+        if field is None:
+            field = self.fields[target] = FlowField(self.free, self.neighbours, self.corners,
+                                                    self.origin, self.tilesize)
+            field.build(*target.position)
+            self.builds += 1
+            return field
+        field.age += dt
+        if field.age >= REBUILD_INTERVAL:
+            i, j = field.cell(*target.position)
+            ti, tj = field.target_cell
+            if max(abs(i - ti), abs(j - tj)) > 1:
+                field.build(*target.position)
+                self.builds += 1
+        return field
+
+    def tiles(self, x, y):
+        """
+        the tiles of arrays of points, numbered as the fields do. Points off
+        the grid get tile 0, a border one that's never reached
+        """
+        s = self.tilesize
+        w, h = self.free.shape
+        # astype truncates, as WallMask does
+        i = (x / s).astype(int) - self.origin[0]
+        j = (y / s).astype(int) - self.origin[1]
+        inside = (i >= 0) & (i < w) & (j >= 0) & (j < h)
+        return numpy.where(inside, i*h + j, 0)
+
+    def guide(self, agents, x, y, gx, gy, dt):
+        """
+        sets goals (gx, gy) one tile down the field for every agent whose
+        target has one. Returns a bool array, True for the agents guided.
+        Next to its target, an agent heads straight for it.
+        """
+        guided = numpy.zeros(len(agents), dtype=bool)
+        chasing = {}
+        for i, agent in enumerate(agents):
+            target = agent.target
+            if target is not None and target is not agent and target.life > 0:
+                chasing.setdefault(target, []).append(i)
+
+        for target in self.fields.keys():
+            if target not in chasing:
+                del self.fields[target]
+
+        s = self.tilesize
+        tiles = self.tiles(x, y)
+        for target, index in chasing.iteritems():
+            field = self.field(target, dt)
+            index = numpy.array(index)
+            distance = field.distance[tiles[index]]
+            index = index[distance != UNREACHED]
+            distance = distance[distance != UNREACHED]
+            tile = tiles[index]
+            near = distance <= 1
+            tx, ty = target.position
+            gx[index] = numpy.where(near, tx, x[index] + field.step_x[tile] * s)
+            gy[index] = numpy.where(near, ty, y[index] + field.step_y[tile] * s)
+            guided[index] = True
+        return guided
@@ -1,19 +1,29 @@
 from glob import glob
 import geom
 import random
+import pyglet
 from math import cos, sin, radians, degrees, atan, atan2, pi, sqrt
 from pyglet.image import Animation, AnimationFrame, load
+from pyglet.image.atlas import TextureAtlas, AllocatorException
 #from pymunk.vec2d import Vec2d
 
 RANDOM_DELTA = 128
 
 from cocos.sprite import Sprite
+from cocos.cocosnode import CocosNode
 from cocos.actions.interval_actions import MoveBy
 from cocos.euclid import Point2
 from boids import merge, seek, cap, avoid_group
 #from shapes import BulletShape, RayShape, AgentShape, ZombieShape, WallShape
 #from tiless_editor.layers.collision import Circle
 import sound
+import projectiles
+import pools
+import profiler
+from spatialhash import SpatialHash
+from steering import SEPARATION_NEAR, SEPARATION_FAR
+from registry import Registry
+from tiless_editor.atlas import MyAllocator
 
 # NOTE: select wich class will be used as Zombie near EOF
 
@@ -21,6 +31,24 @@ COLLISION_GROUP_FATHER = 1
 
 COLLISION_DISTANCE_SQUARED = 64**2
 
+# collision distance for each (moving kind, other kind) pair. Every class
+# that lives in the agents node has a collision_kind.
+COLLISION_KINDS = ['zombie', 'relative', 'player', 'bullet', 'item']
+COLLISION_RADIUS = dict(((a, b), 96) for a in COLLISION_KINDS
+                                     for b in COLLISION_KINDS)
+COLLISION_RADIUS.update(((a, b), 64) for a in ['zombie', 'relative', 'player']
+                                     for b in ['zombie', 'relative', 'player', 'bullet'])
+COLLISION_RADIUS['zombie', 'zombie'] = 32
+COLLISION_DISTANCES = dict((k, r**2) for k, r in COLLISION_RADIUS.items())
+# no pair can collide from further away than one cell
+COLLISION_CELL_SIZE = max(COLLISION_RADIUS.values())
+# how close a shot has to pass to hit, for the kinds it can hit
+SHOT_RADIUS = dict((kind, COLLISION_RADIUS[kind, 'bullet'])
+                   for kind in ['zombie', 'relative', 'player'])
+
+# relatives further than this from dad feel alone
+ALONE_DISTANCE_SQUARED = 1100**2
+
 TOP_SPEED = 430
 ACCEL_FACTOR = 300
 
@@ -77,16 +105,80 @@ def globx(s):
     return li
 
 
+# every animation the agents play, so they can be loaded before the game starts
+ANIMATIONS = ['father_idle', 'father_walk',
+              'father_shotgun_idle', 'father_shotgun_walk',
+              'boy_idle', 'boy_walk',
+              'girl_idle', 'girl_walk',
+              'mother_idle', 'mother_walk',
+              'zombie1_idle', 'zombie1_walk',
+              'zombie2_idle', 'zombie2_walk',
+              'zombie3_idle', 'zombie3_walk',
+              ]
+ANIMATION_ATLAS_SIZE = 1024
+
+class FrameAtlas(object):
+    """
+    TextureBin look-alike that leaves a border around each image, so
+    rotated sprites don't pick up their neighbours' pixels
+    """
+    def __init__(self, size=ANIMATION_ATLAS_SIZE):
+        self.size = size
+        self.atlases = []
+
+    def add(self, img):
+        for atlas in self.atlases:
+            try:
+                return atlas.add(img)
+            except AllocatorException:
+                pass
+        atlas = TextureAtlas(self.size, self.size)
+        atlas.allocator = MyAllocator(self.size, self.size)
+        self.atlases.append(atlas)
+        return atlas.add(img)
+
+# where animation frames get packed
+frame_atlas = FrameAtlas()
+_animations = {}
+
 def get_animation(anim_name):
-    return Animation([AnimationFrame(load(img_file), 0.15)
-                      for img_file in  globx('data/img/%s*.png' % anim_name)])
+    """
+    Animations are loaded the first time they are asked for and then shared
+    by every sprite that plays them, so spawning agents never hits the disk.
+    """
+    animation = _animations.get(anim_name)
+    if animation is None:
+        animation = Animation([AnimationFrame(frame_atlas.add(load(img_file)), 0.15)
+                               for img_file in sorted(globx('data/img/%s*.png' % anim_name))])
+        first = animation.frames[0].image
+        animation.anchor = first.width / 2, first.height / 2
+        _animations[anim_name] = animation
+    return animation
+
+def preload_animations(names=ANIMATIONS):
+    for anim_name in names:
+        get_animation(anim_name)
 
 class Gore(Sprite):
-    def __init__(self, *a, **kw):
-        img = random.choice(self.images)
-        super(Gore, self).__init__(img, *a, **kw)
+    # pooled, see pools
+    def __init__(self, position, rotation):
+        self.path = random.choice(self.images)
+        super(Gore, self).__init__(self.path, position, rotation)
         self.scale = 1.5
 
+    def reset(self, position, rotation):
+        path = random.choice(self.images)
+        if path != self.path:
+            self.path = path
+            image = pyglet.resource.image(path)
+            self.image = image
+            self.image_anchor = image.width / 2, image.height / 2
+        self.stop()
+        self.position = position
+        self.rotation = rotation
+        self.scale = 1.5
+        self.opacity = 255
+
 class Blood(Gore):
     images = globx("data/img/sangre[0-9]*.png")
 
@@ -96,6 +188,42 @@ class BloodPool(Gore):
 class BodyParts(Gore):
     images = globx("data/img/cacho[0-9]*.png") + BloodPool.images
 
+class AgentsNode(CocosNode):
+    """
+    Parent node for everything that collides: agents, bullets and powerups.
+    Children are kept in a spatial hash, so collision checks only look at
+    what is near, and in a Registry per collision_kind, so the world tick
+    can step each kind in turn. Bullets sweep for what they hit themselves
+    and nothing looks for them, so they are not in the spatial hash.
+    Dad and the relatives are in the family registry too.
+    """
+    def __init__(self):
+        super(AgentsNode, self).__init__()
+        self.space = SpatialHash(COLLISION_CELL_SIZE)
+        self.by_kind = dict((kind, Registry()) for kind in COLLISION_KINDS)
+        self.family = Registry()
+
+    def __contains__(self, child):
+        return child in self.by_kind[child.collision_kind]
+
+    def add(self, child, z=0, name=None):
+        super(AgentsNode, self).add(child, z, name)
+        if child.collision_kind != 'bullet':
+            self.space.add(child)
+        self.by_kind[child.collision_kind].add(child)
+        if isinstance(child, Family):
+            self.family.add(child)
+        if profiler.on:
+            profiler.instant('spawn', kind=type(child).__name__, x=child.x, y=child.y)
+
+    def _remove(self, child):
+        super(AgentsNode, self)._remove(child)
+        self.space.remove(child)
+        self.by_kind[child.collision_kind].remove(child)
+        if isinstance(child, Family):
+            self.family.remove(child)
+
+
 class Agent(Sprite):
 
     def __init__(self, game_layer, img, position=(0,0)):
@@ -103,6 +231,10 @@ class Agent(Sprite):
         self.anims = {}
         self.game_layer = game_layer
         self.current_anim = 'idle'
+        # what play_anim last put on the sprite, None until it is called
+        self.current_animation = None
+        # times play_anim really changed the image
+        self.anim_switches = 0
 
         ###self.shape = AgentShape(self)
         self.just_born = True
@@ -110,7 +242,25 @@ class Agent(Sprite):
         self.collided_agent = None
         self.zombie_crash = 0
 
+    # the world tick calls these once per tick, in this order
+
+    def think(self, dt):
+        """ AI phase: decide where to go """
+
+    def move(self, dt):
+        """ movement phase: where we would like to be at the end of the tick """
+        self.next_position = self.position
+
+    def collide(self, dt):
+        """ collision phase: get as close to next_position as we are let """
+        self.update_position(self.next_position)
+
     def update_position(self, position):
+        self._move_and_collide(position)
+        # keep the broadphase bucket in sync with wherever we ended up
+        self.parent.space.move(self)
+
+    def _move_and_collide(self, position):
         self.collided_agent = None
         self.old_position = self.position
         self.position = position
@@ -118,13 +268,9 @@ class Agent(Sprite):
         # check collisions with static objects
         if not self.game_layer.is_empty(*self.position):
             if not self.just_born:
-                self.x = self.old_position[0]
-                if not self.game_layer.is_empty(*self.position):
-                    self.y = self.old_position[1]
-                    self.x = position[0]
-                    if not self.game_layer.is_empty(*self.position):
-                        self.position = self.old_position
-                        return
+                self.position = self.game_layer.wallmask.slide(self.old_position, position)
+                if self.position == self.old_position:
+                    return
             else:
                 self.x += random.random() * 40 - 20
                 self.y += random.random() * 40 - 20
@@ -133,48 +279,24 @@ class Agent(Sprite):
         if self.just_born:
             self.old_position = position
 
-        is_zombie = isinstance(self, Zombie)
-        is_family = isinstance(self, Relative)
-        # check collisions with dynamic objects
-        agents = self.parent.children
+        kind = self.collision_kind
+        if kind == 'relative':
+            px, py = self.player.position
+            distance = (self.position[0]-px)**2+(self.position[1]-py)**2
+            self.alone = distance > ALONE_DISTANCE_SQUARED
+
+        # check collisions with dynamic objects, only the ones in the
+        # neighbour cells can be close enough
+        agents = self.parent.space.near(*self.position)
         collided = False
-        for z, agent in agents:
+        for agent in agents:
             if agent is self: continue
             distance = (self.position[0]-agent.position[0])**2+(self.position[1]-agent.position[1])**2
-            if isinstance(agent, Zombie):
-                if is_zombie:
-                    collision_distance = 32**2
-                elif is_family:
-                    collision_distance = 64**2
-                elif self == self.game_layer.player:
-                    collision_distance = 64**2
-                else:
-                    collision_distance = 96**2
-            elif isinstance(agent, Family):
-                if is_zombie:
-                    collision_distance = 64**2
-                elif is_family:
-                    collision_distance = 64**2
-                elif self == self.game_layer.player:
-                    collision_distance = 64**2
-                else:
-                    collision_distance = 96**2
-            elif isinstance(agent, Bullet):
-                    collision_distance = 64**2
-            else:
-                collision_distance = 96**2
+            other_kind = agent.collision_kind
+            collision = distance <= COLLISION_DISTANCES[kind, other_kind]
 
-            collision = distance <= collision_distance
-
-            if is_zombie and isinstance(agent, Zombie):
+            if kind == 'zombie' and other_kind == 'zombie':
                 self.zombie_crash += 1
-            if is_family:
-                if isinstance(agent, Father):
-                    if distance > 1100**2:
-                        self.alone = True
-                    else:
-                        self.alone = False
-
 
             if collision:
                 collided = True
@@ -216,14 +338,24 @@ class Agent(Sprite):
 
 
     def play_anim(self, anim_name):
-        self.image = self.anims[anim_name]
-        self.image_anchor = (self.image.frames[0].image.width / 2,
-                             self.image.frames[0].image.height / 2)
+        """
+        switches to another animation. Setting the image restarts the frame
+        timer and rebuilds the sprite vertices, so it is only done when the
+        animation really changes: asking for the one that is already playing
+        is free.
+        """
+        animation = self.anims[anim_name]
         self.current_anim = anim_name
+        if animation is self.current_animation:
+            return
+        self.current_animation = animation
+        self.image = animation
+        self.image_anchor = animation.anchor
+        self.anim_switches += 1
 
     def on_collision(self, other):
         #print 'self', self, 'other', other
-        if isinstance(other, Bullet):
+        if other.collision_kind == 'bullet':
 #            if not isinstance(self, Father):
             if isinstance(self, Zombie):
                 bullet = other
@@ -245,7 +377,7 @@ class Agent(Sprite):
         return False
 
     def add_gore(self, gore_class, other, duration=5):
-        gore = gore_class((self.x, self.y), other.rotation)
+        gore = pools.acquire(gore_class, (self.x, self.y), other.rotation)
         dist = random.randrange(*BLOOD_SPLATTER_RANGE)
         alpha = radians(-other.rotation)
         gore.do(MoveBy( (cos(alpha)*dist, sin(alpha)*dist), BLOOD_SPLATTER_SECONDS))
@@ -266,6 +398,7 @@ class Family(Agent):
 
 class Father(Family):
     name = "Dad"
+    collision_kind = 'player'
     def __init__(self, game_layer, img, position):
         super(Father, self).__init__(game_layer, img, position)
         ###self.shape.group = COLLISION_GROUP_FATHER
@@ -273,7 +406,6 @@ class Father(Family):
         self._old_state = {'position': position}
         self.speed = 0
         self.position = position
-        self.schedule(self.update)
         self.game_layer = game_layer
         self.acceleration = 0
         self.updating = False
@@ -352,23 +484,23 @@ class Father(Family):
                 #sound.play('pickup_shotgun')
 
 
-    def update(self, dt):
+    def handle_input(self, dt):
+        """ input phase: the controls only set acceleration and rotation """
         # update speed
         if self.acceleration != 0 and abs(self.speed) < TOP_SPEED:
             self.speed += self.acceleration*ACCEL_FACTOR*dt
 
 ##        self.rotation += 110 * self.rotation_speed * dt
 
+    def move(self, dt):
         # update the position, based on the speed
         nx = (self.x + cos( radians(-self.rotation) ) * self.speed * dt)
         ny = (self.y + sin( radians(-self.rotation) ) * self.speed * dt)
         # FIXME: for some reason the x/y attributes don't update the position attribute correctly
-        new_position = (nx, ny)
-
-        self.update_position(new_position)
+        self.next_position = (nx, ny)
 
-        # update layer position (center camera)
-        self.game_layer.update(dt)
+    def collide(self, dt):
+        self.update_position(self.next_position)
         self.time_since_attack += dt
 
 
@@ -419,13 +551,37 @@ class Weapon(object):
 
 
 class RangedWeapon(Weapon):
-    def __init__(self, player, damage=100, atk_range=1000, frequency=0.6, sound='fire_shotgun'):
+    def __init__(self, player, damage=100, atk_range=1000, frequency=0.6, sound='fire_shotgun',
+                 pellets=1, spread=0):
         super(RangedWeapon, self).__init__(player, damage, atk_range, frequency, sound)
         self.ammo = 0
+        # shots per attack, and degrees between the outermost ones
+        self.pellets = pellets
+        self.spread = spread
+
+    def angles(self):
+        rotation = self.player.rotation
+        if self.pellets == 1:
+            return [rotation]
+        step = float(self.spread) / (self.pellets - 1)
+        return [rotation - self.spread/2. + i*step for i in range(self.pellets)]
 
     def attack(self):
-        projectile = Bullet('img/bullet.png', self.player)
-        self.player.game_layer.add_projectile(projectile)
+        game_layer = self.player.game_layer
+        if projectiles.HITSCAN:
+            # all pellets at once, no bullets to fly
+            x, y = self.player.position
+            angles = self.angles()
+            hits = projectiles.volley(game_layer.wallmask, game_layer.agents_node.space,
+                                      SHOT_RADIUS, self.player, x, y, angles, self.range)
+            for angle, (victim, point) in zip(angles, hits):
+                # an earlier pellet may have killed it already
+                if victim is not None and victim.life > 0:
+                    victim.on_collision(Shot(self.player, point, angle))
+            game_layer.muzzle_flash()
+        else:
+            for angle in self.angles():
+                game_layer.add_projectile(pools.acquire(Bullet, 'img/bullet.png', self.player, angle))
         self._play_sound()
         self.ammo -= 1
         if self.ammo < 1:
@@ -457,11 +613,12 @@ class ZombieMeleeWeapon(MeleeWeapon):
 
 
 class Relative(Family):
+    collision_kind = 'relative'
+
     def __init__(self, game_layer, img, position, player):
         super(Relative, self).__init__(game_layer, img, position)
         self._old_state = {}
         self.speed = 300
-        self.schedule(self.update)
         self.player = player
         self.updating = False
         self.collision = False
@@ -476,13 +633,12 @@ class Relative(Family):
         self.last_alone = False
         self.ammo = 0
 
-    def update(self, dt):
+    def think(self, dt):
         # move to designated target or stay and fight
 
         # save old position
         self._old_state = {'position': self.position, 'rotation': self.rotation}
 
-        locals = []
         if self.target and abs(Point2(*self.position) - Point2(*self.target) ) < 100:
             self.target = None
 
@@ -499,18 +655,20 @@ class Relative(Family):
             #max_r = 5*270
             #delta = cap(delta, -max_r, max_r) * dt
             #self.rotation += delta
-            self.rotation = goal
-            # FIXME: for some reason the x/y attributes don't update the position attribute correctly
-            self.position = (self.x, self.y)
-            self.rotation = self.rotation % 360
+            self.rotation = goal % 360
+
+    def move(self, dt):
+        if self.target:
             # update position
             a = -self.rotation
             nx = (self.x + cos( radians(a) ) * self.speed * dt)
             ny = (self.y + sin( radians(a) ) * self.speed * dt)
-
-            self.update_position((nx, ny))
+            self.next_position = (nx, ny)
         else:
-            self.update_position(self.position)
+            self.next_position = self.position
+
+    def collide(self, dt):
+        self.update_position(self.next_position)
 
         if not self.last_alone and self.alone:
             if random.random() < 0.10:
@@ -521,10 +679,8 @@ class Relative(Family):
 
         if self.position != self.old_position:
             self.play_anim('walk')
-
         else:
-            if self.current_anim != 'idle':
-                self.play_anim('idle')
+            self.play_anim('idle')
 
     def panic(self):
         self.target = random.choice(self.game_layer.waypoints_list)
@@ -616,11 +772,12 @@ class Mother(Relative):
 
 
 class Zombie(Agent):
+    collision_kind = 'zombie'
+
     def __init__(self, game_layer, img, player):
         super(Zombie, self).__init__(game_layer, img)
         self._old_state = {}
         self.speed = 100
-        self.schedule(self.update)
         self.player = player
         self.updating = False
         self.collision = False
@@ -644,9 +801,16 @@ class Zombie(Agent):
     def on_enter(self):
         super(Zombie, self).on_enter()
         self.pick_target()
+        if self.game_layer.herd is not None:
+            self.game_layer.herd.add(self)
+
+    def on_exit(self):
+        super(Zombie, self).on_exit()
+        if self.game_layer.herd is not None:
+            self.game_layer.herd.remove(self)
 
     def pick_target(self):
-        family = [ p for p in self.parent.get_children() if isinstance(p, Family) ]
+        family = self.parent.family
         if family:
             self.target = random.choice(
                 family
@@ -654,36 +818,34 @@ class Zombie(Agent):
         else:
             self.target = self
 
-    def update(self, dt):
+    def think(self, dt):
+        """ steering for a single zombie, when there is no herd to do it """
         # save old position
         self._old_state = {'position': self.position, 'rotation': self.rotation}
 
-        locals = []
+        # the other zombies too close, as the herd keeps away from
+        locals = [agent for agent in self.parent.space.near(*self.position)
+                  if agent is not self and agent.collision_kind == 'zombie' and
+                  (agent.x-self.x)**2 + (agent.y-self.y)**2 < SEPARATION_FAR**2]
         b = self
         self.last_goal += dt
         if self.last_goal > 0.3:
             self.last_goal = 0
-            if self.target is None:
-                target = self
-            else:
-                if self.target.life <= 0:
-                    self.pick_target()
-                target = self.target
-            self.goal = self.game_layer.ways.get_dest(self.position, self.target.position)
+            self.next_goal()
 
         gx, gy = self.goal
         goal = seek(b.x, b.y, gx, gy)
         #print "GOAL", goal
         escape, danger = avoid_group(b.x, b.y, locals)
         #print "danger", danger, escape
-        if danger < 50:
+        if danger < SEPARATION_NEAR:
             #print "escape"
             chosen = escape
-        elif danger > 100:
+        elif danger > SEPARATION_FAR:
             #print "goal"
             chosen = goal
         else:
-            d = (danger-50)/50
+            d = float(danger-SEPARATION_NEAR)/(SEPARATION_FAR-SEPARATION_NEAR)
             chosen = merge([(goal, d), (escape, 1-d)])
 
         #delta = geom.angle_rotation(radians(b.rotation), radians(chosen))
@@ -691,27 +853,38 @@ class Zombie(Agent):
         #max_r = 270
         #delta = cap(delta, -max_r, max_r) * dt
         #b.rotation += delta
-        b.rotation = chosen
+        b.rotation = chosen % 360
 
-        # FIXME: for some reason the x/y attributes don't update the position attribute correctly
-        b.position = (b.x, b.y)
-        b.rotation = b.rotation % 360
+    def move(self, dt):
         # update position
-        a = -b.rotation
-        nx = (b.x + cos( radians(a) ) * b.speed * dt)
-        ny = (b.y + sin( radians(a) ) * b.speed * dt)
+        a = -self.rotation
+        nx = (self.x + cos( radians(a) ) * self.speed * dt)
+        ny = (self.y + sin( radians(a) ) * self.speed * dt)
+        self.next_position = (nx, ny)
 
-        self.update_position((nx, ny))
+    def collide(self, dt):
+        self.advance(self.next_position, dt)
 
-        self.game_layer.update(dt)
+    def next_goal(self):
+        """ looks up the next waypoint on the way to the target """
+        if self.target is None:
+            target = self
+        else:
+            if self.target.life <= 0:
+                self.pick_target()
+            target = self.target
+        self.goal = self.game_layer.ways.get_dest(self.position, self.target.position)
+        return self.goal
+
+    def advance(self, position, dt):
+        """ moves to where steering took us, or as close as collisions let us """
+        self.update_position(position)
         self.time_since_attack += dt
 
         if self.position != self.old_position:
             self.play_anim('walk')
-
         else:
-            if self.current_anim != 'idle':
-                self.play_anim('idle')
+            self.play_anim('idle')
 
     def attack(self):
         if self.time_since_attack > self.weapon.frequency:
@@ -736,14 +909,36 @@ class Zombie(Agent):
 
 
 
+class Shot(object):
+    """ what a hitscan shot hits agents with, where a Bullet would be """
+    collision_kind = 'bullet'
+
+    def __init__(self, player, position, rotation):
+        self.player = player
+        self.position = position
+        self.rotation = rotation
+
+    def on_collision(self, other):
+        pass
+
+
 class Bullet(Sprite):
-    def __init__(self, img, player):
-        super(Bullet, self).__init__(img, player.position, player.rotation, player.scale)
+    # pooled, see pools
+    collision_kind = 'bullet'
 
+    def __init__(self, img, player, rotation=None):
+        super(Bullet, self).__init__(img)
         self.anims = {}
+        self.reset(img, player, rotation)
+
+    def reset(self, img, player, rotation=None):
+        if rotation is None:
+            rotation = player.rotation
+        self.position = player.position
+        self.rotation = rotation
+        self.scale = player.scale
         self.player = player
         self.speed = 1000
-        self.schedule(self.update)
 
 
         # get target
@@ -764,22 +959,27 @@ class Bullet(Sprite):
         ###shape.group = player.shape.group
         ###self.shape = shape
 
-    def update(self, dt):
-        goal = seek(self.x, self.y, self.target[0], self.target[1])
-
-        self.position = (self.x, self.y)
+    def move(self, dt):
         # update position
         a = -self.rotation
         nx = (self.x + cos( radians(a) ) * self.speed * dt)
         ny = (self.y + sin( radians(a) ) * self.speed * dt)
+        self.next_position = (nx, ny)
 
-        #print 'updating bullet position', self.position, (nx,ny)
-        self.update_position((nx, ny))
-        # FIXME: this goes away as soon as bullets collide agains walls
-##         if nx > 1000 or nx < -1000 or ny > 1000 or ny < -1000:
-##             self.hit()
-        if not self.player.game_layer.is_empty(*self.position):
-            self.hit()
+    def collide(self, dt):
+        # the first wall or agent between here and next_position stops the
+        # bullet, however thin or fast
+        game_layer = self.player.game_layer
+        x1, y1 = self.next_position
+        victim, point = projectiles.sweep(game_layer.wallmask, self.parent.space,
+                                          SHOT_RADIUS, self.player, self.x, self.y, x1, y1)
+        if point is None:
+            self.update_position(self.next_position)
+            return
+        self.update_position(point)
+        self.hit()
+        if victim is not None:
+            victim.on_collision(self)
 
     def update_position(self, position):
         self.position = position
@@ -798,14 +998,6 @@ class Bullet(Sprite):
         game_layer.dead_items.add(self)
 
 
-class Ray(Sprite):
-    def __init__(self, agent, target):
-        super(Ray, self).__init__('img/bullet.png', agent.position, agent.rotation, agent.scale)
-        ###shape = RayShape(self, agent.position, target)
-        ###shape.group = agent.shape.group
-        ###self.shape = shape
-
-
 class Wall(Sprite):
     def __init__(self, child):
         img = {'filename': child.path, 'position': child.position,
@@ -820,6 +1012,8 @@ class Wall(Sprite):
         ###self.shape = WallShape(self)
 
 class PowerUp(Sprite):
+    collision_kind = 'item'
+
     def __init__(self, type, position, game_layer):
         image = 'hud/%s.png' % type
         super(PowerUp, self).__init__(image, position)
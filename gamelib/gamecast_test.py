@@ -0,0 +1,43 @@
+import os
+
+import pyglet
+
+import headless
+import gamecast
+from gamecast import Zombie, get_animation
+
+def setup():
+    """ what main does before agents are made, headless """
+    basepath = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    pyglet.resource.path.extend([basepath, os.path.join(basepath, 'data')])
+    pyglet.resource.reindex()
+    gamecast.frame_atlas = headless.NullBin()
+
+def test_anim_switches(frames=300, dt=1/60.):
+    """
+    a zombie walking steadily swaps its image once, not once a frame.
+    Sprites load images, run it headless or with a window
+    """
+    setup()
+    zombie = Zombie(None, get_animation('zombie1_idle'), None)
+    assert zombie.anim_switches == 0
+    zombie.play_anim('walk')
+    assert zombie.anim_switches == 1
+    for i in range(frames):
+        zombie._animate(dt)
+        # the animation goes on, it isn't started over every frame
+        at = zombie._frame_index
+        zombie.play_anim('walk')
+        assert zombie._frame_index == at
+    assert zombie.anim_switches == 1
+    assert zombie.current_anim == 'walk'
+    # each change of state is one swap
+    for anim_name, switches in [('idle', 2), ('idle', 2), ('walk', 3), ('walk', 3),
+                                ('idle', 4)]:
+        zombie.play_anim(anim_name)
+        assert zombie.anim_switches == switches, (anim_name, zombie.anim_switches)
+        assert zombie.image is zombie.anims[anim_name]
+    print 'test anim switches ok'
+
+if __name__ == '__main__':
+    test_anim_switches()
@@ -7,6 +7,22 @@ from cocos.layer.base_layers import Layer
 from cocos.sprite import Sprite
 from cocos.actions import ScaleTo
 
+def make_faces(scale):
+    """ the faces of the family, side by side at the bottom right """
+    x, y = director.get_window_size()
+    faces = {}
+    space = 0
+    for who in ["Dad", "Mom", "Zack", "Bee"]:
+        sprite = Sprite('faces/%s.png'%who)
+        faces[who] = sprite
+        sprite.scale = scale
+        sprite.position = (
+            x-space-sprite.image.width*scale/2,
+            sprite.image.height*scale/2
+        )
+        space += sprite.image.width*scale + 10
+    return faces
+
 class HudLayer(cocos.layer.Layer):
     def __init__(self, life=100, bullets=100):
         super(HudLayer, self).__init__()
@@ -28,20 +44,10 @@ class HudLayer(cocos.layer.Layer):
         self.add(self.bullets_ico)
         self.add(self.bullets_label)
 
-        self.faces = {}
+        self.face_scale = 0.7
+        self.faces = make_faces(self.face_scale)
         self.deads = []
-        space = 0
-        self.face_scale = scale = 0.7
-        for who in ["Dad", "Mom", "Zack", "Bee"]:
-            sprite = Sprite('faces/%s.png'%who)
-            self.faces[who] = sprite
-            sprite.scale = scale
-            sprite.position = (
-                x-space-sprite.image.width*scale/2,
-                sprite.image.height*scale/2
-            )
-            space += sprite.image.width*scale + 10
-
+        for sprite in self.faces.values():
             self.add(sprite)
 
     def set_life(self, who, life):
@@ -55,3 +61,20 @@ class HudLayer(cocos.layer.Layer):
 
     def set_bullets(self, bullets):
         self.bullets_label.element.text = str(bullets)
+
+
+class NullHudLayer(cocos.layer.Layer):
+    """ for headless runs: keeps what the game reads back, shows nothing """
+    def __init__(self, life=100, bullets=100):
+        super(NullHudLayer, self).__init__()
+        # where the real ones are, clicks on them select a relative
+        self.faces = make_faces(0.7)
+        self.deads = []
+        self.bullets = bullets
+
+    def set_life(self, who, life):
+        if life <= 0:
+            self.deads.append(who)
+
+    def set_bullets(self, bullets):
+        self.bullets = bullets
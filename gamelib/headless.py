@@ -0,0 +1,242 @@
+""" Headless mode
+
+Steps the game world at a fixed dt with no window, no GL context and no
+audio, as fast as the CPU allows. Meant for soak testing AI and collision:
+
+    python run_game.py --headless --ticks 36000 --seed 1
+
+setup() must run before cocos gets imported: it keeps pyglet from opening
+its shadow window, puts a context that owns no GL objects in place of the
+real one and makes image loading return size-only textures. Sprites can be
+created, moved and animated, they are just never drawn.
+
+Text needs GL to be laid out, so the game swaps the HUD and talk layers
+for gamehud.NullHudLayer and talk.NullTalkLayer.
+"""
+import random
+import struct
+import time
+import warnings
+
+import pyglet
+import pyglet.clock
+
+import pools
+
+WINDOW_SIZE = 1024, 768
+TICK = 1/60.
+
+PNG_SIGNATURE = '\x89PNG\r\n\x1a\n'
+
+
+class NullContext(object):
+    """ stands for the GL context; vertex lists stay in client memory """
+    def __init__(self):
+        from pyglet.gl import ObjectSpace
+        self.object_space = ObjectSpace()
+
+
+def null_image(width, height):
+    from pyglet import gl
+    from pyglet.image import Texture
+    return Texture(width, height, gl.GL_TEXTURE_2D, 0)
+
+def image_size(filename, file=None):
+    if file is None:
+        file = open(filename, 'rb')
+    head = file.read(24)
+    if head[:8] == PNG_SIGNATURE:
+        return struct.unpack('>II', head[16:24])
+    # not worth parsing, decoding does not need GL either
+    file.seek(0)
+    img = _load(filename, file)
+    return img.width, img.height
+
+_images = {}
+def load(filename, file=None, decoder=None):
+    """ pyglet.image.load, without decoding the pixels """
+    if filename not in _images:
+        _images[filename] = null_image(*image_size(filename, file))
+    return _images[filename]
+
+def resource_image(name, flip_x=False, flip_y=False, rotate=0):
+    """ pyglet.resource.image, without decoding the pixels """
+    if name not in _images:
+        _images[name] = null_image(*image_size(name, pyglet.resource.file(name)))
+    return _images[name]
+
+
+class NullBin(object):
+    """ TextureBin look-alike: images stay as they are """
+    def add(self, img):
+        return img
+
+
+class NullAtlas(object):
+    """ SavedAtlas look-alike: same regions, no texture behind them """
+    def __init__(self, atlas_img, coords_file):
+        import simplejson
+        self.atlas = None
+        self.image = pyglet.image.load(atlas_img)
+        self.map = dict([
+            (k, null_image(rect[2], rect[3]))
+            for k, rect in simplejson.load(open(coords_file)).items()])
+
+    def __getitem__(self, key):
+        return self.map[key]
+
+
+_load = None
+def setup():
+    global _load
+    pyglet.options['shadow_window'] = False
+    pyglet.options['graphics_vbo'] = False
+    pyglet.options['audio'] = ('silent',)
+    warnings.filterwarnings('ignore', 'No GL context created yet.')
+
+    from pyglet import gl
+    gl.current_context = NullContext()
+
+    from pyglet import image, resource
+    _load = image.load
+    image.load = load
+    resource.image = resource_image
+    # what tiless_editor.atlas.load_saved makes
+    from tiless_editor import atlas
+    atlas.SavedAtlas = NullAtlas
+
+    # the parts of director.init() that do not need a window
+    from cocos.director import director
+    director.scene_stack = []
+    director.scene = None
+    director.next_scene = None
+    director._window_original_width, director._window_original_height = WINDOW_SIZE
+    director.return_value = None
+
+
+class Timed(object):
+    """
+    wraps a scheduled function to add up the time spent in it. Compares
+    equal to the function, so unscheduling still works
+    """
+    def __init__(self, func, timings):
+        self.func = func
+        self.timings = timings
+        self.name = subsystem_name(func)
+
+    def __call__(self, *args, **kwargs):
+        t = time.time()
+        self.func(*args, **kwargs)
+        spent, calls = self.timings.get(self.name, (0.0, 0))
+        self.timings[self.name] = spent + time.time() - t, calls + 1
+
+    def __eq__(self, other):
+        return self.func == other
+
+    def __ne__(self, other):
+        return self.func != other
+
+def subsystem_name(func):
+    """ 'Class.method' of the class that defines a scheduled method """
+    owner = getattr(func, 'im_self', None)
+    if owner is None:
+        return getattr(func, '__name__', repr(func))
+    name = func.__name__
+    for cls in type(owner).__mro__:
+        if name in cls.__dict__:
+            return '%s.%s' % (cls.__name__, name)
+    return '%s.%s' % (type(owner).__name__, name)
+
+
+class SimClock(pyglet.clock.Clock):
+    """ a clock that only moves when told to, and times its callbacks """
+    def __init__(self):
+        self.now = 0.0
+        super(SimClock, self).__init__(time_function=lambda: self.now)
+        self.timings = {}
+
+    def schedule(self, func, *args, **kwargs):
+        super(SimClock, self).schedule(Timed(func, self.timings), *args, **kwargs)
+
+    def _schedule_item(self, func, *args, **kwargs):
+        super(SimClock, self)._schedule_item(Timed(func, self.timings), *args, **kwargs)
+
+    def step(self, dt):
+        self.now += dt
+        self.tick(poll=True)
+
+
+def set_scene(scene):
+    from cocos.director import director
+    director.next_scene = None
+    if director.scene is not None:
+        director.scene.on_exit()
+    director.scene = scene
+    scene.on_enter()
+
+def run(make_scene, ticks, seed=None, dt=TICK, feed=None):
+    """
+    builds a game scene with make_scene() and steps it ticks times.
+    feed(scene) is called before each step, to put input in. The world
+    tick is profiled, so its phases get a row each under World.step
+    """
+    from cocos.director import director
+    import profiler
+    from world import PHASES
+    if seed is None:
+        seed = random.randrange(2**31)
+    random.seed(seed)
+    clock = SimClock()
+    pyglet.clock.set_default(clock)
+    # the first tick sets when the frames count from, so every step is dt
+    clock.tick(poll=True)
+
+    phases = {}
+    def add_phases(frame_start, frame_end, spans):
+        for name, t0, t1, depth in spans:
+            if t1 is not None and name in PHASES:
+                spent, calls = phases.get(name, (0.0, 0))
+                phases[name] = spent + t1 - t0, calls + 1
+    profiler.listeners.append(add_phases)
+    profiler.start()
+
+    games = 0
+    start = time.time()
+    director.next_scene = make_scene()
+    setup_time = time.time() - start
+    for tick in xrange(ticks):
+        if director.next_scene is not None:
+            t = time.time()
+            set_scene(director.next_scene)
+            setup_time += time.time() - t
+            games += 1
+        if feed is not None:
+            feed(director.scene)
+        clock.step(dt)
+    total = time.time() - start
+    # the last tick's frame ends here
+    profiler.next_frame()
+    profiler.stop()
+    profiler.listeners.remove(add_phases)
+
+    print "seed %d: %d ticks, %.0f simulated seconds, %d games" % (
+        seed, ticks, ticks*dt, games)
+    print "%.2f s, %.1f ticks per second" % (total, ticks/total)
+    print
+    print "%-32s %10s %10s %10s" % ("subsystem", "total s", "ms/tick", "calls")
+    rows = [(spent, name, calls) for name, (spent, calls) in clock.timings.items()]
+    rows.sort(reverse=True)
+    rows.append((setup_time, "(scene setup)", games))
+    for spent, name, calls in rows:
+        print "%-32s %10.3f %10.4f %10d" % (name, spent, spent/ticks*1000, calls)
+        if name == 'World.step':
+            for phase in PHASES:
+                spent, calls = phases.get(phase, (0.0, 0))
+                print "  %-30s %10.3f %10.4f %10d" % (phase, spent, spent/ticks*1000, calls)
+
+    counts = pools.counts()
+    if counts:
+        print
+        print "%-32s %10s %10s %10s" % ("pool", "live", "pooled", "made")
+        for name, (live, pooled, made) in sorted(counts.items()):
+            print "%-32s %10d %10d %10d" % (name, live, pooled, made)
@@ -0,0 +1,95 @@
+""" Hitch recorder
+
+A flight recorder for slow frames. It keeps the frames of the last
+SECONDS, as the profiler cuts them, and when one takes longer than the
+budget it writes a snapshot to the log directory:
+
+    python run_game.py --hitches logs --hitch-budget 25
+
+A snapshot is a Chrome trace of the frames kept, with a 'hitch' key
+telling how long the slow frame took, its slowest spans, the agents
+spawned during it and how much of it no span accounts for (events, the
+buffer flip, scene changes outside a callback). Open it in
+chrome://tracing or https://ui.perfetto.dev, or just read the top.
+
+Slow frames tend to come in runs, as while a scene is built, so after a
+snapshot the next COOLDOWN seconds are not written again; they are in
+the next snapshot anyway if one comes soon.
+"""
+import collections
+import os
+import time
+
+import simplejson
+
+import profiler
+
+# two frames at 60 fps
+BUDGET = 1/30.
+SECONDS = 5
+COOLDOWN = 1.0
+# spans named in a snapshot
+SLOWEST = 10
+
+
+class FlightRecorder(object):
+    def __init__(self, logdir, budget=BUDGET, seconds=SECONDS):
+        self.logdir = logdir
+        self.budget = budget
+        self.seconds = seconds
+        self.frames = collections.deque()
+        self.last_dump = None
+        self.dumps = 0
+
+    def start(self):
+        if not os.path.isdir(self.logdir):
+            os.makedirs(self.logdir)
+        profiler.listeners.append(self.on_frame)
+        profiler.start()
+
+    def stop(self):
+        profiler.stop()
+        profiler.listeners.remove(self.on_frame)
+
+    def on_frame(self, start, end, spans):
+        frames = self.frames
+        frames.append((start, end, spans))
+        while frames[0][1] < end - self.seconds:
+            frames.popleft()
+        if end - start > self.budget:
+            if self.last_dump is None or end - self.last_dump > COOLDOWN:
+                self.dump(start, end, spans)
+                self.last_dump = end
+
+    def snapshot(self, start, end, spans):
+        """ what is told about the frame from start to end """
+        timed = [(stop - t, name, depth) for name, t, stop, depth in spans
+                 if stop is not None]
+        timed.sort(reverse=True)
+        spawned = {}
+        for name, t, stop, args in spans:
+            if stop is None and name == 'spawn':
+                spawned[args['kind']] = spawned.get(args['kind'], 0) + 1
+        accounted = sum([spent for spent, name, depth in timed if depth == 0])
+        return {
+            'frame_ms': (end - start) * 1000,
+            'budget_ms': self.budget * 1000,
+            'slowest': [{'name': name, 'ms': spent * 1000, 'depth': depth}
+                        for spent, name, depth in timed[:SLOWEST]],
+            'spawned': spawned,
+            'unaccounted_ms': (end - start - accounted) * 1000,
+            'frames_ms': [(e - s) * 1000 for s, e, f in self.frames],
+        }
+
+    def dump(self, start, end, spans):
+        self.dumps += 1
+        filename = os.path.join(self.logdir, 'hitch-%s-%03d.json' % (
+            time.strftime('%Y%m%d-%H%M%S'), self.dumps))
+        hitch = self.snapshot(start, end, spans)
+        f = open(filename, 'w')
+        simplejson.dump({'hitch': hitch, 'displayTimeUnit': 'ms',
+                         'traceEvents': profiler.trace_events(list(self.frames))}, f)
+        f.close()
+        print "%.1f ms frame, slowest %s: %s" % (
+            hitch['frame_ms'],
+            hitch['slowest'] and hitch['slowest'][0]['name'] or 'none', filename)
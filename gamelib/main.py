@@ -8,7 +8,6 @@ package.
 
 import os.path
 import pyglet
-import simplejson
 import sys
 import random
 import optparse
@@ -35,22 +34,38 @@ from tiless_editor.plugins.sprite_layer import SpriteLayerFactory
 #from tiless_editor.layers.collision import CollisionLayer
 from tiless_editor.tiless_editor import LayersNode
 from tiless_editor.tilesslayer import TilessLayer
-from tiless_editor.atlas import SavedAtlas
+from tiless_editor.atlas import load_saved
 
 from walls import create_wall_layer
 import talk
 import gamehud
 import sound
 from light import Light
+from staticlayer import StaticLayer
 import waypointing
-
-from gamecast import Agent, Father, Zombie, Boy, Girl, Mother, Wall, Ray, get_animation
+import steering
+import flowfield
+import projectiles
+import pools
+import replay
+import mapdata
+import profiler
+import hitches
+from world import World
+import headless
+
+import gamecast
+from gamecast import AgentsNode, Agent, Father, Zombie, Boy, Girl, Mother, Wall, get_animation
+from gamecast import preload_animations
 from gamecast import PowerUp, POWERUP_TYPE_AMMO_LIST, POWERUP_TYPE_LIFE_LIST
 from gamectrl import MouseGameCtrl, KeyGameCtrl
 from wallmask import WallMask
+from registry import Registry
 
 #WIDTH, HEIGHT = 1024, 768
 MAPFILE = 'data/map.json'
+ATLAS_IMAGE = 'data/atlas-fixed.png'
+ATLAS_COORDS = 'data/atlas-coords.json'
 RETREAT_DELAY = 0.1
 
 ZOMBIE_WAVE_COUNT = 4
@@ -77,11 +92,21 @@ def get_intro_scene():
     scene.add(image_layer)
     return scene
 
+# a replay.Recorder with --record
+recorder = None
+
+@profiler.timed('get_game_scene')
 def get_game_scene():
     global has_grabber
+    if recorder is not None and not recorder.started:
+        recorder.start(director.get_window_size())
     # create game scene
-    hud_layer = gamehud.HudLayer()
-    game_layer = GameLayer(MAPFILE, hud_layer, has_grabber)
+    if options.headless:
+        hud_layer = gamehud.NullHudLayer()
+    else:
+        hud_layer = gamehud.HudLayer()
+    game_layer = GameLayer(MAPFILE, hud_layer,
+                           has_grabber and not options.headless)
 
     scene = Scene()
     scene.add(game_layer)
@@ -90,12 +115,20 @@ def get_game_scene():
         from gamectrl_wpt import MouseGameCtrl, KeyGameCtrl
     else:
         from gamectrl import MouseGameCtrl, KeyGameCtrl
-    scene.add(KeyGameCtrl(game_layer))
-    scene.add(MouseGameCtrl(game_layer))
+    key_ctrl = KeyGameCtrl(game_layer)
+    mouse_ctrl = MouseGameCtrl(game_layer)
+    if recorder is not None and recorder.game_layer is None:
+        recorder.watch(key_ctrl)
+        recorder.watch(mouse_ctrl)
+    scene.add(key_ctrl)
+    scene.add(mouse_ctrl)
 
     return scene
 
 def get_end_scene():
+    if options.headless:
+        # nobody there to answer, play again
+        return get_game_scene()
     scene = Scene()
     scene.add(GameOverLayer())
     return scene
@@ -112,15 +145,66 @@ def main():
                       help="set window width", metavar="WIDTH")
     parser.add_option("-y", "--height", type="int", dest="height", default='768',
                       help="set window height", metavar="HEIGHT")
+    parser.add_option("--headless",
+                      action="store_true", dest="headless", default=False,
+                      help="simulate without window nor audio")
+    parser.add_option("--ticks", type="int", dest="ticks", default=3600,
+                      help="ticks to simulate when headless", metavar="N")
+    parser.add_option("--seed", type="int", dest="seed", default=None,
+                      help="random seed for headless runs", metavar="S")
+    parser.add_option("--no-flowfields",
+                      action="store_false", dest="flowfields", default=True,
+                      help="zombies follow waypoints instead of flow fields")
+    parser.add_option("--record", dest="record", default=None,
+                      help="record the first game to FILE", metavar="FILE")
+    parser.add_option("--replay", dest="replay", default=None,
+                      help="play FILE again, headless", metavar="FILE")
+    parser.add_option("--hitscan",
+                      action="store_true", dest="hitscan", default=False,
+                      help="shots hit at once, with no bullets flying")
+    parser.add_option("--hitches", dest="hitches", default=None,
+                      help="write snapshots of slow frames to DIR", metavar="DIR")
+    parser.add_option("--hitch-budget", type="float", dest="hitch_budget",
+                      default=hitches.BUDGET * 1000,
+                      help="frames slower than MS are hitches", metavar="MS")
+    parser.add_option("--trace", dest="trace", default=None,
+                      help="profile a headless run, writing the last "
+                           "frames as a Chrome trace to FILE", metavar="FILE")
     # need no enemies while waypointing, and another on_key
-    global options
+    global options, recorder
     (options, args) = parser.parse_args()
+    projectiles.HITSCAN = options.hitscan
+    if options.replay:
+        options.headless = True
 
     # fix pyglet resource path
     basepath = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
     pyglet.resource.path.append(basepath)
     pyglet.resource.reindex()
 
+    profiler.install()
+    if options.hitches:
+        hitches.FlightRecorder(options.hitches, options.hitch_budget / 1000.).start()
+
+    if options.headless:
+        # sprites name their images relative to the data dir
+        pyglet.resource.path.append(os.path.join(basepath, 'data'))
+        pyglet.resource.reindex()
+        sound.init(audio=False)
+        gamecast.frame_atlas = headless.NullBin()
+        if options.trace:
+            profiler.start()
+        if options.replay:
+            replay.Replay(options.replay).run(get_game_scene)
+        else:
+            headless.run(get_game_scene, options.ticks, options.seed)
+        if options.trace:
+            print "wrote %d spans to %s" % (profiler.export(options.trace), options.trace)
+        return
+
+    if options.record:
+        recorder = replay.Recorder(options.record, options.seed)
+
     #Fonts stuff
     fonts_path = os.path.join(basepath, 'data/fonts')
     font.add_directory(fonts_path)
@@ -154,6 +238,7 @@ def main():
     # initialize cocos director
     director.init(fullscreen=True)
 #    director.init(options.width, options.height, resizable=True)
+    profiler.show_overlay(director.window)
     sound.init()
 
     director.set_3d_projection()
@@ -166,22 +251,22 @@ def main():
     director.run(scene)
 
 def make_sprites_layer(layer_data, atlas):
-    saved_atlas = SavedAtlas('data/atlas-fixed.png', 'data/atlas-coords.json')
-
-    def build_sprite(img):
-        rect = img['rect']
-        region = saved_atlas[img['filename']]
-        s = Sprite(region,
-                   img['position'], img['rotation'], img['scale'], img['opacity'])
-        s.label = img['label'] if "label" in img else None
-        s.path = img['filename']
-        s.rect =img['rect']
-        return s
-
+    """ a BatchNode with the sprites of a mapdata.SpriteLayer """
+    saved_atlas = load_saved(ATLAS_IMAGE, ATLAS_COORDS)
+    strings = layer_data.strings
+    regions = {}
     layer = BatchNode()
-    for item in layer_data["sprites"]:
-        sprite = build_sprite(item)
-        layer.add(sprite)
+    for i in xrange(len(layer_data)):
+        filename = layer_data.filenames[i]
+        if filename not in regions:
+            regions[filename] = saved_atlas[strings[filename]]
+        s = Sprite(regions[filename], (layer_data.x[i], layer_data.y[i]),
+                   layer_data.rotation[i], layer_data.scale[i], layer_data.opacity[i])
+        label = layer_data.labels[i]
+        s.label = label >= 0 and strings[label] or None
+        s.path = strings[filename]
+        s.rect = layer_data.rects[4*i:4*i+4].tolist()
+        layer.add(s)
     return layer
 
 class ImageLayer(Layer):
@@ -321,14 +406,27 @@ class GameOverLayer(Layer):
 
 
 class DeadStuffLayer(cocos.cocosnode.CocosNode):
-    """Everything added to this node disappears a few seconds later"""
+    """
+    Everything added to this node disappears a few seconds later, and goes
+    back to its pool
+    """
 
     def __init__(self):
         super(DeadStuffLayer, self).__init__()
 
     def add(self, child, duration=5, **kw):
         super(DeadStuffLayer, self).add(child, **kw)
-        child.do(Delay(duration) + FadeOut(1) + CallFunc(lambda: self.remove(child)))
+        child.do(Delay(duration) + FadeOut(1) + CallFunc(self.expire, child))
+
+    def expire(self, child):
+        self.remove(child)
+        pools.release(child)
+
+    def on_exit(self):
+        super(DeadStuffLayer, self).on_exit()
+        # the game is over, what is still fading out won't be seen again
+        for child in self.get_children():
+            self.expire(child)
 
 class GameLayer(Layer):
     is_event_handler = True
@@ -347,11 +445,24 @@ class GameLayer(Layer):
             self.grabber.grab(self.texture)
 
         self.map_node = LayersNode()
-        self.projectiles = []
-        self.dead_items = set()
+        # precomputed routes between waypoints, rebuilt when the map changes
+        self.nav_cache_file = os.path.splitext(mapfile)[0] + '-nav.npz'
+        # a Registry and not a set, so they go in the order they died
+        self.dead_items = Registry()
         self.wallmask = WallMask()
-        self.agents_node = LayersNode()
-
+        self.agents_node = AgentsNode()
+        # what is in agents_node, by type; the node keeps them up to date
+        self.zombies = self.agents_node.by_kind['zombie']
+        self.family = self.agents_node.family
+        self.projectiles = self.agents_node.by_kind['bullet']
+        self.powerups = self.agents_node.by_kind['item']
+        if steering.numpy is not None:
+            self.herd = steering.Herd()
+            self.herd.space = self.agents_node.space
+        else:
+            self.herd = None
+        self.world = World(self)
+        self.schedule(self.world.step)
 
         # get layers from map
         collision_layers = []
@@ -361,11 +472,8 @@ class GameLayer(Layer):
         self.zombie_wave_number = 0
         self.schedule(self.respawn_zombies)
 
-        img = pyglet.image.load(  'data/atlas-fixed.png' )
-        self.atlas = pyglet.image.atlas.TextureAtlas( img.width, img.height )
-        self.atlas.texture = img.texture
-        pyglet.gl.glTexParameteri( img.texture.target, pyglet.gl.GL_TEXTURE_WRAP_S, pyglet.gl.GL_CLAMP_TO_EDGE )
-        pyglet.gl.glTexParameteri( img.texture.target, pyglet.gl.GL_TEXTURE_WRAP_T, pyglet.gl.GL_CLAMP_TO_EDGE )
+        # None when headless
+        self.atlas = load_saved(ATLAS_IMAGE, ATLAS_COORDS).atlas
 
         self.show_fire_frames = 0
         self.fire_lights = Layer()
@@ -373,15 +481,14 @@ class GameLayer(Layer):
         self.fire_light.scale = 1
         self.fire_lights.add(self.fire_light)
 
-        layers = simplejson.load(open(mapfile))['layers']
-        for layer_data in layers:
-            layer_type = layer_data['layer_type']
-            layer_label = layer_data['label']
+        for layer_data in mapdata.load(mapfile):
+            layer_type = layer_data.layer_type
+            layer_label = layer_data.label
             if layer_type == 'sprite':
-                sprite_layer = make_sprites_layer(layer_data['data'], self.atlas)
+                sprite_layer = make_sprites_layer(layer_data, self.atlas)
                 if layer_label in ["floor", "furninture"]:
-                    self.map_node.add_layer(layer_data['label'], layer_data['z'],
-                                       sprite_layer)
+                    self.map_node.add_layer(layer_data.label, layer_data.z,
+                                       StaticLayer(sprite_layer.get_children()))
                 if layer_label in ['walls', 'furninture']:
                     collision_layers.append(sprite_layer)
                 if layer_label in ['walls', 'gates']:
@@ -404,7 +511,8 @@ class GameLayer(Layer):
         # create collision shapes
         ###collision_layer = self._create_collision_layer(for_collision_layers)
         ###self.map_node.add_layer('collision', 1000, collision_layer)
-        self.map_node.add(create_wall_layer(walls_layers), z=10)
+        if not options.headless:
+            self.map_node.add(create_wall_layer(walls_layers), z=10)
         # add scene map node to the main layer
         self.add(self.map_node)
 
@@ -412,7 +520,10 @@ class GameLayer(Layer):
 
         # talk queue
         self.hud = hud
-        self.talk_layer = talk.TalkLayer()
+        if options.headless:
+            self.talk_layer = talk.NullTalkLayer()
+        else:
+            self.talk_layer = talk.TalkLayer()
         self.hud.add(self.talk_layer, z=10)
         #self.talk("Dad", "DAMN ZOMBIES!!!! Where's my shotgun!!!")
         #self.talk("Dad", "hello hello hello"*5)
@@ -429,6 +540,9 @@ class GameLayer(Layer):
                 self.wallmask.add(child)
         # now is safe to call self.is_empty()
 
+        # decode every agent animation now, not when the first wave comes
+        preload_animations()
+
         # create agents (player and NPCs)
         self._create_agents()
 
@@ -484,14 +598,22 @@ class GameLayer(Layer):
         try:
 
             # capture before drawing
-            self.grabber.before_render(self.texture)
+            profiler.begin('grab')
+            try:
+                self.grabber.before_render(self.texture)
+            finally:
+                profiler.end()
 
             # render scene
             super(GameLayer, self).visit()
 
             # psot render
             # capture after drawing
-            self.grabber.after_render(self.texture)
+            profiler.begin('grab')
+            try:
+                self.grabber.after_render(self.texture)
+            finally:
+                profiler.end()
 
             ambient = 0.1
             gl.glClearColor(ambient,ambient,ambient,ambient)
@@ -504,10 +626,14 @@ class GameLayer(Layer):
             #gl.glBlendFunc( gl.GL_ONE, gl.GL_ONE );
             #gl.glBlendEquation(gl.GL_MAX);
 
-            self.lights.visit()
-            if self.show_fire_frames > 0:
-                self.fire_lights.visit()
-                self.show_fire_frames -= 1
+            profiler.begin('lights')
+            try:
+                self.lights.visit()
+                if self.show_fire_frames > 0:
+                    self.fire_lights.visit()
+                    self.show_fire_frames -= 1
+            finally:
+                profiler.end()
 
             gl.glPopMatrix()
 
@@ -518,15 +644,19 @@ class GameLayer(Layer):
             #gl.glBlendEquation(gl.GL_FUNC_ADD);
 
             # blit
-            gl.glEnable(self.texture.target)
-            gl.glBindTexture(self.texture.target, self.texture.id)
+            profiler.begin('blit')
+            try:
+                gl.glEnable(self.texture.target)
+                gl.glBindTexture(self.texture.target, self.texture.id)
 
-            gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
+                gl.glPushAttrib(gl.GL_COLOR_BUFFER_BIT)
 
-            self.texture.blit(0,0)
+                self.texture.blit(0,0)
 
-            gl.glPopAttrib()
-            gl.glDisable(self.texture.target)
+                gl.glPopAttrib()
+                gl.glDisable(self.texture.target)
+            finally:
+                profiler.end()
         except pyglet.gl.GLException:
             print "***"*1000, "nograbber"
             self.has_grabber = False
@@ -538,43 +668,24 @@ class GameLayer(Layer):
 
     def setup_waypoints(self, layer):
         print "Setting up navigation..."
-        self.waypoints_list = points = [ c.position for c in layer.get_children() ]
-        def is_visible(p, q):
-            if p == q:
-                return True
-
-            p = euclid.Vector2(*p)
-            q = euclid.Vector2(*q)
-            d = p-q
-
-            steps = d.magnitude() / 30
-            for i in range(int(steps+1)):
-                c = q+d*(i/float(steps))
-                if not self.is_empty(*c):
-                    return False
-            return True
-
-        visible_map = set()
-        not_visible_map = set()
-        for a in points:
-            for b in points:
-                if is_visible(a, b):
-                    visible_map.add((a,b))
-                else:
-                    not_visible_map.add((a,b))
-        def visible(a, b):
-            if (a,b) in visible_map:
-                return True
-            if (a,b) in not_visible_map:
-                return False
-            return is_visible(a, b)
-
-        def _visible(a, b):
-            r = _visible(a, b)
-            #print "visible", a, b, r
-            return r
-        print "Found", len(visible_map), "connections"
-        self.ways = waypointing.WaypointNav(points, visible)
+        # children come in memory order, sorting keeps the indexes, and so
+        # the cached routes, the same from one run to the next
+        self.waypoints_list = points = sorted([ c.position for c in layer.get_children() ])
+        if waypointing.numpy is not None:
+            fn_visibles_many = self.wallmask.are_visible
+        else:
+            fn_visibles_many = None
+        self.ways = waypointing.WaypointNav(points, self.wallmask.is_visible,
+                                            cache_file=self.nav_cache_file,
+                                            cache_salt=self.wallmask.digest(),
+                                            cell_size=self.wallmask.tilesize,
+                                            cell_bounds=self.wallmask.bounds(),
+                                            fn_visibles_many=fn_visibles_many)
+        print "Found", sum(map(len, self.ways.adj)), "connections"
+        if self.herd is not None:
+            self.herd.walls = self.wallmask
+            if options.flowfields:
+                self.herd.flows = flowfield.FlowFields(self.wallmask)
         print "Navigation setup done."
 
     def setup_powerups(self, layer):
@@ -643,7 +754,7 @@ class GameLayer(Layer):
             waveno = min(self.zombie_wave_number,len(WAVE_DELAY)-1)
             delay = WAVE_DELAY[ waveno ]
             if self.z_spawn_lifetime >= delay:
-                z_count = len([c for c in self.agents_node.get_children() if isinstance(c, Zombie)])
+                z_count = len(self.zombies)
                 if z_count < 12:
                     print "Wave Numer:", waveno, z_count
                     # we have a zombie wave
@@ -685,6 +796,11 @@ class GameLayer(Layer):
     def on_exit(self):
         print "Exiting GameLayer"
         super(GameLayer, self).on_exit()
+        if recorder is not None:
+            recorder.stop()
+        # bullets still flying go back to their pool
+        self._remove_projectiles()
+        self._remove_dead_items()
         #self.light.disable()
         self.lights.on_exit()
         sound.stop_music()
@@ -723,30 +839,24 @@ class GameLayer(Layer):
             mother.rotation = 180
             self.agents_node.add(mother)
 
-    def update(self, dt):
+    def center_camera(self):
         x, y = director.get_window_size()
         self.x = -self.player.x + x/2
         self.y = -self.player.y + y/2
         #self.lights.sprite.position = self.player.position
 
-        # clear out any non-collisioned projectiles
-#        self._remove_projectiles()
-
-        # clear out any dead items
-        self._remove_dead_items()
-
 
     def add_projectile(self, projectile):
-        self.projectiles.append(projectile)
         self.agents_node.add(projectile)
+        self.muzzle_flash()
 
+    def muzzle_flash(self):
         self.fire_light.x = self.player.x
         self.fire_light.y = self.player.y
         self.fire_light.rotation = self.player.rotation
         self.show_fire_frames = 3
 
     def remove_projectile(self, projectile):
-        self.projectiles.remove(projectile)
         # delay objects deletion until later, to avoid segfaults
         self.dead_items.add(projectile)
 
@@ -761,15 +871,12 @@ class GameLayer(Layer):
             ###collision_layer.remove(item, static=item.shape.static)
             if item in self.agents_node:
                 self.agents_node.remove(item)
+                if item.collision_kind == 'bullet':
+                    pools.release(item)
         self.dead_items.clear()
 
     def is_clear_path(self, origin, target):
-        ray = Ray(self.player, target)
-        ###collision_layer = self.map_node.get('collision')
-        ###collision_layer.add(ray, static=ray.shape.static)
-        ###collision_layer.step()
-        ###collision_layer.remove(ray)
-        return not ray.shape.data['collided']
+        return self.wallmask.is_visible(target, origin)
 
     def is_empty(self,x,y):
         # note: ATM only walls, not muebles
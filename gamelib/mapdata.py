@@ -0,0 +1,260 @@
+""" Map data
+
+The editor saves maps as JSON, which takes longer to parse than the rest
+of a game start. So the game reads them from a binary copy next to the
+JSON, data/map.bin for data/map.json, made the first time the map is
+loaded and again whenever the JSON changes. It can be made beforehand:
+
+    python gamelib/mapdata.py data/map.json
+
+The binary file is little endian: a header, a table of the strings used
+(filenames, labels...) and the layers. Each layer has its sprites as
+arrays, one per field, so loading is one read of the file and a copy of
+each array out of it, no parsing:
+
+    header      'ZMAP', version, size and mtime of the JSON,
+                string count, layer count
+    strings     length and utf-8 bytes, for each
+    layer       label, layer_type, z, sprite count n, then
+                x, y, rotation, scale,
+                opacity                   n doubles each
+                filenames, labels         n ints each, string indexes,
+                                          -1 for no label
+                rects                     4n ints
+
+Only sprite layers are kept, the only kind the game loads, and the z of
+each sprite is not, the game ignores it.
+"""
+import array
+import os
+import struct
+import sys
+
+import simplejson
+
+MAGIC = 'ZMAP'
+VERSION = 1
+
+HEADER = struct.Struct('<4sIqdII')
+LAYER = struct.Struct('<iiiI')
+LENGTH = struct.Struct('<I')
+
+# the arrays of a layer, in file order, and their typecodes
+FIELDS = [('x', 'd'), ('y', 'd'), ('rotation', 'd'), ('scale', 'd'),
+          ('opacity', 'd'), ('filenames', 'i'), ('labels', 'i')]
+
+
+class SpriteLayer(object):
+    """
+    the sprites of a map layer, as arrays of their fields. The filenames
+    and labels arrays index strings, 4 items of rects are a sprite's rect
+    """
+    def __init__(self, label, layer_type, z, strings):
+        self.label = label
+        self.layer_type = layer_type
+        self.z = z
+        self.strings = strings
+        for name, code in FIELDS:
+            setattr(self, name, array.array(code))
+        self.rects = array.array('i')
+
+    def __len__(self):
+        return len(self.x)
+
+    def sprite(self, i):
+        """ sprite i as the editor saves it, but for its z """
+        label = self.labels[i]
+        return {'position': [self.x[i], self.y[i]], 'rotation': self.rotation[i],
+                'scale': self.scale[i], 'opacity': self.opacity[i],
+                'filename': self.strings[self.filenames[i]],
+                'label': label >= 0 and self.strings[label] or None,
+                'rect': self.rects[4*i:4*i+4].tolist()}
+
+
+def binary_name(json_file):
+    return os.path.splitext(json_file)[0] + '.bin'
+
+def from_json(json_file):
+    """ the sprite layers of an editor map """
+    strings = []
+    index = {}
+    def intern(s):
+        if s not in index:
+            index[s] = len(strings)
+            strings.append(s)
+        return index[s]
+
+    layers = []
+    for data in simplejson.load(open(json_file))['layers']:
+        if data['layer_type'] != 'sprite':
+            continue
+        intern(data['label'])
+        intern(data['layer_type'])
+        layer = SpriteLayer(data['label'], data['layer_type'], data.get('z', 0), strings)
+        for sprite in data['data']['sprites']:
+            x, y = sprite['position']
+            layer.x.append(x)
+            layer.y.append(y)
+            layer.rotation.append(sprite['rotation'])
+            layer.scale.append(sprite['scale'])
+            layer.opacity.append(sprite['opacity'])
+            layer.filenames.append(intern(sprite['filename']))
+            label = sprite.get('label')
+            layer.labels.append(label is None and -1 or intern(label))
+            layer.rects.extend(sprite['rect'])
+        layers.append(layer)
+    return layers
+
+def _le(a):
+    """ a, little endian """
+    if sys.byteorder != 'little':
+        a = array.array(a.typecode, a)
+        a.byteswap()
+    return a
+
+def write(layers, bin_file, json_stat):
+    """ writes layers to bin_file, as made from a JSON file with json_stat """
+    strings = layers and layers[0].strings or []
+    index = dict((s, i) for i, s in enumerate(strings))
+    # written aside and moved in place, so a half written file is never read
+    f = open(bin_file + '.tmp', 'wb')
+    f.write(HEADER.pack(MAGIC, VERSION, json_stat.st_size, json_stat.st_mtime,
+                        len(strings), len(layers)))
+    for s in strings:
+        data = s.encode('utf-8')
+        f.write(LENGTH.pack(len(data)))
+        f.write(data)
+    for layer in layers:
+        f.write(LAYER.pack(index[layer.label], index[layer.layer_type],
+                           layer.z, len(layer)))
+        for name, code in FIELDS:
+            _le(getattr(layer, name)).tofile(f)
+        _le(layer.rects).tofile(f)
+    f.close()
+    if os.path.exists(bin_file):
+        # windows does not rename over a file
+        os.remove(bin_file)
+    os.rename(bin_file + '.tmp', bin_file)
+
+def read(bin_file, json_stat=None):
+    """
+    the layers in bin_file, or None if it is not one or, given json_stat,
+    was not made from that JSON file. ValueError if it is cut short or
+    runs on past its last layer
+    """
+    f = open(bin_file, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    if len(data) < HEADER.size:
+        return None
+    magic, version, size, mtime, nstrings, nlayers = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+    if json_stat is not None and (size, mtime) != (json_stat.st_size, json_stat.st_mtime):
+        return None
+    at = HEADER.size
+
+    strings = []
+    for i in xrange(nstrings):
+        length, = LENGTH.unpack_from(data, at)
+        at += LENGTH.size
+        if at + length > len(data):
+            raise ValueError("%s is cut short" % bin_file)
+        strings.append(data[at:at+length].decode('utf-8'))
+        at += length
+
+    def take(code, count, at):
+        """ count items of typecode code at offset at, and where they end """
+        a = array.array(code)
+        end = at + a.itemsize * count
+        if end > len(data):
+            raise ValueError("%s is cut short" % bin_file)
+        a.fromstring(data[at:end])
+        if sys.byteorder != 'little':
+            a.byteswap()
+        return a, end
+
+    layers = []
+    for i in xrange(nlayers):
+        label, layer_type, z, count = LAYER.unpack_from(data, at)
+        at += LAYER.size
+        layer = SpriteLayer(strings[label], strings[layer_type], z, strings)
+        for name, code in FIELDS:
+            a, at = take(code, count, at)
+            setattr(layer, name, a)
+        layer.rects, at = take('i', 4*count, at)
+        layers.append(layer)
+    if at != len(data):
+        raise ValueError("%s has %d bytes after its last layer" % (bin_file, len(data) - at))
+    return layers
+
+def convert(json_file, bin_file=None):
+    """ writes the binary copy of json_file, returns its layers """
+    if bin_file is None:
+        bin_file = binary_name(json_file)
+    stat = os.stat(json_file)
+    layers = from_json(json_file)
+    write(layers, bin_file, stat)
+    return layers
+
+def load(json_file):
+    """
+    the sprite layers of a map: from its binary copy when it is up to date
+    with the JSON file, from the JSON file otherwise, writing the copy
+    """
+    bin_file = binary_name(json_file)
+    stat = os.stat(json_file)
+    if os.path.exists(bin_file):
+        try:
+            layers = read(bin_file, stat)
+        except (EnvironmentError, ValueError, struct.error):
+            # unreadable, make it again
+            layers = None
+        if layers is not None:
+            return layers
+    layers = from_json(json_file)
+    try:
+        write(layers, bin_file, stat)
+    except EnvironmentError:
+        print '*** WARNING: could not write', bin_file
+    return layers
+
+def test_damaged(json_file='data/map.json'):
+    """
+    a binary copy cut short or run on past its last layer is not read,
+    load makes it again. Run it from the game directory
+    """
+    import shutil
+    import tempfile
+    tmp = tempfile.mkdtemp()
+    try:
+        # copy2 keeps the mtime, so the copy is up to date with it
+        json_copy = os.path.join(tmp, 'map.json')
+        shutil.copy2(json_file, json_copy)
+        bin_file = binary_name(json_copy)
+        layers = convert(json_copy)
+        good = open(bin_file, 'rb').read()
+        sprites = [[layer.sprite(i) for i in range(len(layer))] for layer in layers]
+        for damaged in [good[:HEADER.size + 2], good[:len(good) // 2],
+                        good[:-1], good + '\0' * 8]:
+            open(bin_file, 'wb').write(damaged)
+            try:
+                read(bin_file, os.stat(json_copy))
+            except (ValueError, struct.error):
+                pass
+            else:
+                assert False, "read %d bytes of %d" % (len(damaged), len(good))
+            layers = load(json_copy)
+            assert [[layer.sprite(i) for i in range(len(layer))] for layer in layers] == sprites
+            assert open(bin_file, 'rb').read() == good
+    finally:
+        shutil.rmtree(tmp)
+    print 'test damaged ok'
+
+if __name__ == '__main__':
+    for json_file in sys.argv[1:]:
+        layers = convert(json_file)
+        print "%s: %d layers, %d sprites" % (binary_name(json_file), len(layers),
+                                             sum(map(len, layers)))
@@ -0,0 +1,72 @@
+""" Pools
+
+Bullets and gore come and go by the dozen in a fight. A new sprite builds
+a vertex list, and a dropped one leaves it for the garbage collector to
+free, whenever it gets to it. So sprites of these kinds are not dropped
+but released to the pool of their class once done with, and the next one
+asked for is one of those, vertex list included.
+
+A pooled class implements reset, taking the arguments of its __init__, to
+look as if it was just made with them:
+
+    blood = pools.acquire(Blood, position, rotation)
+    ...
+    pools.release(blood)
+
+counts() tells how many objects of each class are in use and how many
+wait in the pool. Once a fight is going on, made should stay put.
+"""
+
+_pools = {} # class -> Pool
+
+
+class Pool(object):
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+        # ids of the objects in free, to tell one released twice
+        self.free_ids = set()
+        # objects out of the pool, and objects ever made
+        self.live = 0
+        self.made = 0
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            self.free_ids.remove(id(obj))
+            obj.reset(*args)
+        else:
+            obj = self.cls(*args)
+            self.made += 1
+        self.live += 1
+        return obj
+
+    def release(self, obj):
+        # twice in free, it would be handed out twice
+        if id(obj) in self.free_ids:
+            raise ValueError("%r released twice" % obj)
+        self.live -= 1
+        self.free.append(obj)
+        self.free_ids.add(id(obj))
+
+
+def pool(cls):
+    if cls not in _pools:
+        _pools[cls] = Pool(cls)
+    return _pools[cls]
+
+def acquire(cls, *args):
+    """ an object of cls, as cls(*args) would make """
+    return pool(cls).acquire(*args)
+
+def release(obj):
+    """
+    gives obj back to the pool of its class, it must not be used after.
+    ValueError if it was given back already
+    """
+    pool(type(obj)).release(obj)
+
+def counts():
+    """ class name -> (live, pooled, made), for every pool there is """
+    return dict((cls.__name__, (p.live, len(p.free), p.made))
+                for cls, p in _pools.items())
@@ -0,0 +1,84 @@
+import os
+import random
+
+import pyglet
+
+import pools
+from pools import Pool
+from gamecast import Bullet, Blood, BloodPool, BodyParts
+
+class Thing(object):
+    def __init__(self, n):
+        self.n = n
+    def reset(self, n):
+        self.n = n
+
+class Weapon(object):
+    range = 500
+
+class Player(object):
+    """ what a Bullet reads of who shot it """
+    position = (0, 0)
+    rotation = 0
+    scale = 1
+    weapon = Weapon()
+
+def test_release_twice():
+    p = Pool(Thing)
+    a = p.acquire(1)
+    b = p.acquire(2)
+    p.release(a)
+    try:
+        p.release(a)
+    except ValueError:
+        pass
+    else:
+        assert False, "released twice"
+    assert (p.live, len(p.free), p.made) == (1, 1, 2)
+    # once acquired again, it can be released again
+    assert p.acquire(3) is a and a.n == 3
+    p.release(a)
+    p.release(b)
+    assert (p.live, len(p.free), p.made) == (0, 2, 2)
+    print 'test release twice ok'
+
+def test_steady_state(rounds=20, most=30):
+    """
+    bullets and gore coming and going as in a fight, never more than most
+    of a kind at once: once the first round made that many, nothing new is
+    made.
+    Sprites load images, run it headless or with a window
+    """
+    # sprites name their images relative to the game dir, or the data dir
+    basepath = os.path.join(os.path.abspath(os.path.dirname(__file__)), '..')
+    pyglet.resource.path.extend([basepath, os.path.join(basepath, 'data')])
+    pyglet.resource.reindex()
+    rnd = random.Random(0)
+    player = Player()
+    kinds = [(Bullet, lambda: ('img/bullet.png', player, rnd.uniform(0, 360)))]
+    kinds += [(cls, lambda: ((rnd.uniform(0, 100), rnd.uniform(0, 100)), rnd.uniform(0, 360)))
+              for cls in Blood, BloodPool, BodyParts]
+    before = pools.counts()
+    for i in range(rounds):
+        for cls, args in kinds:
+            # the first round is the biggest fight
+            count = i and rnd.randint(1, most) or most
+            alive = [pools.acquire(cls, *args()) for j in range(count)]
+            # they go in any order
+            rnd.shuffle(alive)
+            for obj in alive:
+                pools.release(obj)
+        counts = pools.counts()
+        for cls, args in kinds:
+            live, pooled, made = counts[cls.__name__]
+            assert live == 0
+            assert made - before.get(cls.__name__, (0, 0, 0))[2] <= most, (cls, made)
+        if not i:
+            first = counts
+        # nothing made after the first round
+        assert counts == first, (i, counts)
+    print 'test steady state ok'
+
+if __name__ == '__main__':
+    test_release_twice()
+    test_steady_state()
@@ -0,0 +1,278 @@
+""" Frame profiler
+
+Where the time of each frame goes. The game is cut in spans: the clock
+callbacks (the world tick, actions, animations...), the phases of the
+world tick, drawing and its parts. While profiling is on, a frame is the
+time from a clock tick to the next, kept as (start, end, spans) with each
+span as (name, start, end, depth), and the last FRAMES of them are kept.
+Things that take no time, as an agent spawning, are instants: spans
+with no end and a dict of what to tell about them in place of a depth.
+
+    F3 in game: shows or hides the overlay, profiling while it is shown
+    F4 in game: writes the frames kept to TRACE_FILE
+
+Traces are in the Chrome trace event format, open them in
+chrome://tracing or https://ui.perfetto.dev. Headless runs can be
+profiled whole with --trace FILE.
+
+Profiling is on while anything wants it, start() and stop() come in
+pairs. While it is off, a span costs a function call and a test.
+"""
+import collections
+import time
+
+import simplejson
+
+import pyglet
+import pyglet.clock
+
+import headless
+
+# frames kept, 10 seconds at 60 fps
+FRAMES = 600
+TRACE_FILE = 'trace.json'
+
+on = False
+frames = collections.deque(maxlen=FRAMES)
+# called with each frame as it ends, as listener(start, end, spans)
+listeners = []
+# the spans of the frame going on, and the ones not ended yet
+_frame = []
+_frame_start = None
+_open = []
+# how many want profiling on
+_users = 0
+
+
+def begin(name):
+    if on:
+        _open.append((name, time.time()))
+
+def end():
+    if on and _open:
+        name, start = _open.pop()
+        _frame.append((name, start, time.time(), len(_open)))
+
+def instant(name, **args):
+    if on:
+        _frame.append((name, time.time(), None, args))
+
+def next_frame():
+    """ closes the frame going on and starts another """
+    global _frame, _frame_start
+    now = time.time()
+    if _frame_start is not None:
+        frames.append((_frame_start, now, _frame))
+        for listener in listeners:
+            listener(_frame_start, now, _frame)
+    _frame = []
+    # what the listeners took is not the next frame's
+    _frame_start = listeners and time.time() or now
+
+def start():
+    global on, _users
+    _users += 1
+    on = True
+
+def stop():
+    global on, _users, _frame, _frame_start
+    _users -= 1
+    if _users > 0:
+        return
+    on = False
+    # a frame cut in half says nothing
+    del _open[:]
+    _frame = []
+    _frame_start = None
+
+
+def timed(name):
+    """ decorator, the calls to the function are spans called name """
+    def decorate(func):
+        def timed_func(*args, **kwargs):
+            if not on:
+                return func(*args, **kwargs)
+            begin(name)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                end()
+        timed_func.__name__ = func.__name__
+        timed_func.__doc__ = func.__doc__
+        return timed_func
+    return decorate
+
+class Scheduled(object):
+    """
+    a function scheduled on a clock, each call a span. Compares equal to
+    the function, so unscheduling still works
+    """
+    def __init__(self, func):
+        self.func = func
+        # a headless.Timed has a name already
+        self.name = getattr(func, 'name', None) or headless.subsystem_name(func)
+
+    def __call__(self, *args, **kwargs):
+        if not on:
+            return self.func(*args, **kwargs)
+        begin(self.name)
+        try:
+            return self.func(*args, **kwargs)
+        finally:
+            end()
+
+    def __eq__(self, other):
+        return self.func == other
+
+    def __ne__(self, other):
+        return self.func != other
+
+
+def breakdown():
+    """
+    [(ms per frame, depth, name)] for every span name in the frames kept,
+    slowest first
+    """
+    if not frames:
+        return []
+    total = {}
+    depth = {}
+    for frame_start, frame_end, spans in frames:
+        for name, start, stop, d in spans:
+            if stop is not None:
+                total[name] = total.get(name, 0.0) + stop - start
+                depth[name] = d
+    rows = [(spent * 1000 / len(frames), depth[name], name)
+            for name, spent in total.items()]
+    rows.sort(reverse=True)
+    return rows
+
+def trace_events(frames):
+    """ Chrome trace events for frames, timed from the first one """
+    events = []
+    if not frames:
+        return events
+    t0 = frames[0][0]
+    for frame_start, frame_end, spans in frames:
+        events.append({'name': 'frame', 'ph': 'X', 'pid': 0, 'tid': 1,
+                       'ts': (frame_start - t0) * 1e6,
+                       'dur': (frame_end - frame_start) * 1e6})
+        for name, start, stop, d in spans:
+            if stop is None:
+                events.append({'name': name, 'ph': 'i', 's': 't', 'pid': 0,
+                               'tid': 0, 'ts': (start - t0) * 1e6, 'args': d})
+            else:
+                events.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                               'ts': (start - t0) * 1e6, 'dur': (stop - start) * 1e6})
+    return events
+
+def export(filename=TRACE_FILE):
+    """ writes the frames kept as Chrome trace events, returns how many """
+    events = trace_events(list(frames))
+    f = open(filename, 'w')
+    simplejson.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    f.close()
+    return len(events)
+
+
+def install():
+    """
+    makes clock ticks frames, with spans for their callbacks, for drawing
+    and for visiting each node. Has to be called before the director makes
+    its window
+    """
+    from cocos.director import Director
+    from cocos.cocosnode import CocosNode
+    from cocos.batch import BatchNode
+    Clock = pyglet.clock.Clock
+
+    tick = Clock.tick
+    def profiled_tick(self, poll=False):
+        if on:
+            next_frame()
+        return tick(self, poll)
+    Clock.tick = profiled_tick
+
+    schedule = Clock.schedule
+    def profiled_schedule(self, func, *args, **kwargs):
+        schedule(self, Scheduled(func), *args, **kwargs)
+    Clock.schedule = profiled_schedule
+
+    schedule_item = Clock._schedule_item
+    def profiled_schedule_item(self, func, *args, **kwargs):
+        schedule_item(self, Scheduled(func), *args, **kwargs)
+    Clock._schedule_item = profiled_schedule_item
+
+    on_draw = Director.on_draw
+    def profiled_on_draw(self):
+        if not on:
+            on_draw(self)
+        else:
+            begin('draw')
+            try:
+                on_draw(self)
+            finally:
+                end()
+        if overlay is not None:
+            overlay.draw()
+    Director.on_draw = profiled_on_draw
+
+    # a span for each node visited, named after its class
+    for cls in CocosNode, BatchNode:
+        cls.visit = _profiled_visit(cls.visit)
+
+def _profiled_visit(visit):
+    def profiled_visit(self):
+        if not on:
+            return visit(self)
+        begin(type(self).__name__)
+        try:
+            visit(self)
+        finally:
+            end()
+    return profiled_visit
+
+
+class Overlay(object):
+    """
+    the breakdown, drawn over the game and updated twice a second. Pushed
+    on the window, it takes F3 and F4
+    """
+    def __init__(self, width, height):
+        self.label = pyglet.text.Label('', font_name='Courier New', font_size=10,
+                                       x=10, y=height - 10, width=width/2,
+                                       multiline=True, anchor_y='top',
+                                       color=(255, 255, 0, 255))
+        self.visible = False
+        pyglet.clock.schedule_interval(self.update, 0.5)
+
+    def on_key_press(self, symbol, modifiers):
+        if symbol == pyglet.window.key.F3:
+            self.visible = not self.visible
+            if self.visible:
+                start()
+            else:
+                stop()
+            return True
+        if symbol == pyglet.window.key.F4:
+            print "wrote %d spans to %s" % (export(), TRACE_FILE)
+            return True
+
+    def update(self, dt):
+        if not self.visible:
+            return
+        lines = ['%-40s %6.2f ms' % ('  '*depth + name, ms)
+                 for ms, depth, name in breakdown()[:40]]
+        self.label.text = '\n'.join(['ms per frame, last %d frames' % len(frames)] + lines)
+
+    def draw(self):
+        if self.visible:
+            self.label.draw()
+
+# the Overlay on the window, if there is one
+overlay = None
+
+def show_overlay(window):
+    global overlay
+    overlay = Overlay(window.width, window.height)
+    window.push_handlers(overlay)
@@ -0,0 +1,130 @@
+""" Projectiles
+
+A shot is a segment: for a bullet, from where it is to where it will be at
+the end of the tick; for a hitscan shot, from the gun to the end of the
+weapon's range. The first wall tile it crosses stops it, and so does the
+first agent it passes close enough to, whichever comes first along it. So
+bullets go neither through thin walls nor past zombies, however fast.
+
+Walls are raycast on the WallMask, agents are looked up in the cells of
+the spatial hash around the segment. Shots fired together from the same
+point, as shotgun pellets, are resolved at once by volley: one
+raycast_many for the walls, one look at the spatial hash and one distance
+matrix for the agents. Walls are raycast one by one for a few shots,
+raycast_many has some overhead of its own.
+
+volley needs numpy, without it each shot is swept on its own.
+"""
+from math import cos, sin, radians, sqrt
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# shots are resolved the tick they are fired and leave no bullet sprite
+HITSCAN = False
+# raycast_many costs about as much as this many raycast calls
+RAYCAST_MANY_MIN = 16
+
+
+def targets(space, radii, shooter, x0, y0, x1, y1):
+    """
+    the agents near the box of a segment a shot can hit: the ones of the
+    kinds in radii with life left, but the shooter
+    """
+    return [agent for agent in space.in_box(x0, y0, x1, y1)
+            if agent is not shooter and agent.collision_kind in radii
+            and getattr(agent, 'life', 1) > 0]
+
+def entry(x0, y0, dx, dy, length2, px, py, radius):
+    """
+    the fraction of the segment from (x0, y0) along (dx, dy) where it gets
+    within radius of (px, py), or None if it never does
+    """
+    if not length2:
+        if (px-x0)**2 + (py-y0)**2 <= radius*radius:
+            return 0.0
+        return None
+    t = ((px-x0)*dx + (py-y0)*dy) / length2
+    perp2 = (x0 + dx*t - px)**2 + (y0 + dy*t - py)**2
+    if perp2 > radius*radius:
+        return None
+    back = sqrt((radius*radius - perp2) / length2)
+    if t + back < 0 or t - back > 1:
+        return None
+    return max(t - back, 0.0)
+
+def sweep(wallmask, space, radii, shooter, x0, y0, x1, y1):
+    """
+    the first thing the shot from (x0, y0) to (x1, y1) hits. Returns
+    (agent, point) for an agent, (None, point) for a wall and (None, None)
+    if it hits nothing. radii maps the collision_kind of the agents that
+    can be hit to how close the shot has to pass
+    """
+    hitpoint, distance = wallmask.raycast((x0, y0), (x1, y1))
+    dx, dy = x1 - x0, y1 - y0
+    length2 = dx*dx + dy*dy
+    wall = 1.0
+    if hitpoint is not None and length2:
+        wall = distance / sqrt(length2)
+
+    # the first agent to get in the way, up to the wall
+    victim = None
+    for agent in targets(space, radii, shooter, x0, y0, x1, y1):
+        px, py = agent.position
+        t = entry(x0, y0, dx, dy, length2, px, py, radii[agent.collision_kind])
+        if t is not None and t <= wall and (victim is None or t < best):
+            victim, best = agent, t
+    if victim is not None:
+        return victim, (x0 + dx*best, y0 + dy*best)
+    return None, hitpoint
+
+def volley(wallmask, space, radii, shooter, x0, y0, angles, length):
+    """
+    sweeps shots of the same length from (x0, y0), one for each of angles,
+    in degrees as sprites are rotated. Returns what sweep would for each
+    """
+    ends = [(x0 + cos(radians(-a))*length, y0 + sin(radians(-a))*length)
+            for a in angles]
+    if numpy is None or not length:
+        return [sweep(wallmask, space, radii, shooter, x0, y0, x1, y1)
+                for x1, y1 in ends]
+
+    tx, ty = numpy.array(ends, dtype=float).reshape(-1, 2).T
+    if len(ends) < RAYCAST_MANY_MIN:
+        walls = [wallmask.raycast((x0, y0), end) for end in ends]
+    else:
+        hit, hx, hy, distance = wallmask.raycast_many(x0, y0, tx, ty)
+        walls = [(h and (x, y) or None, d) for h, x, y, d
+                 in zip(hit.tolist(), hx.tolist(), hy.tolist(), distance.tolist())]
+    best = numpy.ones(len(ends))
+    for i, (hitpoint, distance) in enumerate(walls):
+        if hitpoint is not None:
+            best[i] = distance / length
+    results = [(None, hitpoint) for hitpoint, distance in walls]
+
+    found = targets(space, radii, shooter, min(x0, tx.min()), min(y0, ty.min()),
+                    max(x0, tx.max()), max(y0, ty.max()))
+    if not found:
+        return results
+
+    # shots by agents, as entry does it
+    px = numpy.array([agent.position[0] for agent in found])
+    py = numpy.array([agent.position[1] for agent in found])
+    r2 = numpy.array([radii[agent.collision_kind] for agent in found], dtype=float)**2
+    dx = (tx - x0)[:, None]
+    dy = (ty - y0)[:, None]
+    length2 = float(length)**2
+    t = ((px - x0)*dx + (py - y0)*dy) / length2
+    perp2 = (x0 + dx*t - px)**2 + (y0 + dy*t - py)**2
+    back = numpy.sqrt(numpy.maximum(r2 - perp2, 0) / length2)
+    enter = numpy.maximum(t - back, 0)
+    touch = (perp2 <= r2) & (t + back >= 0) & (enter <= best[:, None])
+    enter = numpy.where(touch, enter, numpy.inf)
+    first = enter.argmin(axis=1)
+    first_t = enter[numpy.arange(len(first)), first]
+    for i in numpy.flatnonzero(numpy.isfinite(first_t)):
+        s = first_t[i]
+        results[i] = found[first[i]], (float(x0 + dx[i, 0]*s), float(y0 + dy[i, 0]*s))
+    return results
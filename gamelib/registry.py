@@ -0,0 +1,45 @@
+""" Registry
+
+The entities of one type the game keeps asking about: how many there
+are, whether one is still around, a random one. A Registry is a set with
+add, remove and membership in constant time, and a list to walk and pick
+from.
+
+Removing moves the last entity into the hole, so the order depends on
+what was added and removed and in which order, not on object ids.
+"""
+
+
+class Registry(object):
+    def __init__(self):
+        self.items = []
+        self.index = {} # entity -> position in items
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, i):
+        return self.items[i]
+
+    def __contains__(self, obj):
+        return obj in self.index
+
+    def add(self, obj):
+        if obj in self.index:
+            return
+        self.index[obj] = len(self.items)
+        self.items.append(obj)
+
+    def clear(self):
+        self.items = []
+        self.index = {}
+
+    def remove(self, obj):
+        i = self.index.pop(obj)
+        last = self.items.pop()
+        if last is not obj:
+            self.items[i] = last
+            self.index[last] = i
@@ -0,0 +1,168 @@
+""" Recording and replay
+
+A recording is what it takes to play a game again, tick by tick: the seed
+of random, the window size, the input events that reached KeyGameCtrl
+and MouseGameCtrl and the world tick each came before, and a digest of
+the game state when the game ended.
+
+While recording, the game runs on a FixedClock: every frame is TICK
+seconds of game time, whatever the frame rate, as headless runs step it.
+So a replay goes through the same ticks with the same dt and the same
+input, reaches the same state and does the same work every frame, only
+as fast as the CPU allows. That makes it a benchmark to run before and
+after a change:
+
+    python run_game.py --record late-wave.rec
+    python run_game.py --replay late-wave.rec
+
+Only the first game is recorded. The file is gzipped lines of JSON: a
+header, one line per event, and a last one with the length of the game.
+"""
+import atexit
+import gzip
+import hashlib
+import random
+import time
+
+import simplejson
+
+import pyglet
+import pyglet.clock
+
+import headless
+
+# the controllers whose events are recorded, and the handlers looked at
+HANDLERS = {
+    'KeyGameCtrl': ['on_key_press', 'on_key_release'],
+    'MouseGameCtrl': ['on_mouse_motion', 'on_mouse_press'],
+}
+
+
+class FixedClock(pyglet.clock.Clock):
+    """
+    a clock where each frame is TICK seconds long. It waits for the wall
+    clock when ahead of it, and falls behind it on slow frames
+    """
+    def __init__(self):
+        self.now = 0.0
+        super(FixedClock, self).__init__(time_function=lambda: self.now)
+        self.start = time.time()
+        # the first tick sets when the frames count from
+        super(FixedClock, self).tick(poll=True)
+
+    def tick(self, poll=False):
+        ahead = self.now + headless.TICK - (time.time() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+        self.now += headless.TICK
+        return super(FixedClock, self).tick(poll=True)
+
+
+def digest(game_layer):
+    """ a hash of where every agent is and how it is doing """
+    md5 = hashlib.md5()
+    for kind, registry in sorted(game_layer.agents_node.by_kind.items()):
+        for agent in registry:
+            md5.update('%s %.3f %.3f %s\n' % (kind, agent.x, agent.y,
+                                              getattr(agent, 'life', '')))
+    md5.update('%d %d' % (game_layer.world.ticks, game_layer.zombie_wave_number))
+    return md5.hexdigest()
+
+
+class Recorder(object):
+    def __init__(self, filename, seed=None):
+        self.filename = filename
+        if seed is None:
+            seed = random.randrange(2**31)
+        self.seed = seed
+        self.file = None
+        self.game_layer = None
+        self.started = False
+
+    def start(self, window_size):
+        """
+        seeds random and starts the fixed clock, so it has to be called
+        before the game scene is made
+        """
+        self.started = True
+        random.seed(self.seed)
+        pyglet.clock.set_default(FixedClock())
+        self.file = gzip.open(self.filename, 'wb')
+        self._write({'seed': self.seed, 'window': list(window_size),
+                     'tick': headless.TICK})
+        atexit.register(self.stop)
+
+    def watch(self, ctrl):
+        """ records the calls to the handlers of ctrl, before making them """
+        self.game_layer = ctrl.game_layer
+        name = type(ctrl).__name__
+        for handler_name in HANDLERS[name]:
+            handler = getattr(ctrl, handler_name)
+            # pushing ctrl on the window looks the handlers up on it
+            setattr(ctrl, handler_name, self._recorded(name, handler_name, handler))
+
+    def _recorded(self, name, handler_name, handler):
+        def recorded(*args):
+            if self.file is not None:
+                self._write([self.game_layer.world.ticks, name, handler_name, args])
+            return handler(*args)
+        return recorded
+
+    def stop(self):
+        """ ends the recording, when the game ends or the program does """
+        if self.file is None:
+            return
+        self._write({'ticks': self.game_layer.world.ticks,
+                     'digest': digest(self.game_layer)})
+        self.file.close()
+        self.file = None
+        print "recorded %d ticks to %s" % (self.game_layer.world.ticks, self.filename)
+
+    def _write(self, line):
+        self.file.write(simplejson.dumps(line, separators=(',', ':')) + '\n')
+
+
+class Replay(object):
+    def __init__(self, filename):
+        lines = [simplejson.loads(line) for line in gzip.open(filename, 'rb')]
+        header = lines[0]
+        self.seed = header['seed']
+        self.window = tuple(header['window'])
+        if header['tick'] != headless.TICK:
+            raise ValueError("%s was recorded at %s s per tick" % (filename, header['tick']))
+        if isinstance(lines[-1], dict):
+            end = lines[-1]
+            self.events = lines[1:-1]
+        else:
+            # the recording did not end well, play what there is
+            end = {'ticks': lines[-1][0] + 1, 'digest': None}
+            self.events = lines[1:]
+        self.ticks = end['ticks']
+        self.digest = end['digest']
+        self.next = 0
+
+    def feed(self, scene):
+        """ calls the handlers for the events that came before this tick """
+        controllers = dict((type(c).__name__, c) for c in scene.get_children()
+                           if type(c).__name__ in HANDLERS)
+        if not controllers:
+            return
+        ticks = controllers.values()[0].game_layer.world.ticks
+        while self.next < len(self.events) and self.events[self.next][0] <= ticks:
+            tick, name, handler_name, args = self.events[self.next]
+            getattr(controllers[name], handler_name)(*args)
+            self.next += 1
+
+    def run(self, make_scene):
+        """ plays the recording headless, and tells if it ended the same """
+        from cocos.director import director
+        director._window_original_width, director._window_original_height = self.window
+        headless.run(make_scene, self.ticks, self.seed, feed=self.feed)
+        layer = [c for c in director.scene.get_children() if hasattr(c, 'world')][0]
+        print
+        if self.digest is None:
+            print "the recording has no final state to compare with"
+        elif digest(layer) == self.digest:
+            print "final state matches the recording"
+        else:
+            print "final state differs from the recording"
@@ -31,7 +31,7 @@ class Sounds(object):
             play('nombre_de_la_accion')
     """
 
-    def __init__(self):
+    def __init__(self, audio=True):
         try:
             import pyglet.media.avbin as PMA
             self.have_avbin = True
@@ -43,6 +43,11 @@ class Sounds(object):
             self.music = False
             self.sfx = False
 
+        if not audio:
+            self.have_avbin = False
+            self.music = False
+            self.sfx = False
+
         self.playing = False
 
         if self.have_avbin:
@@ -82,8 +87,8 @@ class Sounds(object):
             return
         self.music_player.pause()
 
-def init():
-    a = Sounds()
+def init(audio=True):
+    a = Sounds(audio)
     global play
     play = a.play
     global play_music, stop_music
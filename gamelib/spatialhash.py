@@ -0,0 +1,102 @@
+""" Spatial hash
+
+Uniform grid broadphase for things that move around the map.
+
+Objects are bucketed by the cell that contains their .position. If the
+cell size is at least as big as the largest collision distance, every
+object that can touch a given one lives in the 3x3 block of cells around
+it, so a collision check only needs to look at those.
+
+Cells are lists, not sets, so iteration order only depends on insertion
+order and not on object ids.
+"""
+from math import floor
+
+
+class SpatialHash(object):
+    def __init__(self, cell_size):
+        self.cell_size = float(cell_size)
+        self.cells = {} # (i, j) -> [objects]
+        self.keys = {} # object -> (i, j)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, obj):
+        return obj in self.keys
+
+    def key(self, x, y):
+        s = self.cell_size
+        return int(floor(x/s)), int(floor(y/s))
+
+    def add(self, obj):
+        key = self.key(*obj.position)
+        self.keys[obj] = key
+        self.cells.setdefault(key, []).append(obj)
+
+    def remove(self, obj):
+        key = self.keys.pop(obj, None)
+        if key is None:
+            return
+        cell = self.cells[key]
+        cell.remove(obj)
+        if not cell:
+            del self.cells[key]
+
+    def move(self, obj):
+        """
+        updates the bucket of obj after its position changed.
+        cheap when the object stays in the same cell, which is most frames
+        """
+        old_key = self.keys.get(obj)
+        if old_key is None:
+            return
+        key = self.key(*obj.position)
+        if key == old_key:
+            return
+        cell = self.cells[old_key]
+        cell.remove(obj)
+        if not cell:
+            del self.cells[old_key]
+        self.keys[obj] = key
+        self.cells.setdefault(key, []).append(obj)
+
+    def near(self, x, y):
+        """
+        returns a list with the objects in the cell of (x, y) and its 8
+        neighbours. It is a new list, so it is safe to add or remove
+        objects while walking it.
+        """
+        cx, cy = self.key(x, y)
+        cells = self.cells
+        found = []
+        for i in (cx-1, cx, cx+1):
+            for j in (cy-1, cy, cy+1):
+                cell = cells.get((i, j))
+                if cell:
+                    found.extend(cell)
+        return found
+
+    def in_box(self, x0, y0, x1, y1):
+        """
+        returns a new list with the objects in the cells the box from (x0,
+        y0) to (x1, y1) covers and the ones around them, as near does for a
+        point. Big boxes walk the cells there are instead of the ones the
+        box covers
+        """
+        i0, j0 = self.key(min(x0, x1), min(y0, y1))
+        i1, j1 = self.key(max(x0, x1), max(y0, y1))
+        i0, j0, i1, j1 = i0-1, j0-1, i1+1, j1+1
+        cells = self.cells
+        found = []
+        if (i1-i0+1) * (j1-j0+1) > len(cells):
+            for (i, j), cell in cells.iteritems():
+                if i0 <= i <= i1 and j0 <= j <= j1:
+                    found.extend(cell)
+        else:
+            for i in range(i0, i1+1):
+                for j in range(j0, j1+1):
+                    cell = cells.get((i, j))
+                    if cell:
+                        found.extend(cell)
+        return found
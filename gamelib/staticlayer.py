@@ -0,0 +1,124 @@
+""" Static layers
+
+Most of the map is sprites that never move: the floor and the furniture.
+In a BatchNode all of them are drawn every frame, though the camera only
+shows a window of the map. A StaticLayer copies their quads, once, into
+vertex lists of static usage, one per square chunk of CHUNK_SIZE and
+texture, and draws only the chunks that get into the window.
+
+A sprite goes to the chunk of its center, and a chunk is drawn when the
+box of all its quads meets the view, so sprites that reach out of their
+chunk still show. Sprites keep their order within a chunk; where
+sprites of different chunks overlap, the chunk drawn last is on top.
+
+Once the chunks are built, the sprites' own vertex lists are deleted and
+the sprites are not kept, so neither are the BatchNode they came in once
+nothing else holds it. What they tell still holds (the wall mask reads
+the furniture's size and place) but they can't be drawn, moved or
+changed after that.
+
+Culling does not need GL: cull() tells which chunks the view gets and
+counts them, as visit does in chunks_drawn and quads_drawn, so it can be
+checked headless.
+"""
+from pyglet import gl
+from pyglet import graphics
+
+from cocos.cocosnode import CocosNode
+from cocos.director import director
+
+CHUNK_SIZE = 512
+
+
+class Chunk(object):
+    def __init__(self):
+        # texture group -> [vertices, tex_coords, colors]
+        self.parts = {}
+        self.lists = []
+        self.box = None
+        self.quads = 0
+
+    def add(self, sprite):
+        vertex_list = sprite._vertex_list
+        vertices = list(vertex_list.vertices)
+        part = self.parts.setdefault(sprite._group, [[], [], []])
+        part[0].extend(vertices)
+        part[1].extend(vertex_list.tex_coords)
+        part[2].extend(vertex_list.colors)
+        xs, ys = vertices[0::2], vertices[1::2]
+        box = min(xs), min(ys), max(xs), max(ys)
+        if self.box is None:
+            self.box = box
+        else:
+            b = self.box
+            self.box = min(b[0], box[0]), min(b[1], box[1]), max(b[2], box[2]), max(b[3], box[3])
+        self.quads += 1
+
+    def build(self):
+        """ makes the vertex lists, once every sprite is in """
+        for group, (vertices, tex_coords, colors) in self.parts.items():
+            count = len(vertices) / 2
+            self.lists.append((group, graphics.vertex_list(count,
+                ('v2i/static', vertices), ('t3f/static', tex_coords),
+                ('c4B/static', colors))))
+        self.parts = None
+
+    def draw(self):
+        for group, vertex_list in self.lists:
+            group.set_state()
+            vertex_list.draw(gl.GL_QUADS)
+            group.unset_state()
+
+
+class StaticLayer(CocosNode):
+    """
+    draws sprites that don't change, as they are when given. Their vertex
+    lists are deleted, they can't be drawn any other way after that
+    """
+    def __init__(self, sprites, chunk_size=CHUNK_SIZE):
+        super(StaticLayer, self).__init__()
+        sprites = list(sprites)
+        self.chunk_size = chunk_size
+        chunks = {}
+        for sprite in sprites:
+            key = int(sprite.x // chunk_size), int(sprite.y // chunk_size)
+            if key not in chunks:
+                chunks[key] = Chunk()
+            chunks[key].add(sprite)
+        # in a fixed order, so what overlaps is drawn the same every frame
+        self.chunks = [chunks[key] for key in sorted(chunks)]
+        for chunk in self.chunks:
+            chunk.build()
+        for sprite in sprites:
+            sprite._vertex_list.delete()
+            sprite._vertex_list = None
+        self.chunks_drawn = 0
+        self.quads_drawn = 0
+
+    def view(self):
+        """ the box of the map the window shows, going by where we are """
+        x = y = 0
+        node = self
+        while node is not None:
+            x += node.x
+            y += node.y
+            node = node.parent
+        w, h = director.get_window_size()
+        return -x, -y, w - x, h - y
+
+    def cull(self, view=None):
+        """ the chunks in view, the window if None, counted as drawn """
+        x0, y0, x1, y1 = view or self.view()
+        chunks = [chunk for chunk in self.chunks
+                  if chunk.box[0] <= x1 and chunk.box[2] >= x0 and
+                     chunk.box[1] <= y1 and chunk.box[3] >= y0]
+        self.chunks_drawn = len(chunks)
+        self.quads_drawn = sum([chunk.quads for chunk in chunks])
+        return chunks
+
+    def draw(self):
+        gl.glPushMatrix()
+        self.transform()
+        for chunk in self.cull():
+            chunk.draw()
+        gl.glPopMatrix()
@@ -0,0 +1,259 @@
+""" Batched steering
+
+Every zombie steers the same way: head for its goal, away from the
+zombies too close to it, and a blend of both in between (see boids.py).
+Instead of
+each zombie doing that math on its own, the Herd keeps positions, goals
+and speeds for all of them in arrays and steers the whole herd with a
+few numpy operations per tick. Only the goal lookups and the moves, that
+need collision checks, are done one zombie at a time.
+
+numpy is optional: without it steering.numpy is None and zombies fall
+back to steering one by one (Zombie.think).
+"""
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# seconds between waypoint lookups
+GOAL_REFRESH = 0.3
+# zombies closer than this flee each other, further than that they
+# ignore each other. Near is the distance zombies collide at
+SEPARATION_NEAR = 32
+SEPARATION_FAR = 64
+# closer than this to a wall, agents turn away from it, the closer the more
+WALL_NEAR = 20
+
+
+def steer(x, y, gx, gy, who=(), ox=(), oy=()):
+    """
+    returns the heading, in degrees, each agent at (x, y) takes towards
+    its goal at (gx, gy) while keeping away from its obstacles: obstacle k,
+    at (ox[k], oy[k]), is one of agent who[k]. Same as boids.seek,
+    boids.avoid_group and boids.merge, for arrays.
+    """
+    goal = numpy.arctan2(y - gy, gx - x)
+    if not len(who):
+        return numpy.degrees(goal)
+
+    n = len(x)
+    hx = x[who] - ox
+    hy = oy - y[who]
+    d = numpy.maximum(numpy.hypot(hx, hy), 1e-6)
+    danger = numpy.empty(n)
+    danger.fill(numpy.inf)
+    numpy.minimum.at(danger, who, d)
+    # unit vectors away from each obstacle, the closest one weights most
+    p = danger[who] / (d * d)
+    escape = numpy.arctan2(numpy.bincount(who, hy * p, n),
+                           numpy.bincount(who, hx * p, n))
+
+    w = numpy.clip((danger - SEPARATION_NEAR) / float(SEPARATION_FAR - SEPARATION_NEAR), 0, 1)
+    heading = numpy.arctan2(numpy.sin(goal) * w + numpy.sin(escape) * (1 - w),
+                            numpy.cos(goal) * w + numpy.cos(escape) * (1 - w))
+    # far from all, the goal alone, as avoid_group does
+    return numpy.degrees(numpy.where(w < 1, heading, goal))
+
+
+def repel(heading, distance, nx, ny):
+    """
+    heading, in degrees, turned away from walls at distance with normals
+    (nx, ny), as given by WallMask.near_walls
+    """
+    a = numpy.radians(-heading)
+    w = numpy.clip((WALL_NEAR - distance) / float(WALL_NEAR), 0, 1)
+    return -numpy.degrees(numpy.arctan2(numpy.sin(a) + ny * w, numpy.cos(a) + nx * w))
+
+
+class Herd(object):
+    """
+    agents steered together. Agents need position, speed, goal,
+    last_goal and target, and the methods next_goal() and
+    advance(position, dt).
+    """
+    def __init__(self, capacity=64):
+        self.agents = []
+        self.index = {} # agent -> position in the arrays
+        # spatialhash.SpatialHash the agents are in, to keep them apart.
+        # None, they don't mind each other
+        self.space = None
+        # what each agent keeps away from this tick, as steer takes it
+        self.avoid = (), (), ()
+        # flowfield.FlowFields to chase targets with, None to use next_goal
+        self.flows = None
+        # WallMask to keep away from, None for no walls
+        self.walls = None
+        self._alloc(capacity)
+
+    def _alloc(self, capacity):
+        old = getattr(self, 'state', None)
+        self.state = numpy.zeros((6, capacity))
+        if old is not None:
+            self.state[:, :old.shape[1]] = old
+        self.x, self.y, self.gx, self.gy, self.speed, self.last_goal = self.state
+
+    def __len__(self):
+        return len(self.agents)
+
+    def __contains__(self, agent):
+        return agent in self.index
+
+    def add(self, agent):
+        if agent in self.index:
+            return
+        i = len(self.agents)
+        if i == self.state.shape[1]:
+            self._alloc(i * 2)
+        self.agents.append(agent)
+        self.index[agent] = i
+        self.gx[i], self.gy[i] = agent.goal
+        self.speed[i] = agent.speed
+        self.last_goal[i] = agent.last_goal
+
+    def remove(self, agent):
+        """ the last agent takes the place of the removed one """
+        i = self.index.pop(agent, None)
+        if i is None:
+            return
+        last = self.agents.pop()
+        if last is not agent:
+            self.agents[i] = last
+            self.index[last] = i
+            self.state[:, i] = self.state[:, len(self.agents)]
+
+    def steer(self, dt):
+        """ AI phase: fresh goals and headings for every agent """
+        n = len(self.agents)
+        if not n:
+            return
+        agents = self.agents
+        x, y = self.x[:n], self.y[:n]
+        gx, gy = self.gx[:n], self.gy[:n]
+        last_goal = self.last_goal[:n]
+
+        # collisions may have moved them since last tick
+        for i, agent in enumerate(agents):
+            x[i], y[i] = agent.position
+
+        # agents on a flow field get their goal from it, every tick
+        due = (last_goal + dt) > GOAL_REFRESH
+        if self.flows is not None:
+            due &= ~self.flows.guide(agents, x, y, gx, gy, dt)
+
+        last_goal += dt
+        for i in numpy.flatnonzero(due):
+            last_goal[i] = 0
+            gx[i], gy[i] = agents[i].next_goal()
+
+        if self.space is not None:
+            self.avoid = self.neighbours(x, y)
+        heading = steer(x, y, gx, gy, *self.avoid)
+        if self.walls is not None:
+            heading = repel(heading, *self.walls.near_walls(x, y))
+        self.rotation = heading % 360
+        for agent, r in zip(agents, self.rotation.tolist()):
+            agent.rotation = r
+
+    def neighbours(self, x, y):
+        """
+        (who, ox, oy): the agents of the herd closer than SEPARATION_FAR to
+        each, other than itself, as steer takes them. The spatial hash
+        cells have to be at least that big. Each agent looks in the 3x3
+        cells around its own, found all at once by sorting the agents by
+        the cell the spatial hash has them in
+        """
+        keys = self.space.keys
+        cells = numpy.array([keys[agent] for agent in self.agents])
+        # one int per cell, with room for the cells around
+        ci = cells[:, 0] - cells[:, 0].min() + 1
+        cj = cells[:, 1] - cells[:, 1].min() + 1
+        rows = cj.max() + 2
+        cell = ci * rows + cj
+        order = cell.argsort(kind='mergesort')
+        sorted_cells = cell[order]
+        # the cells with agents in, where they start in order and how many
+        start = numpy.flatnonzero(numpy.r_[True, sorted_cells[1:] != sorted_cells[:-1]])
+        used = sorted_cells[start]
+        counts = numpy.diff(numpy.r_[start, len(cell)])
+        whos = []
+        others = []
+        for di in (-1, 0, 1):
+            for dj in (-1, 0, 1):
+                # sorted queries, so agents are taken in order
+                around = sorted_cells + (di * rows + dj)
+                at = numpy.minimum(used.searchsorted(around), len(used) - 1)
+                count = numpy.where(used[at] == around, counts[at], 0)
+                total = count.sum()
+                if not total:
+                    continue
+                # start, start+1... start+count-1 for each agent, end to end
+                first = numpy.repeat(start[at] - (count.cumsum() - count), count)
+                whos.append(numpy.repeat(order, count))
+                others.append(order[first + numpy.arange(total)])
+        who = numpy.concatenate(whos)
+        other = numpy.concatenate(others)
+        ox, oy = x[other], y[other]
+        close = (who != other) & (numpy.hypot(x[who] - ox, y[who] - oy) < SEPARATION_FAR)
+        return who[close], ox[close], oy[close]
+
+    def move(self, dt):
+        """ movement phase: sets next_position of every agent """
+        n = len(self.agents)
+        if not n:
+            return
+        a = numpy.radians(-self.rotation)
+        speed = self.speed[:n]
+        nx = self.x[:n] + numpy.cos(a) * speed * dt
+        ny = self.y[:n] + numpy.sin(a) * speed * dt
+        for agent, px, py in zip(self.agents, nx.tolist(), ny.tolist()):
+            agent.next_position = (px, py)
+
+    def step(self, dt):
+        """ a whole tick for the herd alone """
+        self.steer(dt)
+        self.move(dt)
+        for agent in list(self.agents):
+            agent.advance(agent.next_position, dt)
+
+def test_separation(steps=30, dt=1/60.):
+    from spatialhash import SpatialHash
+    class Walker(object):
+        def __init__(self, position, goal):
+            self.position = position
+            self.goal = goal
+            self.speed = 100
+            self.last_goal = 0
+            self.target = None
+        def next_goal(self):
+            return self.goal
+        def advance(self, position, dt):
+            self.position = position
+            space.move(self)
+    space = SpatialHash(96)
+    herd = Herd()
+    herd.space = space
+    # two on top of each other, heading the same way, and one far away
+    a = Walker((0, 0), (1000, 0))
+    b = Walker((10, 0), (1000, 0))
+    lone = Walker((500, 500), (1000, 500))
+    for walker in a, b, lone:
+        space.add(walker)
+        herd.add(walker)
+    herd.steer(dt)
+    # they turn away from each other, the other one heads for its goal
+    assert 90 < herd.rotation[0] < 270
+    assert herd.rotation[1] < 90 or herd.rotation[1] > 270
+    assert herd.rotation[2] == 0
+    for i in range(steps):
+        herd.step(dt)
+    ax, ay = a.position
+    bx, by = b.position
+    assert (bx - ax)**2 + (by - ay)**2 >= SEPARATION_NEAR**2
+    # without a space, they don't mind each other
+    herd.space = None
+    herd.avoid = (), (), ()
+    a.position, b.position = (0, 0), (10, 0)
+    herd.steer(dt)
+    assert herd.rotation[0] == herd.rotation[1] == 0
+    print 'test separation ok'
@@ -1,3 +1,4 @@
+import collections
 import random
 
 import cocos
@@ -10,10 +11,42 @@ from cocos.sprite import Sprite
 
 import sound
 
+# faces and voices are picked with their own generator, so what is shown
+# does not change how the game plays, nor how a replay of it does
+looks = random.Random()
+
+# messages a NullTalkLayer remembers, the last ones said
+SAID_KEPT = 100
+
 class TalkLayer(cocos.layer.Layer):
+    """
+    shows who is talking and what they say, one message at a time. The
+    faces, the balloon and the label are made once and kept: a message
+    only shows its face and sets the text. The balloon is stretched to the
+    window size in layout, the first time and when the size changes.
+    """
     def __init__(self):
         super(TalkLayer, self).__init__()
         self.talking = []
+        # image name -> face Sprite, made the first time someone talks
+        self.faces = {}
+        self.face = None
+        self.balloon_l = Sprite('faces/balloon-left.png', opacity=127)
+        self.balloon_c = Sprite('faces/balloon-center.png', opacity=127)
+        self.balloon_r = Sprite('faces/balloon-right.png', opacity=127)
+        self.add(self.balloon_l)
+        self.add(self.balloon_c)
+        self.add(self.balloon_r)
+        self.label = cocos.text.Label('',
+            font_name='Times New Roman',
+            font_size=32,
+            anchor_x='left', anchor_y='top', multiline=True,
+            width=director.get_window_size()[0])
+        self.label.element.color = 0,0,0,255
+        self.add(self.label, z=1)
+        # (window size, face size) the balloon was laid out for
+        self.laid_out = None
+        self.visible = False
 
     def talk(self, who, message, duration=5, transient=True):
         # transient messages get discarded if we are talking
@@ -28,47 +61,34 @@ class TalkLayer(cocos.layer.Layer):
 
     def end_talking(self):
         self.talking = self.talking[1:]
-        ch = list(self.get_children())
-        for c in ch:
-            self.remove(c)
+        self.face.visible = False
         self.update_talk()
 
-    def update_talk(self):
-        if not self.talking:
-            return
-        who, text, duration = self.talking[0]
-        x, y = director.get_window_size()
-
-
+    def get_face(self, who):
         if who == "zombie":
-            zombie_sound = random.choice([
-                "ZombieDie",
-                "ZombieGerman",
-            ])
-            sound.play(zombie_sound)
-            img = random.choice([
+            img = looks.choice([
                 'faces/Punkie zombie.png',
                 'faces/Afro zombie.png',
                 'faces/Fat zombie byn.png',
                 'faces/Bitch zombie.png',
             ])
-            face = Sprite(img)
         else:
-            face = Sprite('faces/%s.png'%who)
-
-        self.add(face)
-        face.position = face.image.width*face.scale/2, y - face.image.height * face.scale/2
-
-        balloon_l = Sprite('faces/balloon-left.png', opacity=127)
-        balloon_r = Sprite('faces/balloon-right.png', opacity=127)
-        balloon_c = Sprite('faces/balloon-center.png', opacity=127)
-
-        self.add(balloon_l)
-        self.add(balloon_c)
-        self.add(balloon_r)
-
-        x1 = face.image.width*face.scale
-        y1 = y - face.image.height * face.scale
+            img = 'faces/%s.png'%who
+        if img not in self.faces:
+            face = Sprite(img)
+            face.visible = False
+            self.faces[img] = face
+            self.add(face)
+        return self.faces[img]
+
+    def layout(self, size, face_size):
+        """ stretches the balloon from the face to the right of the window """
+        x, y = size
+        face_w, face_h = face_size
+        balloon_l, balloon_c, balloon_r = self.balloon_l, self.balloon_c, self.balloon_r
+
+        x1 = face_w
+        y1 = y - face_h
         x2 = x1+balloon_l.image.width
         y2 = y-3
         balloon_l._vertex_list.vertices[:] = [x1, y1, x2, y1, x2, y2, x1, y2]
@@ -79,19 +99,55 @@ class TalkLayer(cocos.layer.Layer):
         y2 = y-3
         balloon_r._vertex_list.vertices[:] = [x1, y1, x2, y1, x2, y2, x1, y2]
 
-        x1 = face.image.width*face.scale+balloon_l.image.width
+        x1 = face_w+balloon_l.image.width
         y1 = y1
         x2 = x-5-balloon_r.image.width
         y2 = y-3
         balloon_c._vertex_list.vertices[:] = [x1, y1, x2, y1, x2, y2, x1, y2]
 
+        label = self.label.element
+        label.begin_update()
+        label.x, label.y = x1, y-20
+        label.width = x-face_w-40
+        label.end_update()
+        self.laid_out = size, face_size
 
+    def update_talk(self):
+        if not self.talking:
+            self.visible = False
+            return
+        who, text, duration = self.talking[0]
+        size = director.get_window_size()
 
-        label = cocos.text.Label(text,
-            font_name='Times New Roman',
-            font_size=32,
-            x=x1, y=y-20,
-            anchor_x='left', anchor_y='top', width=x-face.image.width*face.scale-40, multiline=True)
-        label.element.color = 0,0,0,255
-        self.add(label, z=1)
+        if who == "zombie":
+            zombie_sound = looks.choice([
+                "ZombieDie",
+                "ZombieGerman",
+            ])
+            sound.play(zombie_sound)
+
+        face = self.face = self.get_face(who)
+        face_size = face.image.width*face.scale, face.image.height*face.scale
+        face.position = face_size[0]/2, size[1] - face_size[1]/2
+        face.visible = True
+        if self.laid_out != (size, face_size):
+            self.layout(size, face_size)
+
+        self.label.element.text = text
+        self.visible = True
         self.do( Delay(duration) + CallFunc(self.end_talking) )
+
+
+class NullTalkLayer(cocos.layer.Layer):
+    """
+    for headless runs: remembers the last SAID_KEPT messages and how many
+    there were, shows nothing
+    """
+    def __init__(self):
+        super(NullTalkLayer, self).__init__()
+        self.said = collections.deque(maxlen=SAID_KEPT)
+        self.said_count = 0
+
+    def talk(self, who, message, duration=5, transient=True):
+        self.said.append((who, message))
+        self.said_count += 1
@@ -172,6 +172,21 @@ class SavedAtlas(object):
         region = self.map[key]
         return region
 
+# (atlas image, coords file) -> SavedAtlas, for load_saved
+_saved = {}
+
+def load_saved(atlas_img, coords_file):
+    """
+    the SavedAtlas of atlas_img and coords_file, loaded the first time it
+    is asked for and shared after that, regions included. Game and editor
+    layers get their atlas here, so the image is decoded and uploaded once
+    per process however many layers use it
+    """
+    key = os.path.abspath(atlas_img), os.path.abspath(coords_file)
+    if key not in _saved:
+        _saved[key] = SavedAtlas(atlas_img, coords_file)
+    return _saved[key]
+
 if __name__ == "__main__":
     director.init()
     tex = TextureAtlas( 'tiles/set4')
@@ -3,7 +3,7 @@ from tiless_editor.picker import PickerBatchNode
 from cocos.sprite import NotifierSprite
 import pyglet
 from pyglet import gl
-from tiless_editor.atlas import TextureAtlas, SavedAtlas
+from tiless_editor.atlas import TextureAtlas, load_saved
 
 class SpriteLayerFactory(LayerFactory):
     def __init__(self, tiles_path):
@@ -30,7 +30,7 @@ class SpriteLayerFactory(LayerFactory):
         return dict(sprites=sprites)
 
     def dict_to_layer(self, in_dict):
-        source_atlas = SavedAtlas('atlas-fixed.png', 'atlas-coords.json')
+        source_atlas = load_saved('atlas-fixed.png', 'atlas-coords.json')
         def build_sprite(img):
 
             sp = source_atlas[img['filename']]
@@ -1,9 +1,62 @@
+import hashlib
+import math
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+INFINITY = float('inf')
+# are_visible checks this far apart before raycasting
+SAMPLE_STEP = 30
+# tile borders closer than this, in tiles, are crossed at once
+EPSILON = 1.0e-9
+# tiles of room added around the grid when a sprite falls outside it
+GROW_MARGIN = 16
+# tiles on a side of the blocks raycast_many looks at first
+COARSE = 4
+# borders raycast_many looks at in a step, for all the rays left: when
+# few are left, each gets more of them, up to MAX_CHUNK
+BUDGET = 4096
+MAX_CHUNK = 256
+# tiles from the walls the distance field goes, further is as far as this
+DISTANCE_RANGE = 8
 
 
 class WallMask(object):
+    """
+    the tiles walls are on, padded one tile, as a dense grid of bytes:
+    rows[i - i0][j - j0] is 1 if tile (i, j) is blocked. Tiles are numbered
+    int(x/tilesize), int(y/tilesize). The grid grows as sprites are added,
+    tiles outside it are empty.
+    """
     def __init__(self):
         self.tilesize = 20
-        self.wallmask = set()
+        self.rows = [] # a bytearray for each column of tiles
+        self.i0 = self.j0 = 0
+        self.h = 0
+        self._bounds = None # (i0, j0, i1, j1) of the blocked tiles
+        self._dense = None # numpy copy of rows, made when needed
+        self._floored = None
+        self._coarse = None
+        self._distances = None
+        self._grid = None
+
+    def _grow(self, i0, j0, i1, j1):
+        """ makes room for tiles i0..i1, j0..j1, keeping what's in """
+        if self.rows:
+            i0 = min(i0, self.i0)
+            j0 = min(j0, self.j0)
+            i1 = max(i1, self.i0 + len(self.rows) - 1)
+            j1 = max(j1, self.j0 + self.h - 1)
+        i0 -= GROW_MARGIN
+        j0 -= GROW_MARGIN
+        h = j1 + GROW_MARGIN - j0 + 1
+        rows = [bytearray(h) for i in xrange(i1 + GROW_MARGIN - i0 + 1)]
+        for i, row in enumerate(self.rows):
+            start = self.j0 - j0
+            rows[self.i0 - i0 + i][start:start+self.h] = row
+        self.rows = rows
+        self.i0, self.j0, self.h = i0, j0, h
 
     def add(self,sprite): #only if apropiate
         padding = 1
@@ -16,13 +69,514 @@ class WallMask(object):
             h = sprite.height
         sx = (sprite.x - w/2)/self.tilesize - padding
         sy = (sprite.y - h/2)/self.tilesize - padding
-        for x in range(w/self.tilesize+1 + padding*2):
-            for y in range(h/self.tilesize+1 + padding*2):
-                key = int(sx+x),int(sy+y)
-                self.wallmask.add(key)
+        # int() of sx+x for x in range(n) runs through int(sx)..int(sx+n-1)
+        i0 = int(sx)
+        i1 = int(sx + w/self.tilesize + padding*2)
+        j0 = int(sy)
+        j1 = int(sy + h/self.tilesize + padding*2)
+        if (i0 < self.i0 or j0 < self.j0 or i1 >= self.i0 + len(self.rows) or
+            j1 >= self.j0 + self.h):
+            self._grow(i0, j0, i1, j1)
+        start = j0 - self.j0
+        n = j1 - j0 + 1
+        for row in self.rows[i0 - self.i0:i1 - self.i0 + 1]:
+            row[start:start+n] = '\x01'*n
+        if self._bounds is None:
+            self._bounds = i0, j0, i1, j1
+        else:
+            b = self._bounds
+            self._bounds = min(b[0], i0), min(b[1], j0), max(b[2], i1), max(b[3], j1)
+        self._dense = self._floored = self._coarse = self._grid = self._distances = None
 
 
     def is_empty(self,x,y):
-        key = (int(x/self.tilesize),int(y/self.tilesize))
-        result = not key in self.wallmask
-        return result
+        i = int(x/self.tilesize) - self.i0
+        j = int(y/self.tilesize) - self.j0
+        # past the end is an IndexError, negatives would wrap around
+        try:
+            if i >= 0 and j >= 0:
+                return not self.rows[i][j]
+        except IndexError:
+            pass
+        return True
+
+    def _get_dense(self):
+        """ rows as a numpy bool array, the key of its [0, 0] is (i0, j0) """
+        if self._dense is None:
+            if not self.rows:
+                # nothing added yet: a grid of empty tiles, as around walls
+                self._grow(0, 0, 0, 0)
+            self._dense = numpy.frombuffer(bytearray().join(self.rows),
+                                           dtype=bool).reshape(len(self.rows), self.h)
+        return self._dense
+
+    def _get_floored(self):
+        """
+        the dense grid with tiles numbered by floor() instead of int(), as
+        a flat array, and the floored tile of its first item: tile 0 of the
+        mask is floored tiles -1 and 0. Tiles past the edges are as empty as
+        the edges themselves, there's always GROW_MARGIN of them
+        """
+        if self._floored is None:
+            dense = self._get_dense()
+            w, h = dense.shape
+            fi0 = self.i0 - (self.i0 <= 0)
+            fj0 = self.j0 - (self.j0 <= 0)
+            ci = numpy.arange(fi0, self.i0 + w)
+            cj = numpy.arange(fj0, self.j0 + h)
+            floored = dense[(ci + (ci < 0) - self.i0)[:, None],
+                            (cj + (cj < 0) - self.j0)[None, :]]
+            self._floored = floored.ravel(), fi0, fj0, floored.shape
+        return self._floored
+
+    def _get_coarse(self):
+        """
+        _get_floored for blocks of COARSE by COARSE floored tiles, blocked
+        if any of their tiles is. Block b holds tiles b*COARSE on
+        """
+        if self._coarse is None:
+            flat, fi0, fj0, (w, h) = self._get_floored()
+            ci0, cj0 = fi0 // COARSE, fj0 // COARSE
+            # room for whole blocks, the tiles added are empty
+            pi, pj = fi0 - ci0*COARSE, fj0 - cj0*COARSE
+            cw, ch = -(-(w + pi) // COARSE), -(-(h + pj) // COARSE)
+            padded = numpy.zeros((cw*COARSE, ch*COARSE), dtype=bool)
+            padded[pi:pi+w, pj:pj+h] = flat.reshape(w, h)
+            coarse = padded.reshape(cw, COARSE, ch, COARSE).any(axis=3).any(axis=1)
+            self._coarse = coarse.ravel(), ci0, cj0, coarse.shape
+        return self._coarse
+
+    def is_empty_many(self, xs, ys):
+        """ is_empty for arrays of coordinates, as a bool array. Needs numpy """
+        dense = self._get_dense()
+        w, h = dense.shape
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        # astype truncates, as int() does
+        i = (xs / self.tilesize).astype(int) - self.i0
+        j = (ys / self.tilesize).astype(int) - self.j0
+        inside = (i >= 0) & (i < w) & (j >= 0) & (j < h)
+        return ~dense[numpy.where(inside, i, 0), numpy.where(inside, j, 0)] | ~inside
+
+    def _blocked(self, cx, cy):
+        """ is_empty's opposite, for the tile at cx, cy in tile units, floored """
+        # int() truncates: floored -1 and 0 both belong to tile 0
+        i = cx + (cx < 0) - self.i0
+        j = cy + (cy < 0) - self.j0
+        try:
+            if i >= 0 and j >= 0:
+                return self.rows[i][j]
+        except IndexError:
+            pass
+        return False
+
+    def raycast(self, origin, target):
+        """
+        walks, tile by tile, the segment from origin to target. Returns
+        (hitpoint, distance) for the first blocked tile it gets into, or
+        (None, length of the segment) if there is none. Going exactly
+        through the corner of two blocked tiles is a hit.
+        Grid traversal as in wall_colision2.create_ray_to_wall_collision
+        """
+        s = float(self.tilesize)
+        x0, y0 = origin
+        ux, uy = x0/s, y0/s
+        dx, dy = (target[0] - x0)/s, (target[1] - y0)/s
+        length = math.hypot(dx, dy)*s
+        cx, cy = int(math.floor(ux)), int(math.floor(uy))
+        # t goes from 0 at origin to 1 at target; tx, ty is the t of the
+        # next vertical, horizontal tile border and tdx, tdy between borders
+        if dx > 0:
+            sx, tdx = 1, 1/dx
+            tx = (cx + 1 - ux)*tdx
+        elif dx < 0:
+            sx, tdx = -1, -1/dx
+            tx = (ux - cx)*tdx
+        else:
+            sx, tdx, tx = 0, 0, INFINITY
+        if dy > 0:
+            sy, tdy = 1, 1/dy
+            ty = (cy + 1 - uy)*tdy
+        elif dy < 0:
+            sy, tdy = -1, -1/dy
+            ty = (uy - cy)*tdy
+        else:
+            sy, tdy, ty = 0, 0, INFINITY
+
+        t = 0.0
+        blocked = self._blocked
+        while not blocked(cx, cy):
+            if tx < ty - EPSILON:
+                t = tx
+                cx += sx
+                tx += tdx
+            elif ty < tx - EPSILON:
+                t = ty
+                cy += sy
+                ty += tdy
+            else:
+                t = tx
+                if t <= 1 and (blocked(cx + sx, cy) or blocked(cx, cy + sy)):
+                    break
+                cx += sx
+                cy += sy
+                tx += tdx
+                ty += tdy
+            if t > 1:
+                return None, length
+        return (x0 + dx*s*t, y0 + dy*s*t), length*t
+
+    def raycast_many(self, ox, oy, tx, ty, chunk=16):
+        """
+        raycast for arrays of segments, from (ox, oy) to (tx, ty). Scalars
+        are taken as the same point for all. Returns the arrays (hit, hx,
+        hy, distance): hx, hy is the hitpoint, or the target where hit is
+        False. Needs numpy.
+        The rays go first over blocks of COARSE tiles, blocked where any of
+        their tiles is: a ray that gets into no blocked block gets into no
+        blocked tile, and one that does can't get into a blocked tile
+        before. So only the rays that hit a block go over the tiles, from
+        where they hit it on.
+        """
+        s = float(self.tilesize)
+        ox, oy, tx, ty = [a.ravel() for a in numpy.broadcast_arrays(
+            *[numpy.asarray(c, dtype=float) for c in (ox, oy, tx, ty)])]
+        ux, uy = ox/s, oy/s
+        dx, dy = (tx - ox)/s, (ty - oy)/s
+
+        t = self._first_hits(self._get_coarse(), ux/COARSE, uy/COARSE,
+                             dx/COARSE, dy/COARSE, numpy.zeros(len(ux)), chunk)
+        rays = numpy.flatnonzero(t <= 1)
+        t[rays] = self._first_hits(self._get_floored(), ux[rays], uy[rays],
+                                   dx[rays], dy[rays], t[rays], chunk)
+        hit = t <= 1
+        t[~hit] = 1
+        distance = numpy.hypot(dx, dy)*s*t
+        return hit, ox + dx*s*t, oy + dy*s*t, distance
+
+    def _first_hits(self, grid, ux, uy, dx, dy, start, chunk):
+        """
+        t of the first blocked tile of grid, as _get_floored gives them,
+        the rays from (ux, uy) to (ux + dx, uy + dy) in its tile units get
+        into, infinity for none. No hit comes before start.
+        Instead of one tile at a time, each ray looks at the tiles past its
+        next few vertical and horizontal tile borders at once, up to chunk
+        of them, or more when there are few rays left: every step costs
+        about the same numpy calls, whatever the size of the arrays. Rays
+        are dropped as soon as what's left can't have an earlier hit
+        """
+        flat, fi0, fj0, (w, h) = grid
+
+        def blocked(ci, cj):
+            """ for floored tiles, as floats """
+            k = numpy.clip(ci - fi0, 0, w-1)*h + numpy.clip(cj - fj0, 0, h-1)
+            return flat.take(k.astype(int))
+
+        def borders(u, d):
+            """
+            tile of u; step, t of the first border, t between borders and
+            how many borders to skip to get to start
+            """
+            c = numpy.floor(u)
+            moving = d != 0
+            dt = numpy.where(moving, 1/numpy.where(moving, numpy.abs(d), 1), 0)
+            first = numpy.where(d > 0, c + 1 - u, u - c)*dt
+            # one border early, so rounding never skips the one at start
+            skip = numpy.floor((start - first)/numpy.where(moving, dt, 1)) - 1
+            skip = numpy.where(moving, numpy.maximum(skip, 0), 0)
+            return c, numpy.sign(d), numpy.where(moving, first, INFINITY), dt, skip
+
+        cx, sx, fx, tdx, kx = borders(ux, dx)
+        cy, sy, fy, tdy, ky = borders(uy, dy)
+        # t of the first hit found yet
+        t = numpy.where(blocked(cx, cy), 0.0, INFINITY)
+        hit = t == 0
+
+        def crossings(k, n, skip, c, step, first, dt, vu, vd, swap):
+            """
+            (t of the first blocked tile past the borders skip+k..skip+k+n-1
+            of one axis, t of the last of those borders). Both tiles on the
+            other axis are looked at when going through a corner
+            """
+            k = skip[:, None] + numpy.arange(k, k + n, dtype=float)
+            tk = first[:, None] + k*dt[:, None]
+            valid = tk <= 1
+            c = c[:, None] + (k + 1)*step[:, None]
+            # not moving along the other axis, v stays at vu
+            v = vu[:, None] + vd[:, None]*numpy.where(valid, tk, 0)
+            side = vd[:, None]*EPSILON
+            before = numpy.floor(v - side)
+            after = numpy.floor(v + side)
+            if swap:
+                stop = blocked(before, c)
+            else:
+                stop = blocked(c, before)
+            corner = numpy.nonzero(before != after)
+            if len(corner[0]):
+                if swap:
+                    stop[corner] |= blocked(after[corner], c[corner])
+                else:
+                    stop[corner] |= blocked(c[corner], after[corner])
+            stop &= valid
+            return (numpy.where(stop, tk, INFINITY).min(axis=1),
+                    numpy.where(valid[:, -1], tk[:, -1], INFINITY))
+
+        alive = numpy.flatnonzero(~hit)
+        # most rays hit something soon, the chunks grow for those that don't
+        k, n = 0, 2
+        while len(alive):
+            n = max(n, min(BUDGET // len(alive), MAX_CHUNK))
+            a = alive
+            hx, seen_x = crossings(k, n, kx[a], cx[a], sx[a], fx[a], tdx[a], uy[a], dy[a], False)
+            hy, seen_y = crossings(k, n, ky[a], cy[a], sy[a], fy[a], tdy[a], ux[a], dx[a], True)
+            first = numpy.minimum(numpy.minimum(hx, hy), t[a])
+            found = first <= 1
+            t[a[found]] = first[found]
+            hit[a[found]] = True
+            # all borders before seen are looked at, a hit there is the first
+            seen = numpy.minimum(seen_x, seen_y)
+            alive = a[(~found | (first > seen)) & (seen <= 1)]
+            k += n
+            n = min(n*2, chunk)
+        return t
+
+    def is_visible(self, p, q):
+        """ True if nothing in the mask lies between p and q """
+        return self.raycast(q, p)[0] is None
+
+    def bounds(self):
+        """ (x0, y0, x1, y1) of the tiles in the mask, all 0 if there are none """
+        if self._bounds is None:
+            return 0, 0, 0, 0
+        s = self.tilesize
+        i0, j0, i1, j1 = self._bounds
+        return i0*s, j0*s, (i1+1)*s, (j1+1)*s
+
+    def get_grid(self):
+        """
+        the blocked tiles as a numpy bool array, and the key of its [0, 0]
+        item. Empty, of shape (0, 0), if there are none
+        """
+        if self._grid is None and self._bounds is None:
+            self._grid = numpy.zeros((0, 0), dtype=bool), (0, 0)
+        elif self._grid is None:
+            i0, j0, i1, j1 = self._bounds
+            dense = self._get_dense()
+            self._grid = (dense[i0-self.i0:i1-self.i0+1, j0-self.j0:j1-self.j0+1],
+                          (i0, j0))
+        return self._grid
+
+    def keys(self):
+        """ the blocked tiles, sorted """
+        return [(self.i0 + i, self.j0 + j)
+                for i, row in enumerate(self.rows)
+                for j, blocked in enumerate(row) if blocked]
+
+    def _sampled_clear(self, px, py, qx, qy, block=8):
+        """
+        False for the segments that have a point, out of one every
+        SAMPLE_STEP units from q on, in a blocked tile. The others may still
+        go through a wall between samples. Samples are taken a few at a
+        time, and only for the segments that are still clear.
+        """
+        grid, (i0, j0) = self.get_grid()
+        w, h = grid.shape
+        dx = px - qx
+        dy = py - qy
+        steps = numpy.hypot(dx, dy) / SAMPLE_STEP
+        last = numpy.floor(steps)
+        # unit steps along each segment; p == q only takes the sample at q
+        ux = numpy.where(steps > 0, dx / numpy.where(steps > 0, steps, 1), 0)
+        uy = numpy.where(steps > 0, dy / numpy.where(steps > 0, steps, 1), 0)
+        clear = numpy.ones(len(px), dtype=bool)
+        alive = numpy.arange(len(px))
+        start = 0
+        while len(alive):
+            i = numpy.arange(start, start + block, dtype=float)[None, :]
+            taken = i <= last[alive, None]
+            kx = numpy.trunc((qx[alive, None] + ux[alive, None]*i) / self.tilesize).astype(int) - i0
+            ky = numpy.trunc((qy[alive, None] + uy[alive, None]*i) / self.tilesize).astype(int) - j0
+            inside = taken & (kx >= 0) & (kx < w) & (ky >= 0) & (ky < h)
+            blocked = numpy.zeros(inside.shape, dtype=bool)
+            blocked[inside] = grid[kx[inside], ky[inside]]
+            clear[alive[blocked.any(axis=1)]] = False
+            start += block
+            alive = alive[clear[alive] & (last[alive] >= start)]
+        return clear
+
+    def are_visible(self, px, py, qx, qy):
+        """
+        is_visible((px, py), (qx, qy)) for arrays of coordinates, as a bool
+        array. Scalars are taken as the same point for all. Needs numpy.
+        A sample of the segment in a blocked tile is enough to tell it's not
+        clear, only the segments the samples miss are raycast
+        """
+        px, py, qx, qy = [a.ravel() for a in numpy.broadcast_arrays(
+            *[numpy.asarray(c, dtype=float) for c in (px, py, qx, qy)])]
+        clear = self._sampled_clear(px, py, qx, qy)
+        k = numpy.flatnonzero(clear)
+        clear[k] = ~self.raycast_many(qx[k], qy[k], px[k], py[k])[0]
+        return clear
+
+    def _get_distances(self):
+        """
+        the signed distance field: for each floored tile center, how far it
+        is from the edge of the nearest blocked tile, negative inside them,
+        and its gradient. As lists of lists for quick lookups from Python,
+        and as arrays for the vectorised ones
+        """
+        if self._distances is None:
+            flat, fi0, fj0, (w, h) = self._get_floored()
+            blocked = flat.reshape(w, h)
+            sdf = numpy.where(blocked, 0.5 - _distance_transform(~blocked),
+                              _distance_transform(blocked) - 0.5) * self.tilesize
+            gx, gy = numpy.gradient(sdf)
+            self._distances = (numpy.array([sdf, gx, gy]),
+                               sdf.tolist(), gx.tolist(), gy.tolist())
+        return self._distances
+
+    def _interpolate(self, rows, x, y, far):
+        """ bilinear interpolation of rows, made by _get_distances, at x, y """
+        flat, fi0, fj0, (w, h) = self._get_floored()
+        s = float(self.tilesize)
+        u = x/s - 0.5 - fi0
+        v = y/s - 0.5 - fj0
+        i = int(math.floor(u))
+        j = int(math.floor(v))
+        if not (0 <= i < w-1 and 0 <= j < h-1):
+            return far
+        fu = u - i
+        fv = v - j
+        a, b = rows[i], rows[i+1]
+        return ((a[j]*(1-fv) + a[j+1]*fv)*(1-fu) +
+                (b[j]*(1-fv) + b[j+1]*fv)*fu)
+
+    def distance_at(self, x, y):
+        """
+        how far x, y is from the nearest blocked tile, negative inside one.
+        Up to DISTANCE_RANGE tiles. Needs numpy
+        """
+        rows = self._get_distances()[1]
+        return self._interpolate(rows, x, y, (DISTANCE_RANGE - 0.5)*self.tilesize)
+
+    def normal_at(self, x, y):
+        """
+        unit vector away from the nearest blocked tile at x, y, (0, 0) when
+        there's none in DISTANCE_RANGE. Needs numpy
+        """
+        grids, rows, gx_rows, gy_rows = self._get_distances()
+        nx = self._interpolate(gx_rows, x, y, 0.0)
+        ny = self._interpolate(gy_rows, x, y, 0.0)
+        norm = math.hypot(nx, ny)
+        if norm == 0:
+            return 0.0, 0.0
+        return nx/norm, ny/norm
+
+    def slide(self, origin, target):
+        """
+        where something going from origin to target gets, when target is
+        not empty: as far along the wall as the move goes, or origin if
+        that is blocked too. Near corners, where the wall isn't where the
+        normal says, and without numpy, it tries keeping x, then y
+        """
+        x0, y0 = origin
+        x1, y1 = target
+        if numpy is not None:
+            nx, ny = self.normal_at(x0, y0)
+            dx, dy = x1 - x0, y1 - y0
+            # drop the part of the move that goes into the wall
+            into = dx*nx + dy*ny
+            if into < 0:
+                dx -= into*nx
+                dy -= into*ny
+            if self.is_empty(x0 + dx, y0 + dy):
+                return x0 + dx, y0 + dy
+        if self.is_empty(x0, y1):
+            return x0, y1
+        if self.is_empty(x1, y0):
+            return x1, y0
+        return origin
+
+    def near_walls(self, xs, ys):
+        """
+        distance_at and normal_at for arrays of coordinates, as three
+        arrays: distance, nx, ny. Needs numpy
+        """
+        grids = self._get_distances()[0]
+        flat, fi0, fj0, (w, h) = self._get_floored()
+        s = float(self.tilesize)
+        u = numpy.asarray(xs, dtype=float)/s - 0.5 - fi0
+        v = numpy.asarray(ys, dtype=float)/s - 0.5 - fj0
+        i = numpy.floor(u)
+        j = numpy.floor(v)
+        fu = u - i
+        fv = v - j
+        inside = (i >= 0) & (i < w-1) & (j >= 0) & (j < h-1)
+        i = numpy.where(inside, i, 0).astype(int)
+        j = numpy.where(inside, j, 0).astype(int)
+        # the three grids at once
+        distance, nx, ny = inside * (
+            (grids[:, i, j]*(1-fv) + grids[:, i, j+1]*fv)*(1-fu) +
+            (grids[:, i+1, j]*(1-fv) + grids[:, i+1, j+1]*fv)*fu)
+        distance[~inside] = (DISTANCE_RANGE - 0.5)*self.tilesize
+        norm = numpy.hypot(nx, ny)
+        norm[norm == 0] = 1
+        return distance, nx/norm, ny/norm
+
+    def digest(self):
+        """ a hash of the mask, changes whenever the walls, or how visibility is tested, do """
+        return hashlib.sha1(repr((self.tilesize, 'raycast', self.keys()))).hexdigest()
+
+
+def _distance_transform(blocked):
+    """
+    for each tile, the distance, in tiles, from its center to the nearest
+    blocked tile center, up to DISTANCE_RANGE. Exact along the columns,
+    the nearest blocked tile in each column, then the best of the columns
+    in range. Needs numpy
+    """
+    w, h = blocked.shape
+    far = float(DISTANCE_RANGE)
+    # along j, both ways
+    column = numpy.where(blocked, 0.0, far)
+    for j in xrange(1, h):
+        numpy.minimum(column[:, j], column[:, j-1] + 1, column[:, j])
+    for j in xrange(h-2, -1, -1):
+        numpy.minimum(column[:, j], column[:, j+1] + 1, column[:, j])
+    # then across i
+    squared = column**2
+    best = squared.copy()
+    for di in xrange(1, DISTANCE_RANGE + 1):
+        numpy.minimum(best[di:], squared[:-di] + di*di, best[di:])
+        numpy.minimum(best[:-di], squared[di:] + di*di, best[:-di])
+    return numpy.minimum(numpy.sqrt(best), far)
+
+def test_empty():
+    """
+    a mask nothing was added to has no bounds and no grid, and everything
+    is clear and far from walls. Flow fields made from it lead nowhere
+    """
+    import flowfield
+    class Thing(object):
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+    mask = WallMask()
+    assert mask.bounds() == (0, 0, 0, 0)
+    grid, key = mask.get_grid()
+    assert grid.shape == (0, 0) and key == (0, 0)
+    assert mask.is_empty(5, 5) and mask.is_empty_many([5, -300], [5, 800]).all()
+    assert mask.are_visible([0, 500], [0, 9], [100, -300], [50, 2000]).all()
+    assert not mask.raycast_many([0], [0], [100], [50])[0].any()
+    far = (DISTANCE_RANGE - 0.5)*mask.tilesize
+    assert mask.distance_at(3, 4) == far and mask.normal_at(3, 4) == (0.0, 0.0)
+    distance, nx, ny = mask.near_walls([3, 1000], [4, 1000])
+    assert (distance == far).all() and not nx.any() and not ny.any()
+    assert mask.slide((0, 0), (5, 5)) == (5, 5)
+    fields = flowfield.FlowFields(mask)
+    field = fields.field(Thing(position=(500.0, 500.0)))
+    assert (field.distance == flowfield.UNREACHED).all()
+    # walls added later are seen
+    mask.add(Thing(x=100.0, y=100.0, width=40, height=40, rotation=0))
+    assert mask.bounds() != (0, 0, 0, 0) and mask.get_grid()[0].any()
+    assert not mask.is_empty(100, 100)
+    print 'test empty ok'
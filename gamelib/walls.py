@@ -16,7 +16,6 @@ from cocos.sprite import Sprite
 from tiless_editor.plugins.sprite_layer import SpriteLayerFactory
 #from tiless_editor.layers.collision import CollisionLayer
 from tiless_editor.tiless_editor import LayersNode
-from tiless_editor.atlas import SavedAtlas
 
 from pyglet.image.atlas import Allocator
 
@@ -27,89 +26,253 @@ import Image
 
 
 
-class WallLayer(cocos.cocosnode.CocosNode):
-    def __init__(self):
-        super(WallLayer, self).__init__()
-        self.top_batch = pyglet.graphics.Batch()
-        self.wall_batch = pyglet.graphics.Batch()
-        self.top_to_wall = {}
-        self.walls_atlas = SavedAtlas('data/walls-atlas-fixed.png', 'data/walls-atlas-coords.json')
+# how far walls stand out of the floor
+WALL_HEIGHT = 50
+WALL_COLOR = (128, 128, 128)
+# side of the cells boxes are looked up by
+CELL = 64
 
-    def add(self, source_sprite):
-        sprite = source_sprite
-        wall_sprite = self.get_wall(source_sprite)
+
+class WallMesh(object):
+    """
+    the quads of the walls, as few as they can be. Each wall sprite is a
+    box, the image of the sprite on top and the wall image of conf_walls on
+    its sides. Then:
+
+    - a side with another box right behind it can't be seen, it is dropped
+    - sides in a row on the same plane, of the same image and length, are
+      merged in one quad, the image repeated along it. So are tops of the
+      same image and size, in rows and then in rectangles of rows
+
+    A face repeats its image once per box it was made of, as it looked
+    before merging, so the textures have to be drawn with GL_REPEAT, not
+    from an atlas, and their sizes be powers of two. mesh() gives one
+    indexed list of triangles per texture.
+    """
+    def __init__(self, height=WALL_HEIGHT):
+        self.height = height
+        # (x0, y0, x1, y1, top image, side image), no two the same
+        self.boxes = []
+        self._seen = set()
+        # cell -> boxes in it, made when first needed
+        self._cells = None
+        # sprites given, for the count of the quads they used to be
+        self.sprites = 0
+
+    def add(self, sprite):
+        self.sprites += 1
         wd = sprite.image.width/2
         hd = sprite.image.height/2
-        wh = 50
-        x, y = source_sprite.position
+        x, y = sprite.position
         x = int(x)
         y = int(y)
-        l = (x-wd, y-hd, wh, x+wd, y-hd, wh, x+wd, y+hd, wh, x-wd, y+hd, wh)
-        #l = (x-wd, y-hd, x+wd, y-hd, x+wd, y+hd, x-wd, y+hd)
-        color = [128, 128, 128]
-        vertex_list = self.top_batch.add(4, pyglet.gl.GL_QUADS, None,
-            ('v3i', l),
-            ('c3B', color*4),
-            ('t3f', sprite.image.tex_coords)
-        )
-
-        #top wall
-        l = (x-wd, y-hd, 0, x+wd, y-hd, 0, x+wd, y-hd, wh, x-wd, y-hd, wh)
-        vertex_list = self.wall_batch.add(4, pyglet.gl.GL_QUADS, None,
-            ('v3i', l),
-            ('c3B', color*4),
-            ('t3f', wall_sprite.tex_coords)
-        )
-        #bottom wall
-        l = (x-wd, y+hd, 0, x+wd, y+hd, 0, x+wd, y+hd, wh, x-wd, y+hd, wh)
-        vertex_list = self.wall_batch.add(4, pyglet.gl.GL_QUADS, None,
-            ('v3i', l),
-            ('c3B', color*4),
-            ('t3f', wall_sprite.tex_coords)
-        )
-        #left wall
-        l = (x-wd, y+hd, 0, x-wd, y-hd, 0, x-wd, y-hd, wh, x-wd, y+hd, wh)
-        vertex_list = self.wall_batch.add(4, pyglet.gl.GL_QUADS, None,
-            ('v3i', l),
-            ('c3B', color*4),
-            ('t3f', wall_sprite.tex_coords)
-        )
-        #right wall
-        l = (x+wd, y+hd, 0, x+wd, y-hd, 0, x+wd, y-hd, wh, x+wd, y+hd, wh)
-        vertex_list = self.wall_batch.add(4, pyglet.gl.GL_QUADS, None,
-            ('v3i', l),
-            ('c3B', color*4),
-            ('t3f', wall_sprite.tex_coords)
-        )
-        self.texture = sprite.image.texture
+        box = (x-wd, y-hd, x+wd, y+hd, sprite.path, conf_walls[sprite.path])
+        if box not in self._seen:
+            self._seen.add(box)
+            self.boxes.append(box)
+            self._cells = None
+
+    def _near(self, axis, at, a, b):
+        """ the boxes in the cells the face on the plane axis=at from a to b is in """
+        if self._cells is None:
+            self._cells = {}
+            for box in self.boxes:
+                for cx in range(box[0] // CELL, box[2] // CELL + 1):
+                    for cy in range(box[1] // CELL, box[3] // CELL + 1):
+                        self._cells.setdefault((cx, cy), []).append(box)
+        near = set()
+        for c in range(a // CELL, b // CELL + 1):
+            cell = axis == 1 and (c, at // CELL) or (at // CELL, c)
+            near.update(self._cells.get(cell, ()))
+            # a box ending right at a cell border is in the cell before
+            cell = axis == 1 and (c, (at-1) // CELL) or ((at-1) // CELL, c)
+            near.update(self._cells.get(cell, ()))
+        return near
+
+    def _covered(self, axis, at, a, b, outside):
+        """
+        if boxes fill the other side of the face on the plane axis=at from
+        a to b, outside telling which side it looks at: -1 or 1
+        """
+        spans = []
+        for box in self._near(axis, at, a, b):
+            lo, hi = box[axis], box[axis+2]
+            # the box has to reach a little past the plane, on the outside
+            if outside < 0 and not (lo < at <= hi):
+                continue
+            if outside > 0 and not (lo <= at < hi):
+                continue
+            s0, s1 = box[1-axis], box[3-axis]
+            if s1 > a and s0 < b:
+                spans.append((max(s0, a), min(s1, b)))
+        spans.sort()
+        reach = a
+        for s0, s1 in spans:
+            if s0 > reach:
+                return False
+            reach = max(reach, s1)
+        return reach >= b
+
+    def sides(self):
+        """
+        the sides that can be seen, merged, as (axis, at, start, end, unit,
+        image): on the plane axis=at (0 for x, 1 for y), from start to end
+        along the other axis, the image repeated every unit
+        """
+        faces = {}
+        for box in self.boxes:
+            x0, y0, x1, y1, top, side = box
+            for axis, at, outside, a, b in [(1, y0, -1, x0, x1), (1, y1, 1, x0, x1),
+                                            (0, x0, -1, y0, y1), (0, x1, 1, y0, y1)]:
+                if not self._covered(axis, at, a, b, outside):
+                    faces.setdefault((axis, at, b-a, side), []).append((a, b))
+        merged = []
+        for (axis, at, unit, side), spans in sorted(faces.items()):
+            for start, end in _runs(spans):
+                merged.append((axis, at, start, end, unit, side))
+        return merged
+
+    def tops(self):
+        """
+        the tops, merged, as (x0, y0, x1, y1, w, h, image): the image
+        repeated every w along x and every h along y
+        """
+        by_kind = {}
+        for x0, y0, x1, y1, top, side in self.boxes:
+            by_kind.setdefault((x1-x0, y1-y0, top), []).append((x0, y0, x1, y1))
+        merged = []
+        for (w, h, top), boxes in sorted(by_kind.items()):
+            # rows along x, then rows of the same span along y
+            rows = {}
+            for x0, y0, x1, y1 in boxes:
+                rows.setdefault(y0, []).append((x0, x1))
+            columns = {}
+            for y0, spans in rows.items():
+                for x0, x1 in _runs(spans):
+                    columns.setdefault((x0, x1), []).append((y0, y0+h))
+            for (x0, x1), spans in sorted(columns.items()):
+                for y0, y1 in _runs(spans):
+                    merged.append((x0, y0, x1, y1, w, h, top))
+        return merged
+
+    def mesh(self):
+        """
+        [(image, vertices, tex_coords, indices)], 3 ints and 2 floats per
+        vertex, 4 vertices and 2 triangles per quad. Sides come first, tops
+        are drawn over them
+        """
+        meshes = {}
+        order = []
+        def quad(image, corners, tex):
+            if image not in meshes:
+                meshes[image] = [], [], []
+                order.append(image)
+            vertices, tex_coords, indices = meshes[image]
+            n = len(vertices) / 3
+            for v in corners:
+                vertices.extend(v)
+            tex_coords.extend(tex)
+            indices.extend([n, n+1, n+2, n, n+2, n+3])
+
+        wh = self.height
+        for axis, at, start, end, unit, side in self.sides():
+            u = float(end - start) / unit
+            if axis == 1:
+                # along x, the image starting at the left as it did
+                corners = [(start, at, 0), (end, at, 0), (end, at, wh), (start, at, wh)]
+                quad(side, corners, [0, 0, u, 0, u, 1, 0, 1])
+            else:
+                # along y, starting at the top
+                corners = [(at, end, 0), (at, start, 0), (at, start, wh), (at, end, wh)]
+                quad(side, corners, [0, 0, u, 0, u, 1, 0, 1])
+        for x0, y0, x1, y1, w, h, top in self.tops():
+            u = float(x1 - x0) / w
+            v = float(y1 - y0) / h
+            corners = [(x0, y0, wh), (x1, y0, wh), (x1, y1, wh), (x0, y1, wh)]
+            quad(top, corners, [0, 0, u, 0, u, v, 0, v])
+        return [(image,) + meshes[image] for image in order]
+
+    def counts(self):
+        """ vertices of the walls as quads for each face, and merged """
+        before = self.sprites * 5 * 4
+        after = sum([len(vertices) / 3 for image, vertices, t, i in self.mesh()])
+        return before, after
+
+
+def _runs(spans):
+    """ (start, end) spans joined where one ends right where the next starts """
+    runs = []
+    for start, end in sorted(spans):
+        if runs and runs[-1][1] == start:
+            runs[-1] = runs[-1][0], end
+        else:
+            runs.append((start, end))
+    return runs
+
+
+# image -> texture drawn with GL_REPEAT, for load_repeating
+_textures = {}
+
+def _power_of_two(n):
+    return n > 0 and n & (n - 1) == 0
+
+def load_repeating(image):
+    """
+    the texture of data/image, set to repeat, loaded the first time it is
+    asked for and shared after that: the game builds its WallLayer again on
+    every restart. The image has to be a power of two on each side, else
+    the texture is padded and repeating it would show the padding
+    """
+    if image not in _textures:
+        picture = pyglet.image.load(os.path.join('data', image))
+        if not (_power_of_two(picture.width) and _power_of_two(picture.height)):
+            raise ValueError("wall image %s is %dx%d, it has to be a power of two on each side"
+                             % (image, picture.width, picture.height))
+        texture = picture.get_texture()
+        pyglet.gl.glBindTexture(texture.target, texture.id)
+        pyglet.gl.glTexParameteri(texture.target, pyglet.gl.GL_TEXTURE_WRAP_S, pyglet.gl.GL_REPEAT)
+        pyglet.gl.glTexParameteri(texture.target, pyglet.gl.GL_TEXTURE_WRAP_T, pyglet.gl.GL_REPEAT)
+        _textures[image] = texture
+    return _textures[image]
+
+
+class WallLayer(cocos.cocosnode.CocosNode):
+    """ the walls, drawn from a WallMesh """
+    def __init__(self):
+        super(WallLayer, self).__init__()
+        self.mesh = WallMesh()
+        self.lists = []
+
+    def add(self, source_sprite):
+        self.mesh.add(source_sprite)
+
+    def build(self):
+        """ makes the vertex lists, once every wall is added """
+        for image, vertices, tex_coords, indices in self.mesh.mesh():
+            texture = load_repeating(image)
+            count = len(vertices) / 3
+            vertex_list = pyglet.graphics.vertex_list_indexed(count, indices,
+                ('v3i/static', vertices),
+                ('c3B/static', WALL_COLOR*count),
+                ('t2f/static', tex_coords))
+            self.lists.append((texture, vertex_list))
 
     def draw(self):
         pyglet.gl.glPushMatrix()
         self.transform()
-        texture = self.walls_atlas.atlas.texture
-        pyglet.gl.glEnable(texture.target)
-        pyglet.gl.glBindTexture(texture.target, texture.id)
-        self.wall_batch.draw()
-        pyglet.gl.glDisable(texture.target)
-        texture = self.texture
-        pyglet.gl.glEnable(texture.target)
-        pyglet.gl.glBindTexture(texture.target, texture.id)
-        self.top_batch.draw()
-        pyglet.gl.glDisable(texture.target)
-
+        for texture, vertex_list in self.lists:
+            pyglet.gl.glEnable(texture.target)
+            pyglet.gl.glBindTexture(texture.target, texture.id)
+            vertex_list.draw(pyglet.gl.GL_TRIANGLES)
+            pyglet.gl.glDisable(texture.target)
         pyglet.gl.glPopMatrix()
 
-    def get_wall(self, child):
-        path = conf_walls[child.path]
-        s = self.walls_atlas[path]
-        return s
-
 def create_wall_layer(layers):
     dest = WallLayer()
     for layer in layers:
         for z, child in layer.children:
             dest.add(child)
-
+    dest.build()
     return dest
 
 # si cambian esto, tienen que ejecutar este archivo para que arregle el atlas y la lista de coordenadas
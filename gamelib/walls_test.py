@@ -0,0 +1,112 @@
+from walls import WallMesh, conf_walls, _power_of_two
+
+PARED = 'newtiles/pared.png'
+VENTANA = 'newtiles/ventana.png'
+
+class Image(object):
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+
+class Box(object):
+    """ what WallMesh reads of a wall sprite """
+    def __init__(self, x0, y0, x1, y1, path=PARED):
+        self.image = Image(x1 - x0, y1 - y0)
+        self.position = (x0 + x1) / 2, (y0 + y1) / 2
+        self.path = path
+
+def make_mesh(*boxes):
+    mesh = WallMesh()
+    for box in boxes:
+        mesh.add(Box(*box))
+    return mesh
+
+def vertices(mesh):
+    """ image -> vertices in its part of the mesh """
+    return dict([(image, len(v) / 3) for image, v, t, i in mesh.mesh()])
+
+def test_one_block():
+    mesh = make_mesh((0, 0, 64, 64))
+    assert len(mesh.sides()) == 4
+    assert mesh.tops() == [(0, 0, 64, 64, 64, 64, PARED)]
+    assert vertices(mesh) == {conf_walls[PARED]: 16, PARED: 4}
+    assert mesh.counts() == (20, 20)
+    print 'test one block ok'
+
+def test_touching_blocks():
+    mesh = make_mesh((0, 0, 64, 64), (64, 0, 128, 64))
+    side = conf_walls[PARED]
+    assert mesh.sides() == [(0, 0, 0, 64, 64, side), (0, 128, 0, 64, 64, side),
+                            (1, 0, 0, 128, 64, side), (1, 64, 0, 128, 64, side)]
+    # the faces they share are gone
+    assert not [s for s in mesh.sides() if s[:2] == (0, 64)]
+    assert mesh.tops() == [(0, 0, 128, 64, 64, 64, PARED)]
+    assert mesh.counts() == (40, 20)
+    # merged faces repeat the image once a block
+    image, v, tex_coords, indices = mesh.mesh()[0]
+    assert tex_coords[:8] == [0, 0, 1, 0, 1, 1, 0, 1]
+    image, v, tex_coords, indices = mesh.mesh()[1]
+    assert tex_coords[:8] == [0, 0, 2, 0, 2, 1, 0, 1]
+    # two triangles a quad
+    assert sum([len(i) for image, v, t, i in mesh.mesh()]) == 6 * 5
+    print 'test touching blocks ok'
+
+def test_l_shape():
+    #  C
+    #  A B
+    mesh = make_mesh((0, 0, 64, 64), (64, 0, 128, 64), (0, 64, 64, 128))
+    side = conf_walls[PARED]
+    assert mesh.sides() == [(0, 0, 0, 128, 64, side), (0, 64, 64, 128, 64, side),
+                            (0, 128, 0, 64, 64, side), (1, 0, 0, 128, 64, side),
+                            (1, 64, 64, 128, 64, side), (1, 128, 0, 64, 64, side)]
+    assert sorted(mesh.tops()) == [(0, 0, 128, 64, 64, 64, PARED),
+                                   (0, 64, 64, 128, 64, 64, PARED)]
+    assert vertices(mesh) == {side: 24, PARED: 8}
+    assert mesh.counts() == (60, 32)
+    print 'test l shape ok'
+
+def test_sizes():
+    # a small block against the lower half of a big one
+    mesh = make_mesh((0, 0, 64, 64), (64, 0, 96, 32))
+    side = conf_walls[PARED]
+    # the big block's side is only half covered, so it stays whole; the
+    # small one's is all covered. The fronts repeat every 64 and every 32,
+    # they aren't merged
+    assert mesh.sides() == [(0, 0, 0, 64, 64, side), (0, 64, 0, 64, 64, side),
+                            (0, 96, 0, 32, 32, side), (1, 0, 64, 96, 32, side),
+                            (1, 0, 0, 64, 64, side), (1, 32, 64, 96, 32, side),
+                            (1, 64, 0, 64, 64, side)]
+    assert len(mesh.tops()) == 2
+    assert mesh.counts() == (40, 36)
+    print 'test sizes ok'
+
+def test_images():
+    mesh = make_mesh((0, 0, 64, 64), (64, 0, 128, 64, VENTANA))
+    # shared faces go whatever the images, the others merge only with
+    # faces of the same image
+    assert not [s for s in mesh.sides() if s[:2] == (0, 64)]
+    assert len(mesh.sides()) == 6
+    assert len(mesh.tops()) == 2
+    assert vertices(mesh) == {conf_walls[PARED]: 12, conf_walls[VENTANA]: 12,
+                              PARED: 4, VENTANA: 4}
+    assert mesh.counts() == (40, 32)
+    print 'test images ok'
+
+def test_same_sprite_twice():
+    mesh = make_mesh((0, 0, 64, 64), (0, 0, 64, 64))
+    assert len(mesh.boxes) == 1
+    assert mesh.counts() == (40, 20)
+    print 'test same sprite twice ok'
+
+def test_power_of_two():
+    assert [n for n in range(300) if _power_of_two(n)] == [1, 2, 4, 8, 16, 32, 64, 128, 256]
+    print 'test power of two ok'
+
+if __name__ == '__main__':
+    test_one_block()
+    test_touching_blocks()
+    test_l_shape()
+    test_sizes()
+    test_images()
+    test_same_sprite_twice()
+    test_power_of_two()
@@ -16,15 +16,38 @@ considerando mejorar algunas cosas, hay partes bastante brute force
 ##                    m[i][j] = m[i][k] + m[k][j];
 ##}
 import math
+import os
+import hashlib
 from cocos.euclid import Vector2 as V2
+try:
+    import numpy
+except ImportError:
+    numpy = None
 bignum = 1.0e+40
+# how far inside the cell, in cells, the corners it is seen from are taken
+CORNER_INSET = 1.0e-3
 
 
 class WaypointNav:
-    def __init__(self,points,fn_visibles):
+    def __init__(self,points,fn_visibles,cache_file=None,cache_salt='',
+                 cell_size=None,cell_bounds=None,fn_visibles_many=None):
         """
         points: waypoints; all points in the map should have at least one waypoint in sight
         fn_visibles(a,b) True if point b is visible from point a
+        cache_file: where to keep the routes between runs, so the O(n^3)
+                    build only happens when something changed. Needs numpy
+        cache_salt: whatever else visibility depends on, ie the walls
+        cell_size: size of the cells of the nearest waypoint index, the
+                   wall mask tile is a good one. None for no index
+        cell_bounds: (x0,y0,x1,y1) of the cells the index is built for at
+                   load time, cells outside are done when first asked for
+        fn_visibles_many(ax,ay,bx,by): fn_visibles for numpy arrays of
+                   coords, needed to build the index at load time
+
+        The index keeps, for each cell, the waypoint nearest to its center
+        of those seen from the four corners of the cell. With walls made of
+        tiles the cells are aligned to, what the corners see the whole cell
+        does, so a lookup is confirmed with a single fn_visibles.
 
         Interfase Stateless:
         .get_dest(a,b): give a good intermediate point for going from a to b
@@ -39,71 +62,257 @@ class WaypointNav:
         """
         self.fn_visibles = fn_visibles
         self.points = [V2(x,y) for x,y in points]
-        self.min_dist = {}
+        self.min_dist = [] # min_dist[i][j] -> length of the shortest path
+        self.next_hop = [] # next_hop[i][j] -> next node in that path
         self.adj = [] # adj[i] -> list of nodes directly reacheables from i
-        self._init_min_dist()
-        self._floyd()
+        self.cell_size = cell_size
+        self.cells = {} # cell -> its waypoint, for cells out of cell_nearest
+        # cell_nearest[i,j] -> the waypoint of cell cell_origin+(i,j), -1 for none
+        self.cell_nearest = None
+        self.cell_origin = None
+        self.key = hashlib.sha1(repr([tuple(p) for p in points]) +
+                                cache_salt).hexdigest()
+
+        cache = self._read_cache(cache_file)
+        dirty = False
+        if not self._load(cache):
+            self._init_min_dist(fn_visibles_many)
+            self._floyd()
+            dirty = True
+        if (numpy is not None and cell_size is not None and
+            cell_bounds is not None and fn_visibles_many is not None):
+            if not self._load_cells(cache, cell_bounds):
+                self._init_cells(cell_bounds, fn_visibles_many)
+                dirty = True
+        if dirty:
+            self._save(cache_file)
+
+    def _read_cache(self, cache_file):
+        if numpy is None or cache_file is None or not os.path.exists(cache_file):
+            return None
+        try:
+            npz = numpy.load(cache_file)
+            try:
+                cache = dict((name, npz[name]) for name in npz.files)
+            finally:
+                npz.close()
+            if str(cache['key']) == self.key:
+                return cache
+        except Exception:
+            # unreadable or from an older version, build it again
+            pass
+        return None
+
+    def _load(self, cache):
+        if cache is None:
+            return False
+        visible = cache['visible']
+        self.min_dist = cache['min_dist'].tolist()
+        self.next_hop = cache['next_hop'].tolist()
+        self.adj = [numpy.flatnonzero(visible[:, j]).tolist()
+                    for j in xrange(len(self.points))]
+        return True
+
+    def _save(self, cache_file):
+        if numpy is None or cache_file is None:
+            return
+        n = len(self.points)
+        visible = numpy.zeros((n, n), dtype=bool)
+        for j, adj_j in enumerate(self.adj):
+            visible[adj_j, j] = True
+        arrays = dict(key=numpy.array(self.key), visible=visible,
+                      min_dist=numpy.array(self.min_dist),
+                      next_hop=numpy.array(self.next_hop, dtype=numpy.int32))
+        if self.cell_nearest is not None:
+            arrays.update(cell_size=numpy.array(self.cell_size),
+                          cell_origin=numpy.array(self.cell_origin),
+                          cell_nearest=self.cell_nearest)
+        try:
+            # a file object, or numpy would add a second .npz extension
+            f = open(cache_file, 'wb')
+            numpy.savez_compressed(f, **arrays)
+            f.close()
+        except IOError:
+            print '*** WARNING: could not write', cache_file
 
+    def _cell_range(self, bounds):
+        """ origin and shape, in cells, of the cells covering bounds """
+        s = float(self.cell_size)
+        x0, y0, x1, y1 = bounds
+        i0, j0 = int(math.floor(x0/s)), int(math.floor(y0/s))
+        i1, j1 = int(math.ceil(x1/s)), int(math.ceil(y1/s))
+        return (i0, j0), (i1-i0, j1-j0)
 
-    def _init_min_dist(self):
+    def _load_cells(self, cache, bounds):
+        if cache is None or 'cell_nearest' not in cache:
+            return False
+        origin, shape = self._cell_range(bounds)
+        cell_nearest = cache['cell_nearest']
+        if (float(cache['cell_size']) != self.cell_size or
+            tuple(cache['cell_origin']) != origin or
+            cell_nearest.shape != shape):
+            return False
+        self.cell_origin = origin
+        self.cell_nearest = cell_nearest
+        return True
+
+    def _corners(self):
+        """ offsets of the corners of a cell from its lower left one """
+        s = self.cell_size
+        inset = s * CORNER_INSET
+        return [(inset, inset), (s - inset, inset), (inset, s - inset),
+                (s - inset, s - inset)]
+
+    def _init_cells(self, bounds, fn_visibles_many):
+        """
+        for every cell in bounds, the waypoint nearest to its center of
+        those its four corners see. Every cell tries its nearest waypoint,
+        then the cells that don't see it their second nearest and so on,
+        one vectorised visibility pass per corner each time
+        """
+        s = self.cell_size
+        (i0, j0), (w, h) = self._cell_range(bounds)
+        xs = (numpy.arange(w) + i0) * s
+        ys = (numpy.arange(h) + j0) * s
+        # the corners, a hair inside, else a cell next to a wall would never see
+        corners = [numpy.meshgrid(xs + dx, ys + dy, indexing='ij')
+                   for dx, dy in self._corners()]
+        cx = numpy.concatenate([x.ravel() for x, y in corners])
+        cy = numpy.concatenate([y.ravel() for x, y in corners])
+        cells = w * h
+        px = numpy.array([p.x for p in self.points])
+        py = numpy.array([p.y for p in self.points])
+        d = numpy.hypot(((xs + 0.5 * s)[:, None] - px).repeat(h, axis=0),
+                        numpy.tile((ys + 0.5 * s)[:, None] - py, (w, 1)))
+        order = d.argsort(axis=1)
+        nearest = numpy.empty(cells, dtype=numpy.int32)
+        nearest.fill(-1)
+        left = numpy.arange(cells)
+        for rank in xrange(len(self.points)):
+            if not len(left):
+                break
+            k = order[left, rank]
+            seen = numpy.ones(len(left), dtype=bool)
+            for corner in xrange(4):
+                at = numpy.flatnonzero(seen)
+                seen[at] = fn_visibles_many(cx[corner * cells + left[at]],
+                                            cy[corner * cells + left[at]],
+                                            px[k[at]], py[k[at]])
+            nearest[left[seen]] = k[seen]
+            left = left[~seen]
+        self.cell_origin = i0, j0
+        self.cell_nearest = nearest.reshape(w, h)
+
+    def _init_min_dist(self, fn_visibles_many=None):
         """
         builds the graph, joining those points with clear line of sight
         calcs the 1 step distance for each pair (bignum if not in sight)
+        and the first step for going from one to the other (itself if
+        not in sight). With fn_visibles_many, the points seen from each
+        point are found in one go
         """
         points = self.points
         n = len(points)
         fn = self.fn_visibles
-        m = self.min_dist
+        m = self.min_dist = [[bignum]*n for i in xrange(n)]
+        nxt = self.next_hop = [[i]*n for i in xrange(n)]
+        if numpy is not None and fn_visibles_many is not None:
+            xs = numpy.array([p.x for p in points])
+            ys = numpy.array([p.y for p in points])
         for j in xrange(n):
+            if numpy is not None and fn_visibles_many is not None:
+                seen = fn_visibles_many(xs, ys, xs[j], ys[j]).tolist()
+            else:
+                seen = [fn(points[i],points[j]) for i in xrange(n)]
             adj_j = []
             for i in xrange(n):
                 if i==j:
-                    m[i,j]=0
+                    m[i][j]=0
                     continue
-                ix0, jx0 = i,j
-                if fn(points[i],points[j]):
-                    ix1, jx1 = i,j
-                    assert((points[ix0]==points[ix1]) and
-                           (points[jx0]==points[jx1]))
-                    m[i,j] =  abs(points[i]-points[j])
+                if seen[i]:
+                    m[i][j] =  abs(points[i]-points[j])
+                    nxt[i][j] = j
                     adj_j.append(i)
-                else:
-                    m[i,j] = bignum
             self.adj.append(adj_j)
 
     def _floyd(self):
         """
         knowing the distance between adjacents, the Floyd-Warshalls algo
-        calcs the min distance between any two pair of nodes. O(n^3)
+        calcs the min distance between any two pair of nodes, and which
+        node a minimal path goes through first. O(n^3), numpy does the two
+        inner loops when available.
         """
         n = len(self.points)
-        m = self.min_dist
+        if numpy is None:
+            m = self.min_dist
+            nxt = self.next_hop
+            for k in xrange(n):
+                m_k = m[k]
+                for i in xrange(n):
+                    m_i = m[i]
+                    m_ik = m_i[k]
+                    for j in xrange(n):
+                        if ( m_ik + m_k[j] < m_i[j] ):
+                            m_i[j] = m_ik + m_k[j]
+                            nxt[i][j] = nxt[i][k]
+            return
+
+        m = numpy.array(self.min_dist, dtype=float)
+        nxt = numpy.array(self.next_hop, dtype=numpy.int32)
         for k in xrange(n):
-            for i in xrange(n):
-                for j in xrange(n):
-                    if ( m[i,k] + m[k,j] < m[i,j] ):
-                        m[i,j] = m[i,k] + m[k,j]
+            through = m[:, k, None] + m[k]
+            shorter = through < m
+            m = numpy.where(shorter, through, m)
+            nxt = numpy.where(shorter, nxt[:, k, None], nxt)
+        # plain lists are faster than numpy when reading one item at a time
+        self.min_dist = m.tolist()
+        self.next_hop = nxt.tolist()
 
     def _next_waypoint(self,i,j):
         """
         returns the next index in a minimal path from i to j , i if i==j
         """
-        if i==j:
-            return i
-        dmin = self.min_dist[i,j]
-        for k in self.adj[i]:
-            # the first that allow min dist is as good as anyother
-            if abs(dmin-(abs(self.points[i]-self.points[k])+self.min_dist[k,j]))<1.0e-4:
-                return k
-        #must not get there
-        #assert(0) #TODO: remove for release
-        return i
+        return self.next_hop[i][j]
+
+    def _cell(self, a):
+        """
+        the waypoint of the cell a is in, see __init__, -1 if no waypoint
+        is seen from the whole cell. Cells out of the index are done the
+        first time they're asked for.
+        """
+        s = self.cell_size
+        cell = int(math.floor(a[0]/s)), int(math.floor(a[1]/s))
+        if self.cell_nearest is not None:
+            i = cell[0] - self.cell_origin[0]
+            j = cell[1] - self.cell_origin[1]
+            w, h = self.cell_nearest.shape
+            if 0 <= i < w and 0 <= j < h:
+                return self.cell_nearest[i, j]
+        k = self.cells.get(cell)
+        if k is None:
+            x0, y0 = cell[0]*s, cell[1]*s
+            corners = [V2(x0+dx, y0+dy) for dx, dy in self._corners()]
+            center = V2(x0+0.5*s, y0+0.5*s)
+            lia = [(abs(center-p),i) for i,p in enumerate(self.points)]
+            lia.sort()
+            k = self.cells[cell] = -1
+            for d,i in lia:
+                p = self.points[i]
+                if [c for c in corners if self.fn_visibles(c, p)] == corners:
+                    k = self.cells[cell] = i
+                    break
+        return k
 
     def get_near_wps(self,a):
         if not isinstance(a,V2):
             a = V2(a[0],a[1])
-        #get 3 ( if posible ) waypoints near a
         points = self.points
+        if self.cell_size is not None:
+            k = self._cell(a)
+            if k >= 0 and self.fn_visibles(a, points[k]):
+                return [k]
+            # the cell is next to a wall, look at them all
+        #get 3 ( if posible ) waypoints near a
         lia = [(abs(a-p),i) for i,p in enumerate(points)]
         lia.sort()
         cnt = 0; candidates_a = []
@@ -114,16 +323,13 @@ class WaypointNav:
                 if cnt>=1:
                     break
         return candidates_a
-        if not len(candidates_a):
-            #print '*** WARNING: no waypoint near', a
-            return a
 
     def best_pair(self, a, candidates_a, b, candidates_b):
 
         paths = []
         for i in candidates_a:
             for j in candidates_b:
-                kpath = (abs(a-self.points[i])+self.min_dist[i,j]+abs(self.points[j]-b),
+                kpath = (abs(a-self.points[i])+self.min_dist[i][j]+abs(self.points[j]-b),
                          i,j)
                 paths.append(kpath)
         paths.sort()
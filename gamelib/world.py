@@ -0,0 +1,78 @@
+""" World tick
+
+The game world is stepped by a single callback, owned by the GameLayer,
+that runs the same phases in the same order every tick:
+
+    input -> AI -> movement -> collision -> cleanup -> camera
+
+Each phase is one loop over the agents of each kind, as AgentsNode keeps
+them. Agents don't schedule anything themselves; they implement the
+phase methods of gamecast.Agent (think, move, collide) and the world
+calls them.
+
+Each phase is a span of the frame profiler.
+"""
+import profiler
+
+# the phases of a tick, as they are named in the profiler
+PHASES = ['input', 'AI', 'movement', 'collision', 'cleanup', 'camera']
+
+# the order kinds are stepped in, within a phase
+MOVING_KINDS = ['player', 'relative', 'zombie', 'bullet']
+
+
+class World(object):
+    def __init__(self, game_layer):
+        self.game_layer = game_layer
+        # steps taken so far
+        self.ticks = 0
+
+    def step(self, dt):
+        layer = self.game_layer
+        agents = layer.agents_node.by_kind
+        herd = layer.herd
+
+        # input: the controls set acceleration and heading between ticks
+        profiler.begin('input')
+        for player in agents['player']:
+            player.handle_input(dt)
+        profiler.end()
+
+        # AI
+        profiler.begin('AI')
+        for relative in agents['relative']:
+            relative.think(dt)
+        if herd is not None:
+            herd.steer(dt)
+        else:
+            for zombie in agents['zombie']:
+                zombie.think(dt)
+        profiler.end()
+
+        # movement
+        profiler.begin('movement')
+        for kind in MOVING_KINDS:
+            if kind == 'zombie' and herd is not None:
+                herd.move(dt)
+                continue
+            for agent in agents[kind]:
+                agent.move(dt)
+        profiler.end()
+
+        # collision. Picking up a powerup spawns another one, so walk copies
+        profiler.begin('collision')
+        for kind in MOVING_KINDS:
+            for agent in list(agents[kind]):
+                agent.collide(dt)
+        profiler.end()
+
+        # cleanup
+        profiler.begin('cleanup')
+        layer._remove_dead_items()
+        profiler.end()
+
+        # camera
+        profiler.begin('camera')
+        layer.center_camera()
+        profiler.end()
+        self.ticks += 1
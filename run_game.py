@@ -12,5 +12,10 @@ except Exception:
     print 'Get it from: http://www.pythonware.com/products/pil/'
     exit(0)
 
+if '--headless' in sys.argv or '--replay' in sys.argv:
+    # has to happen before pyglet gets the chance to open a window
+    import headless
+    headless.setup()
+
 import main
 main.main()